@@ -6,6 +6,7 @@ from . import admin_schemas
 from app.auth import auth_models, auth_schemas
 from app.auth.dependencies import get_db, require_role
 from app.auth.security import get_password_hash
+from app.inventory import inventory_models
 
 router = APIRouter(
     prefix="/admin",
@@ -55,7 +56,29 @@ def update_existing_user(
     db_user.username = user_update.username
     db_user.email = user_update.email
     db_user.role = user_update.role
+    db_user.warehouse_id = user_update.warehouse_id
     
     db.commit()
     db.refresh(db_user)
-    return db_user
\ No newline at end of file
+    return db_user
+
+@router.get("/warehouses/", response_model=List[admin_schemas.Warehouse])
+def get_all_warehouses(
+    db: Session = Depends(get_db),
+    current_user: auth_models.User = Depends(require_role(["admin"]))
+):
+    return db.query(inventory_models.Warehouse).order_by(inventory_models.Warehouse.id).all()
+
+@router.post("/warehouses/", response_model=admin_schemas.Warehouse)
+def create_warehouse(
+    warehouse: admin_schemas.WarehouseCreate,
+    db: Session = Depends(get_db),
+    current_user: auth_models.User = Depends(require_role(["admin"]))
+):
+    if db.query(inventory_models.Warehouse).filter(inventory_models.Warehouse.code == warehouse.code).first():
+        raise HTTPException(status_code=400, detail="Warehouse code already exists")
+    new_warehouse = inventory_models.Warehouse(code=warehouse.code, name=warehouse.name)
+    db.add(new_warehouse)
+    db.commit()
+    db.refresh(new_warehouse)
+    return new_warehouse
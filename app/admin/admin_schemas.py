@@ -4,4 +4,14 @@ from app.auth.auth_models import UserRole
 class UserUpdate(BaseModel):
     username: str
     email: str
-    role: UserRole
\ No newline at end of file
+    role: UserRole
+    warehouse_id: int | None = None  # home warehouse; None lets the user choose per request
+
+class WarehouseCreate(BaseModel):
+    code: str
+    name: str
+
+class Warehouse(WarehouseCreate):
+    id: int
+    class Config:
+        from_attributes = True
\ No newline at end of file
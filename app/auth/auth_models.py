@@ -1,5 +1,5 @@
 import enum
-from sqlalchemy import Column, Integer, String, Boolean, Enum as SAEnum
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Enum as SAEnum
 from app.core.database import Base
 
 class UserRole(str, enum.Enum):
@@ -15,4 +15,6 @@ class User(Base):
     email = Column(String, unique=True, index=True)
     hashed_password = Column(String)
     is_active = Column(Boolean, default=True) # <-- THIS LINE IS FIXED
-    role = Column(String, default=UserRole.OPERATOR)
\ No newline at end of file
+    role = Column(String, default=UserRole.OPERATOR)
+    # Home site; the user only sees and works in this warehouse. NULL: all sites.
+    warehouse_id = Column(Integer, ForeignKey("warehouses.id"), nullable=True)
\ No newline at end of file
@@ -7,6 +7,7 @@ class User(BaseModel):
     email: EmailStr
     role: str
     is_active: bool
+    warehouse_id: int | None = None
 
     class Config:
         from_attributes = True
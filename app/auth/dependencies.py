@@ -1,9 +1,10 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
 from sqlalchemy.orm import Session
 from typing import List
 
+from app.core import repository
 from app.core.config import settings
 from . import auth_schemas, auth_models
 from app.core.database import SessionLocal
@@ -32,7 +33,7 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
     except JWTError:
         raise credentials_exception
     
-    user = db.query(auth_models.User).filter(auth_models.User.username == username).first()
+    user = repository.user_by_username(db, username)
     if user is None:
         raise credentials_exception
     
@@ -46,4 +47,22 @@ def require_role(required_roles: List[str]):
                 detail="You do not have permission to perform this action"
             )
         return current_user
-    return role_checker
\ No newline at end of file
+    return role_checker
+
+def get_warehouse_id(
+    x_warehouse_id: int | None = Header(None, description="Site to work in; all sites when omitted"),
+    current_user: auth_models.User = Depends(get_current_user),
+) -> int | None:
+    """
+    The warehouse the request is scoped to. Users with a home warehouse are
+    pinned to it; others choose with X-Warehouse-Id, or get None (all sites).
+    """
+    home = current_user.warehouse_id
+    if home is not None:
+        if x_warehouse_id is not None and x_warehouse_id != home:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="You do not have access to this warehouse"
+            )
+        return home
+    return x_warehouse_id
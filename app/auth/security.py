@@ -5,8 +5,8 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 
+from app.core import repository
 from app.core.config import settings
-from . import auth_models
 from .dependencies import get_db
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -29,7 +29,7 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     return encoded_jwt
 
 def authenticate_user(db: Session, username: str, password: str):
-    user = db.query(auth_models.User).filter(auth_models.User.username == username).first()
+    user = repository.user_by_username(db, username)
     if not user:
         return False
     if not verify_password(password, user.hashed_password):
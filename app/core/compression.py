@@ -0,0 +1,61 @@
+"""
+Negotiated response compression.
+
+Bodies above COMPRESSION_MIN_SIZE are compressed with brotli when the client
+accepts it and brotli-asgi is installed, and with gzip otherwise. Streaming
+endpoints (server-sent events) are passed through untouched: the compressors
+buffer output, which would hold events back.
+
+A response with an ETag gets ``Vary: Accept-Encoding``. When it is compressed,
+its ETag gets the encoding appended (see app/core/http_cache.py), so identity,
+gzip and brotli bodies never share a strong validator. A 304 repeats the
+validator the client sent, which is the one its cached copy carries.
+"""
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.gzip import GZipMiddleware
+
+from app.core.http_cache import with_encoding, without_encoding, matching_candidate
+
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    BrotliMiddleware = None
+
+UNCOMPRESSED_PATH_PREFIXES = ("/events/",)
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int, gzip_level: int, brotli_quality: int):
+        self.app = app
+        if BrotliMiddleware is not None:
+            self.compressed = BrotliMiddleware(
+                app, quality=brotli_quality, minimum_size=minimum_size, gzip_fallback=True,
+            )
+        else:
+            self.compressed = GZipMiddleware(app, minimum_size=minimum_size, compresslevel=gzip_level)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and not scope["path"].startswith(UNCOMPRESSED_PATH_PREFIXES):
+            await self.compressed(scope, receive, _tag_representation(scope, send))
+        else:
+            await self.app(scope, receive, send)
+
+
+def _tag_representation(scope, send):
+    if_none_match = Headers(scope=scope).get("if-none-match")
+
+    async def wrapped(message):
+        if message["type"] == "http.response.start":
+            headers = MutableHeaders(raw=message.setdefault("headers", []))
+            etag = headers.get("etag")
+            if etag:
+                vary = headers.get("vary", "")
+                if "accept-encoding" not in vary.lower():
+                    headers["vary"] = f"{vary}, Accept-Encoding" if vary else "Accept-Encoding"
+                encoding = headers.get("content-encoding")
+                if encoding:
+                    headers["etag"] = with_encoding(etag, encoding)
+                elif message["status"] == 304:
+                    headers["etag"] = matching_candidate(if_none_match, without_encoding(etag)) or etag
+        await send(message)
+    return wrapped
@@ -7,7 +7,63 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int
     GOOGLE_CLIENT_ID: str
 
+    # --- Production server (app/server.py) ---
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 10000
+    WEB_CONCURRENCY: int | None = None  # defaults to 2 x available CPUs + 1
+    WORKER_MAX_REQUESTS: int = 2000
+    WORKER_MAX_REQUESTS_JITTER: int = 200
+    WORKER_MAX_MEMORY_MB: int = 768
+    WORKER_TIMEOUT: int = 120
+    WORKER_GRACEFUL_TIMEOUT: int = 30
+
+    # --- Product lookup cache (app/inventory/product_cache.py) ---
+    PRODUCT_CACHE_MAX_ENTRIES: int = 100_000
+    PRODUCT_CACHE_CHECK_SECONDS: float = 5.0
+    PRODUCT_CACHE_WARM: bool = False
+
+    # --- Response compression (app/core/compression.py) ---
+    COMPRESSION_MIN_SIZE: int = 1024  # bytes; smaller bodies are sent as-is
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4  # used when brotli-asgi is installed
+
+    # --- Live change events (app/core/events.py) ---
+    EVENT_BROKER: str = "local"  # "postgres" to fan out across workers with LISTEN/NOTIFY
+    EVENT_QUEUE_SIZE: int = 100
+    EVENT_HEARTBEAT_SECONDS: float = 15.0
+
+    # --- Idempotency-Key handling (app/core/idempotency.py) ---
+    IDEMPOTENCY_TTL_HOURS: int = 24
+    IDEMPOTENCY_WAIT_SECONDS: float = 30.0  # how long a duplicate waits for the original
+    IDEMPOTENCY_STALE_SECONDS: int = 300  # in-progress keys older than this were abandoned; retries get 409
+
+    # --- Background upload jobs (app/jobs/job_queue.py) ---
+    JOB_WORKERS: int = 1  # worker threads per web process; 0 to run them only via `manage run-jobs`
+    JOB_POLL_SECONDS: float = 2.0
+    JOB_STALE_SECONDS: int = 600  # a running job without a heartbeat for this long is retried
+    JOB_MAX_ATTEMPTS: int = 3
+
+    # --- Upload parsing (app/core/spreadsheets.py) ---
+    MAX_UPLOAD_BYTES: int = 20 * 1024 * 1024
+    PARSE_WORKERS: int = 2  # parser processes per web process; 0 parses in the request thread
+    PARSE_MAX_PENDING: int = 8  # files parsing or queued before new uploads get 503
+    PARSE_QUEUE_TIMEOUT_SECONDS: float = 30.0
+
+    # --- Archival of completed documents (app/inventory/archival.py) ---
+    ARCHIVE_AFTER_DAYS: int = 180
+    ARCHIVE_BATCH_SIZE: int = 500  # documents per transaction
+
+    # --- Delta sync for handhelds (app/sync/delta_sync.py) ---
+    SYNC_TOMBSTONE_DAYS: int = 30  # devices offline longer than this get a full resync
+
+    # --- Cross-dock matching (app/outbound/crossdock.py) ---
+    CROSSDOCK_AUTO_MATCH: bool = True  # match after every GRN and pick list upload
+
+    # --- Warehouses (app/inventory/warehouses.py) ---
+    DEFAULT_WAREHOUSE_ID: int = 1  # site for writes that do not name one
+    SITE_WORKERS: int = 3  # sites processed in parallel by batch runs
+
     class Config:
         env_file = ".env"
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
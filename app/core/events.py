@@ -0,0 +1,240 @@
+"""
+Change events pushed to connected clients.
+
+Write paths call ``publish(db, "picklist.created", picklist_id=...)`` inside
+their transaction. Events are delivered only if the transaction commits and are
+dropped on rollback, so clients never see a change that did not happen.
+
+Delivery goes through a broker:
+
+* ``LocalBroker`` (default) fans events out to the subscribers of this process
+  once the session commits. Enough for a single worker.
+* ``PostgresBroker`` sends each event with ``pg_notify`` inside the writing
+  transaction; every worker LISTENs on the channel and fans the events out to
+  its own subscribers, so a client connected to any worker sees every change.
+
+Select the broker with ``EVENT_BROKER=local|postgres``. Subscribers are asyncio
+queues consumed by the SSE endpoint; a subscriber that falls more than
+``EVENT_QUEUE_SIZE`` events behind is disconnected and should reconnect and
+refetch.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import select
+import threading
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Event types. Payloads carry ids only; clients refetch what they display.
+PICKLIST_CREATED = "picklist.created"
+PICKLIST_ITEM_PICKED = "picklist.item_picked"
+PICKLIST_COMPLETED = "picklist.completed"
+RECEIPT_CREATED = "receipt.created"
+RECEIPT_COMPLETED = "receipt.completed"
+INVENTORY_CHANGED = "inventory.changed"
+
+EVENT_TYPES = (
+    PICKLIST_CREATED, PICKLIST_ITEM_PICKED, PICKLIST_COMPLETED,
+    RECEIPT_CREATED, RECEIPT_COMPLETED, INVENTORY_CHANGED,
+)
+
+CLOSED = object()  # queued to a subscriber that has been dropped
+
+
+class Subscriber:
+    def __init__(self, types: set[str] | None, maxsize: int):
+        self.types = types
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.closed = False
+
+    def offer(self, item) -> None:
+        """Called on the event loop thread."""
+        if self.closed:
+            return
+        if item is CLOSED:
+            self.closed = True
+        elif self.queue.full():
+            # Too slow: drop the subscriber instead of buffering without bound.
+            self.closed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            item = CLOSED
+        self.queue.put_nowait(item)
+
+
+class LocalBroker:
+    """Fans committed events out to the subscribers of this process."""
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._subscribers: set[Subscriber] = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    # --- Publishing side (runs in request threads) ---
+    def stage(self, db: Session, event_type: str, data: dict) -> None:
+        if not event.contains(db, "after_commit", _deliver_staged):
+            event.listen(db, "after_commit", _deliver_staged)
+            event.listen(db, "after_rollback", _drop_staged)
+        db.info.setdefault("pending_events", []).append(
+            {"type": event_type, "data": data, "at": datetime.now(timezone.utc).isoformat()}
+        )
+
+    def deliver(self, payload: dict) -> None:
+        """Hand an event to every matching subscriber; safe to call from any thread."""
+        payload = {"id": next(self._ids), **payload}
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            if subscriber.types is None or payload["type"] in subscriber.types:
+                try:
+                    subscriber.loop.call_soon_threadsafe(subscriber.offer, payload)
+                except RuntimeError:  # loop already closed
+                    self.unsubscribe(subscriber)
+
+    # --- Subscribing side (runs on the event loop) ---
+    def subscribe(self, types: set[str] | None = None) -> Subscriber:
+        subscriber = Subscriber(types, self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.offer, CLOSED)
+            except RuntimeError:
+                pass
+
+
+class PostgresBroker(LocalBroker):
+    """
+    Cross-worker delivery over LISTEN/NOTIFY. The NOTIFY is part of the writing
+    transaction, so PostgreSQL itself delivers it on commit and discards it on
+    rollback. Each worker keeps one dedicated listening connection outside the pool.
+    """
+
+    channel = "wms_events"
+
+    def __init__(self, database_url: str, queue_size: int = 100):
+        super().__init__(queue_size)
+        self._engine = create_engine(database_url, poolclass=NullPool)
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def stage(self, db: Session, event_type: str, data: dict) -> None:
+        payload = {"type": event_type, "data": data, "at": datetime.now(timezone.utc).isoformat()}
+        db.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": self.channel, "payload": json.dumps(payload, separators=(",", ":"), default=str)},
+        )
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._listen_forever, name="event-listener", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        super().stop()
+
+    def _listen_forever(self) -> None:
+        backoff = 1.0
+        while not self._stopping.is_set():
+            try:
+                self._listen()
+                backoff = 1.0
+            except Exception:
+                logger.exception("Event listener connection failed; retrying in %.0fs", backoff)
+                self._stopping.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+    def _listen(self) -> None:
+        raw = self._engine.raw_connection()
+        try:
+            conn = raw.driver_connection
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {self.channel}")
+            while not self._stopping.is_set():
+                if select.select([conn], [], [], 5.0) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    try:
+                        self.deliver(json.loads(notify.payload))
+                    except ValueError:
+                        logger.warning("Ignoring malformed event payload: %r", notify.payload)
+        finally:
+            raw.close()
+
+
+def _deliver_staged(session) -> None:
+    for payload in session.info.pop("pending_events", []):
+        broker.deliver(payload)
+
+
+def _drop_staged(session) -> None:
+    session.info.pop("pending_events", None)
+
+
+def _create_broker():
+    if settings.EVENT_BROKER == "postgres":
+        return PostgresBroker(settings.DATABASE_URL, settings.EVENT_QUEUE_SIZE)
+    if settings.EVENT_BROKER != "local":
+        raise ValueError(f"Unknown EVENT_BROKER {settings.EVENT_BROKER!r}; use 'local' or 'postgres'")
+    return LocalBroker(settings.EVENT_QUEUE_SIZE)
+
+
+broker = _create_broker()
+
+
+def publish(db: Session, event_type: str, **data) -> None:
+    """Queue an event for delivery when ``db`` commits."""
+    broker.stage(db, event_type, data)
+
+
+def format_sse(payload: dict) -> str:
+    return f"id: {payload['id']}\nevent: {payload['type']}\ndata: {json.dumps(payload, default=str)}\n\n"
+
+
+async def stream(subscriber: Subscriber, heartbeat_seconds: float):
+    """Yield SSE frames for ``subscriber`` until it is dropped or the client disconnects."""
+    try:
+        yield f"retry: 5000\n: connected {time.time():.0f}\n\n"
+        while True:
+            try:
+                item = await asyncio.wait_for(subscriber.queue.get(), timeout=heartbeat_seconds)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if item is CLOSED:
+                break
+            yield format_sse(item)
+    finally:
+        broker.unsubscribe(subscriber)
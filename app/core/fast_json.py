@@ -0,0 +1,46 @@
+"""
+Opt-in fast JSON path for large read-only responses.
+
+Endpoints that return thousands of rows can select plain column tuples, build
+dicts directly and return ``FastJSONResponse``. Returning a Response skips
+FastAPI's ``jsonable_encoder`` pass and response-model validation, and the
+query skips ORM object hydration. orjson is used when installed; the stdlib
+encoder is the fallback.
+"""
+import enum
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    def dumps(content) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+else:
+    def dumps(content) -> bytes:
+        return json.dumps(content, default=_default, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
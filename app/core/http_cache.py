@@ -0,0 +1,67 @@
+"""
+Conditional GET helpers: strong ETags built from cheap version stamps and
+``If-None-Match`` handling.
+
+Endpoints set the ETag of the uncompressed representation. When
+CompressionMiddleware compresses the body it appends the encoding ("-gzip",
+"-br") inside the quotes, because a strong validator must differ per encoding.
+``etag_matches`` strips that suffix again before comparing.
+"""
+from fastapi import Request, Response
+from sqlalchemy.orm import Session
+
+from app.core.versioning import get_versions
+
+CACHE_CONTROL = "no-cache"  # clients may store responses but must revalidate with If-None-Match
+ENCODING_SUFFIXES = {"gzip": "-gzip", "br": "-br"}
+
+
+def make_etag(*parts) -> str:
+    return '"' + "-".join(str(part) for part in parts) + '"'
+
+
+def version_etag(db: Session, prefix: str, names, warehouse_id: int | None = None) -> str:
+    """
+    ETag from the generation counters of every table the response is built from
+    (one indexed read); per-site counters are those of ``warehouse_id``.
+    """
+    versions = get_versions(db, names, warehouse_id)
+    return make_etag(prefix, *(versions[name] for name in names))
+
+
+def with_encoding(etag: str, encoding: str) -> str:
+    """The ETag of ``encoding``'s representation: the suffix goes inside the quotes."""
+    suffix = ENCODING_SUFFIXES.get(encoding)
+    if not suffix or not etag.endswith('"'):
+        return etag
+    return etag[:-1] + suffix + '"'
+
+
+def without_encoding(etag: str) -> str:
+    """The representation-independent ETag, with W/ and any encoding suffix removed."""
+    etag = etag.strip().removeprefix("W/")
+    for suffix in ENCODING_SUFFIXES.values():
+        if etag.endswith(suffix + '"'):
+            return etag[:-len(suffix) - 1] + '"'
+    return etag
+
+
+def matching_candidate(header: str | None, etag: str) -> str | None:
+    """The If-None-Match entry that matches ``etag`` in any encoding, or None."""
+    if not header:
+        return None
+    if header.strip() == "*":
+        return etag
+    # If-None-Match uses weak comparison, so W/"x" matches "x".
+    for tag in header.split(","):
+        if without_encoding(tag) == etag:
+            return tag.strip().removeprefix("W/")
+    return None
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    return matching_candidate(request.headers.get("if-none-match"), etag) is not None
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
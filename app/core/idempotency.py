@@ -0,0 +1,250 @@
+"""
+Idempotency-Key support for mutating endpoints.
+
+A client that sends ``Idempotency-Key: <unique value>`` with a POST, PUT, PATCH
+or DELETE gets the same response for every retry of that request:
+
+* the first request claims the key, runs normally, and its response (any status
+  below 500) is stored in ``idempotency_keys``;
+* a retry of a completed request is answered from the stored response, marked
+  ``Idempotent-Replayed: true``, without running the endpoint again;
+* a duplicate that arrives while the first is still running waits for it
+  (up to IDEMPOTENCY_WAIT_SECONDS, then 409 with Retry-After);
+* reusing a key for a different request (method, path or body) is a 422;
+* a 5xx response releases the key so the request can be retried.
+
+Endpoints commit their own transaction, and the response is stored afterwards
+in a separate one. The key therefore only guarantees "at most once" up to the
+moment the response is stored. If the worker dies or the client disconnects in
+that window, the side effect may or may not have been committed. The key then
+stays claimed instead of being released. Retries get 409 while it is fresh, and
+once it is older than IDEMPOTENCY_STALE_SECONDS they get a 409 saying the
+outcome is unknown. It is never run a second time. The client must check the
+outcome before retrying with a new key.
+
+Keys are scoped to the authenticated user; requests without a valid bearer token
+pass through untouched. Stored responses expire after IDEMPOTENCY_TTL_HOURS and
+are purged with ``python -m app.manage purge-idempotency-keys``.
+"""
+import asyncio
+import hashlib
+import re
+import time
+from datetime import datetime, timedelta, timezone
+
+from fastapi.concurrency import run_in_threadpool
+from jose import JWTError, jwt
+from sqlalchemy import Column, String, Integer, DateTime, LargeBinary, JSON, select, delete, update
+from sqlalchemy.dialects.postgresql import insert
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+from app.core.config import settings
+from app.core.database import Base, engine
+
+MUTATING_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+MAX_KEY_LENGTH = 255
+POLL_SECONDS = 0.25
+
+IN_PROGRESS = "in_progress"
+COMPLETED = "completed"
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    principal = Column(String, primary_key=True)
+    key = Column(String(MAX_KEY_LENGTH), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)
+    status = Column(String(16), nullable=False)
+    response_status = Column(Integer)
+    response_headers = Column(JSON)
+    response_body = Column(LargeBinary)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+
+# --- Storage (sync; called through the threadpool) ---
+def claim(principal: str, key: str, fingerprint: str):
+    """
+    Claim the key for this request. Returns None when claimed, otherwise the
+    existing (fingerprint, status, response_status, response_headers, response_body,
+    created_at). Only expired keys are reclaimed: a key left in progress by a crash
+    may already have had its effect.
+    """
+    now = datetime.now(timezone.utc)
+    values = dict(
+        principal=principal, key=key, fingerprint=fingerprint, status=IN_PROGRESS,
+        response_status=None, response_headers=None, response_body=None,
+        created_at=now, expires_at=now + timedelta(hours=settings.IDEMPOTENCY_TTL_HOURS),
+    )
+    stmt = insert(IdempotencyKey).values(**values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[IdempotencyKey.principal, IdempotencyKey.key],
+        set_={name: stmt.excluded[name] for name in values if name not in ("principal", "key")},
+        where=IdempotencyKey.expires_at < now,
+    ).returning(IdempotencyKey.key)
+    with engine.begin() as conn:
+        if conn.execute(stmt).first() is not None:
+            return None
+        return conn.execute(
+            select(
+                IdempotencyKey.fingerprint, IdempotencyKey.status, IdempotencyKey.response_status,
+                IdempotencyKey.response_headers, IdempotencyKey.response_body, IdempotencyKey.created_at,
+            ).where(IdempotencyKey.principal == principal, IdempotencyKey.key == key)
+        ).first()
+
+
+def complete(principal: str, key: str, status: int, headers: list, body: bytes) -> None:
+    with engine.begin() as conn:
+        conn.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.principal == principal, IdempotencyKey.key == key)
+            .values(status=COMPLETED, response_status=status, response_headers=headers, response_body=body)
+        )
+
+
+def release(principal: str, key: str) -> None:
+    with engine.begin() as conn:
+        conn.execute(
+            delete(IdempotencyKey)
+            .where(IdempotencyKey.principal == principal, IdempotencyKey.key == key,
+                   IdempotencyKey.status == IN_PROGRESS)
+        )
+
+
+def purge_expired(db) -> int:
+    result = db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at < datetime.now(timezone.utc)))
+    return result.rowcount
+
+
+def _abandoned(existing) -> bool:
+    stale_before = datetime.now(timezone.utc) - timedelta(seconds=settings.IDEMPOTENCY_STALE_SECONDS)
+    return existing.status == IN_PROGRESS and existing.created_at < stale_before
+
+
+# --- Request identity ---
+def _principal(authorization: str | None) -> str | None:
+    if not authorization or not authorization.lower().startswith("bearer "):
+        return None
+    try:
+        payload = jwt.decode(authorization[7:].strip(), settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+    return payload.get("sub")
+
+
+BOUNDARY_RE = re.compile(r'boundary="?([^";]+)"?')
+
+
+def _fingerprint(scope, headers: Headers, body: bytes) -> str:
+    # Multipart boundaries are random per attempt; drop them so a re-sent upload matches.
+    match = BOUNDARY_RE.search(headers.get("content-type", ""))
+    if match:
+        body = body.replace(match.group(1).encode("latin-1"), b"")
+    digest = hashlib.sha256()
+    digest.update(f"{scope['method']} {scope['path']}?{scope.get('query_string', b'').decode('latin-1')}\n".encode())
+    # X-Warehouse-Id picks the site a request acts on, so it is part of what was asked.
+    digest.update(f"{headers.get('x-warehouse-id', '').strip()}\n".encode())
+    digest.update(body)
+    return digest.hexdigest()
+
+
+# --- Middleware ---
+class IdempotencyMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in MUTATING_METHODS:
+            return await self.app(scope, receive, send)
+        headers = Headers(scope=scope)
+        key = headers.get("idempotency-key")
+        if not key:
+            return await self.app(scope, receive, send)
+        if len(key) > MAX_KEY_LENGTH:
+            return await JSONResponse(
+                {"detail": f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters."}, status_code=400
+            )(scope, receive, send)
+        principal = _principal(headers.get("authorization"))
+        if principal is None:
+            # Unauthenticated: the endpoint rejects it (or it is a login), nothing to dedupe.
+            return await self.app(scope, receive, send)
+
+        body = await _read_body(receive)
+        fingerprint = _fingerprint(scope, headers, body)
+
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+        while True:
+            existing = await run_in_threadpool(claim, principal, key, fingerprint)
+            if existing is None:
+                break
+            if existing.fingerprint != fingerprint:
+                return await JSONResponse(
+                    {"detail": "Idempotency-Key was already used for a different request."}, status_code=422
+                )(scope, receive, send)
+            if existing.status == COMPLETED:
+                return await _replay(send, existing)
+            if _abandoned(existing):
+                return await JSONResponse(
+                    {"detail": "The earlier request with this Idempotency-Key did not finish, and its outcome "
+                               "is unknown. Check whether it took effect before retrying with a new key."},
+                    status_code=409,
+                )(scope, receive, send)
+            if time.monotonic() >= deadline:
+                return await JSONResponse(
+                    {"detail": "A request with this Idempotency-Key is still in progress."},
+                    status_code=409, headers={"Retry-After": "1"},
+                )(scope, receive, send)
+            await asyncio.sleep(POLL_SECONDS)
+
+        response = {"status": 500, "headers": [], "body": []}
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = [
+                    [name.decode("latin-1"), value.decode("latin-1")] for name, value in message.get("headers", [])
+                ]
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+            await send(message)
+
+        # On a crash or disconnect the key stays claimed: the endpoint may have committed.
+        await self.app(scope, _replay_body(body, receive), capture)
+        if response["status"] >= 500:
+            await run_in_threadpool(release, principal, key)
+        else:
+            await run_in_threadpool(
+                complete, principal, key, response["status"], response["headers"], b"".join(response["body"])
+            )
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+def _replay_body(body: bytes, receive):
+    sent = False
+
+    async def wrapped():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+    return wrapped
+
+
+async def _replay(send, record) -> None:
+    headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in record.response_headers or []]
+    headers.append((b"idempotent-replayed", b"true"))
+    await send({"type": "http.response.start", "status": record.response_status, "headers": headers})
+    await send({"type": "http.response.body", "body": record.response_body or b""})
@@ -0,0 +1,368 @@
+"""
+Explicit, ordered schema migrations.
+
+The schema used to be created with ``Base.metadata.create_all`` when ``app.main``
+was imported, which made every worker connect and reflect the database before it
+could serve a request. Migrations now run once per deploy through
+``python -m app.manage migrate``.
+
+Each migration is a function that receives a SQLAlchemy ``Connection`` inside a
+transaction. Migrations must be idempotent (``IF NOT EXISTS`` and friends) so a
+database that was bootstrapped by the old ``create_all`` call can be brought
+under version control without manual steps.
+"""
+import importlib
+import logging
+
+from sqlalchemy import text
+
+from app.core.database import Base, engine
+
+logger = logging.getLogger(__name__)
+
+# Every module that declares models must be listed here so that
+# ``Base.metadata`` is complete before ``create_all`` runs.
+MODEL_MODULES = [
+    "app.core.versioning",
+    "app.core.idempotency",
+    "app.auth.auth_models",
+    "app.inventory.inventory_models",
+    "app.jobs.jobs_models",
+]
+
+# Arbitrary but fixed key for pg_advisory_lock so two deploys cannot migrate at once.
+MIGRATION_LOCK_ID = 72_311_026
+
+MIGRATIONS = []
+
+
+def migration(version: int, description: str):
+    def decorator(func):
+        MIGRATIONS.append((version, description, func))
+        return func
+    return decorator
+
+
+def import_models():
+    for module in MODEL_MODULES:
+        importlib.import_module(module)
+
+
+def create_tables(conn, *models):
+    """Create the tables for the given models if they are missing."""
+    Base.metadata.create_all(bind=conn, tables=[model.__table__ for model in models])
+
+
+def _ensure_migrations_table(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        " version INTEGER PRIMARY KEY,"
+        " description VARCHAR NOT NULL,"
+        " applied_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now())"
+    ))
+
+
+def applied_versions(conn) -> set[int]:
+    _ensure_migrations_table(conn)
+    return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def pending_migrations(conn):
+    done = applied_versions(conn)
+    return [m for m in sorted(MIGRATIONS, key=lambda m: m[0]) if m[0] not in done]
+
+
+def run_migrations(bind=None) -> list[int]:
+    """Apply all pending migrations, each in its own transaction. Returns applied versions."""
+    import_models()
+    bind = bind or engine
+    applied = []
+    with bind.connect() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        conn.commit()
+        try:
+            for version, description, func in pending_migrations(conn):
+                logger.info(f"Applying migration {version}: {description}")
+                func(conn)
+                conn.execute(
+                    text("INSERT INTO schema_migrations (version, description) VALUES (:v, :d)"),
+                    {"v": version, "d": description},
+                )
+                conn.commit()
+                applied.append(version)
+        finally:
+            conn.rollback()
+            conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+            conn.commit()
+    return applied
+
+
+# --- Migrations (append new ones at the end; never renumber) ---
+
+@migration(1, "Initial schema")
+def _initial_schema(conn):
+    Base.metadata.create_all(bind=conn)
+
+
+@migration(2, "Table generation counters")
+def _table_versions(conn):
+    from app.core.versioning import TableVersion
+    create_tables(conn, TableVersion)
+
+
+@migration(3, "Product search indexes")
+def _product_search_indexes(conn):
+    conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_products_ean_prefix ON products (ean text_pattern_ops)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_products_material_code_prefix ON products (material_code text_pattern_ops)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_products_name_trgm ON products USING gin (lower(name) gin_trgm_ops)"
+    ))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_products_name_id ON products (name, id)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_products_brand_name_id ON products (brand, name, id)"))
+
+
+@migration(4, "Stock movement ledger and snapshots")
+def _stock_ledger(conn):
+    from app.inventory.inventory_models import StockMovement, StockSnapshot, StockSnapshotLine
+    create_tables(conn, StockMovement, StockSnapshot, StockSnapshotLine)
+    # Opening balance: the ledger starts from the stock on hand today.
+    exists = conn.execute(text("SELECT 1 FROM stock_snapshots LIMIT 1")).first()
+    if not exists:
+        snapshot_id = conn.execute(text(
+            "INSERT INTO stock_snapshots (as_of, last_movement_id, line_count)"
+            " VALUES (now(), 0, 0) RETURNING id"
+        )).scalar()
+        lines = conn.execute(text(
+            "INSERT INTO stock_snapshot_lines"
+            " (snapshot_id, product_id, location_id, batch, mfg_date, exp_date, quantity)"
+            " SELECT :sid, product_id, location_id, batch, mfg_date, exp_date, quantity"
+            " FROM inventory WHERE quantity <> 0"
+        ), {"sid": snapshot_id}).rowcount
+        conn.execute(
+            text("UPDATE stock_snapshots SET line_count = :n WHERE id = :sid"),
+            {"n": lines, "sid": snapshot_id},
+        )
+
+
+@migration(5, "Inventory available_quantity and FEFO allocation index")
+def _inventory_available_quantity(conn):
+    conn.execute(text(
+        "ALTER TABLE inventory ADD COLUMN IF NOT EXISTS available_quantity double precision"
+        " GENERATED ALWAYS AS (quantity - COALESCE(reserved_quantity, 0)) STORED"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_inventory_available_fefo"
+        " ON inventory (product_id, exp_date, quantity) WHERE available_quantity > 0"
+    ))
+
+
+@migration(6, "Index inventory by location")
+def _inventory_location_index(conn):
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_inventory_location_id ON inventory (location_id)"))
+
+
+@migration(7, "Idempotency keys for mutating endpoints")
+def _idempotency_keys(conn):
+    from app.core.idempotency import IdempotencyKey
+    create_tables(conn, IdempotencyKey)
+
+
+@migration(8, "Background job queue")
+def _jobs(conn):
+    from app.jobs.jobs_models import Job
+    create_tables(conn, Job)
+
+
+@migration(9, "Replenishment tasks")
+def _replenishment_tasks(conn):
+    from app.inventory.inventory_models import ReplenishmentTask
+    create_tables(conn, ReplenishmentTask)
+
+
+@migration(10, "Archive tables for completed documents")
+def _archive_tables(conn):
+    from app.inventory import inventory_models as m
+    Base.metadata.create_all(bind=conn, tables=[
+        m.PickListArchive, m.PickListItemArchive, m.GoodsReceiptArchive,
+        m.GoodsReceiptItemArchive, m.PutawayLogArchive,
+    ])
+    # Archival deletes children by parent id and finds completed documents by age.
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_pick_list_items_picklist_id ON pick_list_items (picklist_id)"))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_goods_receipt_items_goods_receipt_id ON goods_receipt_items (goods_receipt_id)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_putaway_log_goods_receipt_item_id ON putaway_log (goods_receipt_item_id)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_pick_lists_completed_created_at"
+        " ON pick_lists (created_at) WHERE status = 'COMPLETED'"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_goods_receipts_completed_created_at"
+        " ON goods_receipts (created_at) WHERE status = 'COMPLETED'"
+    ))
+
+
+SYNCED_TABLES = ("products", "locations", "pick_lists", "pick_list_items", "goods_receipts", "goods_receipt_items")
+
+
+@migration(11, "Change tracking for delta sync")
+def _delta_sync(conn):
+    from app.inventory.inventory_models import SyncDeletion
+    create_tables(conn, SyncDeletion)
+    # Every insert or update stamps the row with its transaction id; every delete leaves a tombstone.
+    conn.execute(text(
+        "CREATE OR REPLACE FUNCTION sync_stamp() RETURNS trigger AS $$"
+        " BEGIN NEW.change_seq := pg_current_xact_id()::text::bigint; RETURN NEW; END"
+        " $$ LANGUAGE plpgsql"
+    ))
+    conn.execute(text(
+        "CREATE OR REPLACE FUNCTION sync_tombstone() RETURNS trigger AS $$"
+        " BEGIN"
+        " INSERT INTO sync_deletions (table_name, row_id, change_seq)"
+        " VALUES (TG_TABLE_NAME, OLD.id, pg_current_xact_id()::text::bigint);"
+        " RETURN OLD; END"
+        " $$ LANGUAGE plpgsql"
+    ))
+    for table in SYNCED_TABLES:
+        # Existing rows get 0, so a device syncing from 0 receives everything.
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS change_seq bigint NOT NULL DEFAULT 0"))
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_change_seq ON {table} (change_seq)"))
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {table}_sync_stamp ON {table}"))
+        conn.execute(text(
+            f"CREATE TRIGGER {table}_sync_stamp BEFORE INSERT OR UPDATE ON {table}"
+            " FOR EACH ROW EXECUTE FUNCTION sync_stamp()"
+        ))
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {table}_sync_tombstone ON {table}"))
+        conn.execute(text(
+            f"CREATE TRIGGER {table}_sync_tombstone AFTER DELETE ON {table}"
+            " FOR EACH ROW EXECUTE FUNCTION sync_tombstone()"
+        ))
+    # Archive tables mirror the live columns.
+    for table in ("pick_lists", "pick_list_items", "goods_receipts", "goods_receipt_items"):
+        conn.execute(text(
+            f"ALTER TABLE {table}_archive ADD COLUMN IF NOT EXISTS change_seq bigint NOT NULL DEFAULT 0"
+        ))
+
+
+@migration(12, "Open-item counters on goods receipts and pick lists")
+def _open_item_counters(conn):
+    for table, items, parent, pending in (
+        ("goods_receipts", "goods_receipt_items", "goods_receipt_id", "PENDING"),
+        ("pick_lists", "pick_list_items", "picklist_id", "PENDING"),
+    ):
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS open_items integer NOT NULL DEFAULT 0"))
+        conn.execute(text(f"ALTER TABLE {table}_archive ADD COLUMN IF NOT EXISTS open_items integer NOT NULL DEFAULT 0"))
+        conn.execute(text(
+            f"UPDATE {table} h SET open_items = c.n"
+            f" FROM (SELECT {parent} AS id, count(*) AS n FROM {items} WHERE status = '{pending}' GROUP BY {parent}) c"
+            " WHERE h.id = c.id AND h.open_items <> c.n"
+        ))
+
+
+@migration(13, "Cross-dock tasks")
+def _crossdock(conn):
+    from app.inventory.inventory_models import CrossDockTask
+    create_tables(conn, CrossDockTask)
+    for table in ("goods_receipt_items", "pick_list_items"):
+        for target in (table, f"{table}_archive"):
+            conn.execute(text(
+                f"ALTER TABLE {target} ADD COLUMN IF NOT EXISTS crossdock_quantity double precision NOT NULL DEFAULT 0"
+            ))
+
+
+@migration(14, "Warehouses")
+def _warehouses(conn):
+    from app.inventory.inventory_models import Warehouse
+    create_tables(conn, Warehouse)
+    # Everything that exists today belongs to the first site.
+    conn.execute(text("INSERT INTO warehouses (id, code, name) VALUES (1, 'MAIN', 'Main warehouse') ON CONFLICT DO NOTHING"))
+    conn.execute(text("SELECT setval(pg_get_serial_sequence('warehouses', 'id'), (SELECT max(id) FROM warehouses))"))
+    for table in ("locations", "inventory", "goods_receipts", "pick_lists", "replenishment_tasks", "crossdock_tasks"):
+        conn.execute(text(
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS warehouse_id integer NOT NULL DEFAULT 1"
+            " REFERENCES warehouses (id)"
+        ))
+    for table in ("goods_receipts_archive", "pick_lists_archive"):
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS warehouse_id integer NOT NULL DEFAULT 1"))
+    for table in ("users", "jobs"):
+        conn.execute(text(
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS warehouse_id integer REFERENCES warehouses (id)"
+        ))
+
+    # Hot indexes lead with the warehouse so each site's scans stay within its own key range.
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_inventory_warehouse_available_fefo"
+        " ON inventory (warehouse_id, product_id, exp_date, quantity) WHERE available_quantity > 0"
+    ))
+    conn.execute(text("DROP INDEX IF EXISTS ix_inventory_available_fefo"))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_inventory_warehouse_location ON inventory (warehouse_id, location_id)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_locations_warehouse_type_code ON locations (warehouse_id, location_type, code)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_goods_receipts_warehouse_status"
+        " ON goods_receipts (warehouse_id, status, created_at)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_pick_lists_warehouse_status ON pick_lists (warehouse_id, status, created_at)"
+    ))
+    for table in ("replenishment_tasks", "crossdock_tasks"):
+        conn.execute(text(f"DROP INDEX IF EXISTS ix_{table}_open"))
+        conn.execute(text(
+            f"CREATE INDEX ix_{table}_open ON {table} (warehouse_id, product_id) WHERE status = 'OPEN'"
+        ))
+
+
+@migration(15, "Replenishment task source rows")
+def _replenishment_source_rows(conn):
+    conn.execute(text("ALTER TABLE replenishment_tasks ADD COLUMN IF NOT EXISTS inventory_id integer"))
+
+
+@migration(16, "Location codes unique per warehouse")
+def _location_codes_per_warehouse(conn):
+    # The same bin code may now exist at every site, but only once per site.
+    conn.execute(text("ALTER TABLE locations DROP CONSTRAINT IF EXISTS locations_code_key"))
+    conn.execute(text("DROP INDEX IF EXISTS ix_locations_code"))
+    conn.execute(text("CREATE INDEX ix_locations_code ON locations (code)"))
+    conn.execute(text(
+        "DO $$ BEGIN"
+        " IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'uq_locations_warehouse_code') THEN"
+        " ALTER TABLE locations ADD CONSTRAINT uq_locations_warehouse_code UNIQUE (warehouse_id, code);"
+        " END IF;"
+        " END $$"
+    ))
+
+
+@migration(17, "Stock movement transaction ids")
+def _stock_movement_xact_ids(conn):
+    # Added without a default first, so existing rows stay NULL instead of the table being rewritten.
+    conn.execute(text("ALTER TABLE stock_movements ADD COLUMN IF NOT EXISTS xact_id bigint"))
+    conn.execute(text(
+        "ALTER TABLE stock_movements ALTER COLUMN xact_id SET DEFAULT pg_current_xact_id()::text::bigint"
+    ))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_stock_movements_xact_id ON stock_movements (xact_id)"))
+    conn.execute(text("ALTER TABLE stock_snapshots ADD COLUMN IF NOT EXISTS xact_horizon bigint"))
+
+
+@migration(18, "Putaway log stock identity")
+def _putaway_log_identity(conn):
+    for table in ("putaway_log", "putaway_log_archive"):
+        conn.execute(text(
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS location_id integer,"
+            " ADD COLUMN IF NOT EXISTS batch varchar, ADD COLUMN IF NOT EXISTS mfg_date date,"
+            " ADD COLUMN IF NOT EXISTS exp_date date"
+        ))
+        conn.execute(text(
+            f"UPDATE {table} AS log SET location_id = i.location_id, batch = i.batch,"
+            " mfg_date = i.mfg_date, exp_date = i.exp_date"
+            " FROM inventory AS i WHERE i.id = log.inventory_id AND log.location_id IS NULL"
+        ))
@@ -0,0 +1,31 @@
+"""
+Keyset pagination helpers.
+
+A cursor is the sort key of the last row of a page, JSON-encoded and made URL
+safe. Clients treat it as opaque and pass it back to fetch the next page.
+"""
+import base64
+import json
+
+from fastapi import HTTPException
+
+
+def encode_cursor(*values) -> str:
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def escape_like(value: str, escape: str = "\\") -> str:
+    """Escape LIKE wildcards so user input only ever matches literally."""
+    return value.replace(escape, escape * 2).replace("%", escape + "%").replace("_", escape + "_")
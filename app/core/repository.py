@@ -0,0 +1,145 @@
+"""
+Hot lookup statements, built once and shared across routers.
+
+A handful of statements run on every scan, pick, putaway and authenticated
+request. Building them per call (``db.query(...).filter(...)`` or a fresh
+``update(...).where(...)``) costs object construction, and SQLAlchemy's compiled
+cache then has to walk the new statement to compute its cache key before it can
+find the compiled SQL. The statements here are module-level objects with
+``bindparam()`` placeholders. Each is constructed once, its cache key is
+memoized on the object, and a call only binds values.
+
+Bind names start with ``b_``: an UPDATE treats execute-time parameters named
+after a column as extra SET values.
+
+``batch`` and ``mfg_date`` may be NULL, and ``= NULL`` never matches while ``IS
+NOT DISTINCT FROM`` cannot use an index. Statements filtering on them therefore
+come in one variant per NULL pattern, built on first use by an ``lru_cache``
+factory.
+
+benchmarks/statement_cache.py measures the per-call overhead saved.
+"""
+from functools import lru_cache
+
+from sqlalchemy import select, update, bindparam, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.auth import auth_models
+from app.inventory import inventory_models
+
+User = auth_models.User
+Product = inventory_models.Product
+Inventory = inventory_models.Inventory
+Location = inventory_models.Location
+
+INVENTORY_RETURNING = (
+    Inventory.id, Inventory.product_id, Inventory.location_id, Inventory.batch,
+    Inventory.mfg_date, Inventory.exp_date, Inventory.quantity,
+)
+
+# Column order of product_cache.ProductRecord.
+PRODUCT_RECORD_COLUMNS = (
+    Product.id, Product.ean, Product.material_code, Product.name, Product.brand,
+    Product.uom, Product.mrp, Product.case_size, Product.min_qty, Product.max_qty,
+)
+
+
+def _equals_or_null(column, name: str, is_null: bool):
+    return column.is_(None) if is_null else column == bindparam(name)
+
+
+# --- Users ---
+USER_BY_USERNAME = select(User).where(User.username == bindparam("b_username")).limit(1)
+
+
+def user_by_username(db: Session, username: str) -> User | None:
+    return db.execute(USER_BY_USERNAME, {"b_username": username}).scalars().first()
+
+
+# --- Products ---
+PRODUCT_BY_EAN = select(Product).where(Product.ean == bindparam("b_ean")).limit(1)
+PRODUCT_BY_MATERIAL_CODE = select(Product).where(Product.material_code == bindparam("b_material_code")).limit(1)
+
+# IN lists with an expanding parameter: one cached statement for any number of keys.
+PRODUCT_RECORDS_BY_EAN = select(*PRODUCT_RECORD_COLUMNS).where(
+    Product.ean.in_(bindparam("b_keys", expanding=True))
+)
+PRODUCT_RECORDS_BY_MATERIAL_CODE = select(*PRODUCT_RECORD_COLUMNS).where(
+    Product.material_code.in_(bindparam("b_keys", expanding=True))
+)
+
+
+def product_by_ean(db: Session, ean: str) -> Product | None:
+    return db.execute(PRODUCT_BY_EAN, {"b_ean": ean}).scalars().first()
+
+
+def product_by_material_code(db: Session, material_code: str) -> Product | None:
+    return db.execute(PRODUCT_BY_MATERIAL_CODE, {"b_material_code": material_code}).scalars().first()
+
+
+# --- Inventory: putaway ---
+@lru_cache(maxsize=None)
+def putaway_increment(batch_is_null: bool, mfg_date_is_null: bool):
+    """Add ``b_quantity`` to the row matching product, location, batch and mfg_date."""
+    return (
+        update(Inventory)
+        .where(
+            Inventory.product_id == bindparam("b_product_id"),
+            Inventory.location_id == bindparam("b_location_id"),
+            _equals_or_null(Inventory.batch, "b_batch", batch_is_null),
+            _equals_or_null(Inventory.mfg_date, "b_mfg_date", mfg_date_is_null),
+        )
+        .values(quantity=Inventory.quantity + bindparam("b_quantity"))
+        .returning(*INVENTORY_RETURNING)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _putaway_insert():
+    site = select(Location.warehouse_id).where(Location.id == bindparam("b_location_id")).scalar_subquery()
+    stmt = insert(Inventory).values(
+        product_id=bindparam("b_product_id"), location_id=bindparam("b_location_id"),
+        quantity=bindparam("b_quantity"), reserved_quantity=0.0, batch=bindparam("b_batch"),
+        mfg_date=bindparam("b_mfg_date"), exp_date=bindparam("b_exp_date"), warehouse_id=site,
+    )
+    return stmt.on_conflict_do_update(
+        constraint="_inventory_uc",
+        set_={"quantity": Inventory.quantity + stmt.excluded.quantity},
+    ).returning(*INVENTORY_RETURNING)
+
+
+# Create the row when nothing matched (or add to it if a concurrent scan just created it).
+PUTAWAY_INSERT = _putaway_insert()
+
+
+# --- Inventory: picking ---
+@lru_cache(maxsize=None)
+def pick_decrement(batch_is_null: bool):
+    """
+    Take ``b_quantity`` from the FEFO-first row of product, location and batch
+    holding at least that much, on hand and reserved alike.
+    """
+    target = (
+        select(Inventory.id)
+        .where(
+            Inventory.product_id == bindparam("b_product_id"),
+            Inventory.location_id == bindparam("b_location_id"),
+            _equals_or_null(Inventory.batch, "b_batch", batch_is_null),
+            Inventory.quantity >= bindparam("b_quantity"),
+        )
+        .order_by(Inventory.exp_date, Inventory.id)
+        .limit(1)
+        .with_for_update()
+        .scalar_subquery()
+    )
+    return (
+        update(Inventory)
+        .where(Inventory.id == target, Inventory.quantity >= bindparam("b_quantity"))
+        .values(
+            quantity=Inventory.quantity - bindparam("b_quantity"),
+            reserved_quantity=func.coalesce(Inventory.reserved_quantity, 0) - bindparam("b_quantity"),
+        )
+        .returning(*INVENTORY_RETURNING)
+        .execution_options(synchronize_session=False)
+    )
@@ -0,0 +1,227 @@
+"""
+Helpers for reading uploaded spreadsheets into plain row dictionaries.
+
+Supported formats, picked by file extension:
+
+* .xlsx / .xlsm: streamed row by row with openpyxl in read-only mode
+* .csv: the stdlib csv module (all values are text)
+* .parquet: pyarrow, the fastest option for large sheets
+* .xls: legacy Excel through pandas
+
+Parsing is CPU-bound and holds the GIL, so ``read_rows`` runs it in a small
+process pool (PARSE_WORKERS processes, at most PARSE_MAX_PENDING files queued)
+and the request thread only waits. Uploads larger than MAX_UPLOAD_BYTES are
+rejected with 413 before any parsing. If a parser process dies (killed for
+memory on a huge sheet, say), the broken pool is replaced and the file retried
+once; a second crash is a 503, never a 400, because the file may be fine.
+"""
+import csv
+import io
+import logging
+import math
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime
+from typing import BinaryIO
+
+from fastapi import HTTPException, UploadFile
+
+from app.core.config import settings
+
+CSV_EXTENSIONS = (".csv",)
+PARQUET_EXTENSIONS = (".parquet", ".pq")
+LEGACY_EXCEL_EXTENSIONS = (".xls",)
+
+logger = logging.getLogger(__name__)
+
+
+def read_rows(file: UploadFile) -> list[dict]:
+    """
+    Read an uploaded spreadsheet into a list of {header: value} dicts. Raises 413
+    for oversized files and 400 for files that cannot be parsed.
+    """
+    data = read_upload(file)
+    try:
+        return parse_in_pool(file.filename or "", data)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Could not read file: {e}")
+
+
+def read_upload(file: UploadFile) -> bytes:
+    """The upload's bytes, or 413 if it is larger than MAX_UPLOAD_BYTES."""
+    size = file.size
+    if size is None:
+        file.file.seek(0, io.SEEK_END)
+        size = file.file.tell()
+        file.file.seek(0)
+    if size > settings.MAX_UPLOAD_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"File is {size / 1_048_576:.1f} MB; the limit is {settings.MAX_UPLOAD_BYTES / 1_048_576:.0f} MB.",
+        )
+    return file.file.read()
+
+
+# --- Parsers (run inside pool processes) ---
+def parse_rows(filename: str, data: BinaryIO) -> list[dict]:
+    """Parse a file-like object; the extension picks the format, .xlsx by default."""
+    name = filename.lower()
+    if name.endswith(CSV_EXTENSIONS):
+        return _parse_csv(data)
+    if name.endswith(PARQUET_EXTENSIONS):
+        return _parse_parquet(data)
+    if name.endswith(LEGACY_EXCEL_EXTENSIONS):
+        return _parse_xls(data)
+    return _parse_xlsx(data)
+
+
+def parse_bytes(filename: str, data: bytes) -> list[dict]:
+    return parse_rows(filename, io.BytesIO(data))
+
+
+def _header(values) -> list[str | None]:
+    return [str(value).strip() if value is not None and str(value).strip() else None for value in values]
+
+
+def _parse_xlsx(data: BinaryIO) -> list[dict]:
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(data, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = _header(next(rows, ()))
+        records = []
+        for values in rows:
+            if all(value is None or value == "" for value in values):
+                continue
+            records.append({
+                column: ("" if value is None else value)
+                for column, value in zip(header, values) if column is not None
+            })
+        return records
+    finally:
+        workbook.close()
+
+
+def _parse_csv(data: BinaryIO) -> list[dict]:
+    reader = csv.reader(io.TextIOWrapper(data, encoding="utf-8-sig", newline=""))
+    header = _header(next(reader, []))
+    return [
+        {column: value for column, value in zip(header, values) if column is not None}
+        for values in reader if any(value.strip() for value in values)
+    ]
+
+
+def _parse_parquet(data: BinaryIO) -> list[dict]:
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(data)
+    columns = [str(name).strip() for name in table.column_names]
+    table = table.rename_columns(columns)
+    return [
+        {column: ("" if value is None else value) for column, value in record.items()}
+        for record in table.to_pylist()
+    ]
+
+
+def _parse_xls(data: BinaryIO) -> list[dict]:
+    import pandas as pd
+
+    df = pd.read_excel(data).fillna('')
+    df.columns = [str(column).strip() for column in df.columns]
+    return df.to_dict("records")
+
+
+class ParserBusy(HTTPException):
+    """503 because every parser slot stayed taken for PARSE_QUEUE_TIMEOUT_SECONDS; nothing is wrong with the file."""
+
+
+# --- Process pool ---
+_pool: ProcessPoolExecutor | None = None
+_pending: threading.BoundedSemaphore | None = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool, _pending
+    with _pool_lock:
+        if _pool is None:
+            # forkserver: never fork the multi-threaded web process itself.
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.PARSE_WORKERS,
+                mp_context=multiprocessing.get_context("forkserver"),
+            )
+        if _pending is None:
+            # Created once: callers holding a slot release it across pool replacements.
+            _pending = threading.BoundedSemaphore(settings.PARSE_MAX_PENDING)
+        return _pool
+
+
+def _discard_pool(broken: ProcessPoolExecutor) -> None:
+    """Drop a pool whose worker died, unless another thread already replaced it."""
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            broken.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def parse_in_pool(filename: str, data: bytes) -> list[dict]:
+    """
+    Parse in the process pool, or inline when PARSE_WORKERS is 0. Raises 503
+    when the pool is saturated or its workers keep dying.
+    """
+    if settings.PARSE_WORKERS <= 0:
+        return parse_bytes(filename, data)
+    _get_pool()
+    if not _pending.acquire(timeout=settings.PARSE_QUEUE_TIMEOUT_SECONDS):
+        raise ParserBusy(status_code=503, detail="Too many uploads are being processed; try again shortly.")
+    try:
+        for _ in range(2):
+            pool = _get_pool()
+            try:
+                return pool.submit(parse_bytes, filename, data).result()
+            except BrokenProcessPool:
+                logger.warning(f"Parser process died while reading {filename!r}; replacing the pool")
+                _discard_pool(pool)
+        raise HTTPException(status_code=503, detail="The file could not be processed right now; try again shortly.")
+    finally:
+        _pending.release()
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def cell_text(value) -> str:
+    """
+    Normalise a cell to text. Codes such as EANs come back from Excel as floats
+    (8901234567890.0) when a column has blanks, so integral floats lose the '.0'.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        if math.isnan(value):
+            return ""
+        if value.is_integer():
+            return str(int(value))
+    return str(value).strip()
+
+
+def cell_date(value) -> date | None:
+    """Normalise a date cell (Excel date, timestamp or ISO text) to a date."""
+    if value is None or value == "" or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if isinstance(value, datetime) or hasattr(value, "to_pydatetime"):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value).strip()[:10])
@@ -0,0 +1,104 @@
+"""
+Per-table generation counters.
+
+Write paths call ``mark_changed(db, name)`` (or ``bump_version``) in the same
+transaction as the change, as the last statement before commit so the counter
+row lock is held only briefly.
+Readers compare the counter to decide whether a cached copy is still current,
+across all worker processes.
+
+Document counters (SITE_COUNTERS) are kept per warehouse, as ``pick_lists:2``,
+and bumped with ``mark_site_changed``. Scans at one site then neither queue on
+another site's counter row nor invalidate its cached listings. Reading such a
+counter for all sites sums the per-site counters, which only ever grow.
+"""
+from collections.abc import Iterable
+
+from sqlalchemy import Column, String, BigInteger, DateTime, event, select, or_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+SITE_COUNTERS = frozenset({"pick_lists", "goods_receipts"})
+
+
+class TableVersion(Base):
+    __tablename__ = "table_versions"
+    name = Column(String, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+def bump_version(db: Session, name: str) -> None:
+    stmt = insert(TableVersion).values(name=name, version=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[TableVersion.name],
+        set_={"version": TableVersion.version + 1, "updated_at": func.now()},
+    )
+    db.execute(stmt)
+
+
+def site_counter(name: str, warehouse_id: int) -> str:
+    return f"{name}:{warehouse_id}"
+
+
+def mark_site_changed(db: Session, name: str, warehouse_ids: Iterable[int]) -> None:
+    """Bump ``name`` at each of ``warehouse_ids`` (in id order, so concurrent writers lock rows alike)."""
+    for warehouse_id in sorted(set(warehouse_ids)):
+        bump_version(db, site_counter(name, warehouse_id))
+
+
+def _run_commit_callbacks(session):
+    callbacks = session.info.pop("version_callbacks", {})
+    for callback in callbacks.values():
+        callback()
+
+
+def _drop_commit_callbacks(session):
+    session.info.pop("version_callbacks", None)
+
+
+def mark_changed(db: Session, name: str, on_commit=None) -> None:
+    """
+    Bump ``name`` and, if given, call ``on_commit()`` once the transaction commits
+    (used to drop this worker's in-process caches). Rolled-back transactions
+    discard the callback.
+    """
+    bump_version(db, name)
+    if on_commit is None:
+        return
+    if not event.contains(db, "after_commit", _run_commit_callbacks):
+        event.listen(db, "after_commit", _run_commit_callbacks)
+        event.listen(db, "after_rollback", _drop_commit_callbacks)
+    db.info.setdefault("version_callbacks", {})[name] = on_commit
+
+
+def get_version(db: Session, name: str) -> int:
+    version = db.execute(select(TableVersion.version).where(TableVersion.name == name)).scalar()
+    return version or 0
+
+
+def get_versions(db: Session, names, warehouse_id: int | None = None) -> dict[str, int]:
+    """
+    Counters by name, in one query. Site counters are read at ``warehouse_id``,
+    or summed over every site when it is None.
+    """
+    names = list(names)
+    keys = [name for name in names if name not in SITE_COUNTERS]
+    per_site = [name for name in names if name in SITE_COUNTERS]
+    conditions = []
+    if warehouse_id is not None:
+        keys += [site_counter(name, warehouse_id) for name in per_site]
+    else:
+        conditions += [TableVersion.name.like(f"{name}:%") for name in per_site]
+    rows = db.execute(
+        select(TableVersion.name, TableVersion.version).where(or_(TableVersion.name.in_(keys), *conditions))
+    )
+    versions: dict[str, int] = {}
+    for key, version in rows:
+        name = key.split(":", 1)[0]
+        versions[name] = versions.get(name, 0) + version
+    return {name: versions.get(name, 0) for name in names}
@@ -1,23 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile
 from sqlalchemy.orm import Session, joinedload
 from typing import List
 
-from . import correction_schemas
-from app.inventory import inventory_models, inventory_schemas
-from app.auth.dependencies import get_db, require_role
+from . import correction_schemas, cycle_count
+from app.core import events
+from app.core.spreadsheets import read_rows
+from app.inventory.location_cache import location_cache
+from app.inventory import inventory_models, inventory_schemas, stock_ledger, warehouses
+from app.auth.dependencies import get_db, require_role, get_warehouse_id
 from app.auth.auth_models import User
 
 router = APIRouter(
     tags=["Correction"]
 )
 
+def _get_inventory(db: Session, inventory_id: int, warehouse_id: int | None):
+    query = db.query(inventory_models.Inventory).filter(inventory_models.Inventory.id == inventory_id)
+    if warehouse_id is not None:
+        query = query.filter(inventory_models.Inventory.warehouse_id == warehouse_id)
+    return query.first()
+
 @router.get("/location/{location_code}", response_model=List[inventory_schemas.Inventory])
 def get_inventory_at_location(
     location_code: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_role(["admin", "manager", "supervisor"]))
+    current_user: User = Depends(require_role(["admin", "manager", "supervisor"])),
+    warehouse_id: int | None = Depends(get_warehouse_id)
 ):
-    location = db.query(inventory_models.Location).filter(inventory_models.Location.code == location_code).first()
+    location = location_cache.snapshot(db).find(location_code, warehouses.resolve(warehouse_id))
     if not location:
         raise HTTPException(status_code=404, detail="Location not found")
     
@@ -30,15 +40,38 @@ def update_inventory_item(
     inventory_id: int,
     inventory_data: correction_schemas.InventoryUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_role(["admin", "manager", "supervisor"]))
+    current_user: User = Depends(require_role(["admin", "manager", "supervisor"])),
+    warehouse_id: int | None = Depends(get_warehouse_id)
 ):
-    db_inventory = db.query(inventory_models.Inventory).filter(inventory_models.Inventory.id == inventory_id).first()
+    db_inventory = _get_inventory(db, inventory_id, warehouse_id)
     if not db_inventory:
         raise HTTPException(status_code=404, detail="Inventory item not found")
 
+    reference = dict(reference_type="inventory", reference_id=db_inventory.id, user_id=current_user.id)
+    old_quantity = db_inventory.quantity
+    old_identity = dict(
+        product_id=db_inventory.product_id, location_id=db_inventory.location_id,
+        batch=db_inventory.batch, mfg_date=db_inventory.mfg_date, exp_date=db_inventory.exp_date,
+    )
+
     update_data = inventory_data.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_inventory, key, value)
+
+    if (db_inventory.batch, db_inventory.mfg_date, db_inventory.exp_date) != (
+        old_identity["batch"], old_identity["mfg_date"], old_identity["exp_date"]
+    ):
+        # A batch or date correction moves the stock between ledger identities.
+        stock_ledger.record_movement(
+            db, quantity=-old_quantity, movement_type=inventory_models.MovementTypeEnum.ADJUSTMENT,
+            **old_identity, **reference
+        )
+        old_quantity = 0
+    stock_ledger.record_inventory_movement(
+        db, db_inventory, db_inventory.quantity - old_quantity, inventory_models.MovementTypeEnum.ADJUSTMENT, **reference
+    )
+    for location_id in {old_identity["location_id"], db_inventory.location_id}:
+        events.publish(db, events.INVENTORY_CHANGED, location_id=location_id, product_id=db_inventory.product_id)
     
     db.commit()
     db.refresh(db_inventory)
@@ -48,12 +81,51 @@ def update_inventory_item(
 def delete_inventory_item(
     inventory_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_role(["admin", "manager", "supervisor"]))
+    current_user: User = Depends(require_role(["admin", "manager", "supervisor"])),
+    warehouse_id: int | None = Depends(get_warehouse_id)
 ):
-    db_inventory = db.query(inventory_models.Inventory).filter(inventory_models.Inventory.id == inventory_id).first()
+    db_inventory = _get_inventory(db, inventory_id, warehouse_id)
     if not db_inventory:
         raise HTTPException(status_code=404, detail="Inventory item not found")
 
+    stock_ledger.record_inventory_movement(
+        db, db_inventory, -db_inventory.quantity, inventory_models.MovementTypeEnum.REMOVAL,
+        reference_type="inventory", reference_id=db_inventory.id, user_id=current_user.id
+    )
+    events.publish(db, events.INVENTORY_CHANGED, location_id=db_inventory.location_id, product_id=db_inventory.product_id)
     db.delete(db_inventory)
     db.commit()
-    return None
\ No newline at end of file
+    return None
+
+@router.post("/cycle-count/upload/", response_model=correction_schemas.CycleCountReport)
+def upload_cycle_count(
+    file: UploadFile = File(...),
+    dry_run: bool = False,
+    allow_below_reserved: bool = False,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role(["admin", "manager", "supervisor"])),
+    warehouse_id: int | None = Depends(get_warehouse_id)
+):
+    """
+    Reconcile a count sheet (Location, EAN No., Batch, Counted Qty and optionally
+    MFG Date / EXP Date) against system stock for every location on the sheet.
+    Location codes are those of the request's warehouse (the default site when
+    none is chosen).
+    Stock at a counted location that is not on the sheet is counted as zero.
+    With ``dry_run`` the variance report is returned without changing stock.
+    A count below the reserved quantity is refused with 409 unless
+    ``allow_below_reserved`` is set.
+    """
+    rows = read_rows(file)
+    if not rows:
+        raise HTTPException(status_code=400, detail="File is empty.")
+
+    report = cycle_count.reconcile_cycle_count(
+        db, rows, current_user.id, apply=not dry_run, warehouse_id=warehouse_id,
+        allow_below_reserved=allow_below_reserved,
+    )
+    if dry_run:
+        db.rollback()
+    else:
+        db.commit()
+    return report
@@ -1,8 +1,26 @@
 from pydantic import BaseModel
 from datetime import date
+from typing import List
 
 class InventoryUpdate(BaseModel):
     quantity: float
     batch: str | None = None
     mfg_date: date | None = None
-    exp_date: date | None = None
\ No newline at end of file
+    exp_date: date | None = None
+
+class CycleCountLine(BaseModel):
+    location: str
+    ean: str
+    batch: str | None = None
+    system_quantity: float
+    counted_quantity: float
+    variance: float
+    reserved_quantity: float = 0.0
+    note: str | None = None
+
+class CycleCountReport(BaseModel):
+    applied: bool
+    locations: int
+    adjusted_lines: int
+    net_variance: float
+    lines: List[CycleCountLine]
@@ -0,0 +1,202 @@
+"""
+Set-based cycle count reconciliation.
+
+A count sheet lists (Location, EAN No., Batch, Counted Qty) for a set of bins.
+The system stock of every counted bin is loaded with one locking query, compared
+with the count in a single pass, and the adjustments are written back with one
+bulk UPDATE, one DELETE and one INSERT plus a bulk ledger insert, all in the
+caller's transaction. Stock at a counted bin that does not appear on the sheet
+is treated as counted zero. Location codes are resolved within one warehouse.
+
+A count below the stock reserved for open pick lines or tasks would leave those
+picks short with no warning, so such a sheet is refused (409) unless the caller
+passes ``allow_below_reserved``. New rows are inserted with ON CONFLICT, because
+the locking query cannot lock rows that a concurrent putaway is creating.
+"""
+from collections import defaultdict
+
+from fastapi import HTTPException
+from sqlalchemy import select, update, delete, exists
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from . import correction_schemas
+from app.core import events
+from app.core.spreadsheets import cell_text, cell_date
+from app.inventory import inventory_models, stock_ledger, warehouses
+from app.inventory.location_cache import location_cache
+from app.inventory.product_cache import product_index
+
+EPSILON = 1e-9
+Inventory = inventory_models.Inventory
+
+
+def _parse_count_sheet(db: Session, rows: list[dict], warehouse_id: int):
+    """Aggregate the sheet into {(location_id, product_id, batch): [qty, mfg, exp]}; raises 400 on bad rows."""
+    locations = location_cache.snapshot(db)
+    products = product_index.get_many_by_ean(db, [cell_text(row.get("EAN No.")) for row in rows])
+
+    counted = {}
+    errors = []
+    for index, row in enumerate(rows):
+        line_no = index + 2
+        location = locations.find(cell_text(row.get("Location")), warehouse_id)
+        ean = cell_text(row.get("EAN No."))
+        product = products.get(ean)
+        if location is None:
+            errors.append(f"Row {line_no}: location {cell_text(row.get('Location'))!r} not found")
+            continue
+        if product is None:
+            errors.append(f"Row {line_no}: product with EAN {ean!r} not found")
+            continue
+        try:
+            quantity = float(row.get("Counted Qty"))
+            mfg_date = cell_date(row.get("MFG Date"))
+            exp_date = cell_date(row.get("EXP Date"))
+        except (TypeError, ValueError) as e:
+            errors.append(f"Row {line_no}: {e}")
+            continue
+        if quantity < 0:
+            errors.append(f"Row {line_no}: counted quantity cannot be negative")
+            continue
+
+        key = (location.id, product.id, cell_text(row.get("Batch")) or None)
+        entry = counted.setdefault(key, [0.0, mfg_date, exp_date])
+        entry[0] += quantity
+
+    if errors:
+        raise HTTPException(status_code=400, detail=errors)
+    return counted, locations, products
+
+
+def reconcile_cycle_count(db: Session, rows: list[dict], user_id: int, apply: bool = True,
+                          warehouse_id: int | None = None,
+                          allow_below_reserved: bool = False) -> correction_schemas.CycleCountReport:
+    counted, locations, products = _parse_count_sheet(db, rows, warehouses.resolve(warehouse_id))
+    location_ids = sorted({key[0] for key in counted})
+
+    # One query for the system stock of every counted bin, locked until commit.
+    system_rows = db.execute(
+        select(
+            Inventory.id, Inventory.location_id, Inventory.product_id, Inventory.batch,
+            Inventory.mfg_date, Inventory.exp_date, Inventory.quantity, Inventory.reserved_quantity,
+        )
+        .where(Inventory.location_id.in_(location_ids))
+        .order_by(Inventory.exp_date, Inventory.id)
+        .with_for_update()
+    ).all()
+    system = defaultdict(list)
+    for row in system_rows:
+        system[(row.location_id, row.product_id, row.batch)].append(row)
+
+    eans_by_product = {record.id: record.ean for record in products.values()}
+    missing_products = {row.product_id for row in system_rows} - set(eans_by_product)
+    if missing_products:
+        eans_by_product.update(dict(db.execute(
+            select(inventory_models.Product.id, inventory_models.Product.ean)
+            .where(inventory_models.Product.id.in_(missing_products))
+        ).all()))
+
+    updates, deletes, inserts, movements, lines = [], [], [], [], []
+    for key in sorted(set(counted) | set(system), key=lambda k: (k[0], k[1], k[2] or "")):
+        location_id, product_id, batch = key
+        stock = system.get(key, [])
+        counted_qty, mfg_date, exp_date = counted.get(key, [0.0, None, None])
+        system_qty = sum(row.quantity for row in stock)
+        reserved_qty = sum(row.reserved_quantity or 0 for row in stock)
+        variance = counted_qty - system_qty
+
+        note = None
+        if abs(variance) > EPSILON:
+            if counted_qty + EPSILON < reserved_qty:
+                note = f"Counted quantity is below reserved quantity ({reserved_qty})"
+            if not stock:
+                inserts.append(dict(
+                    location_id=location_id, warehouse_id=locations.by_id[location_id].warehouse_id,
+                    product_id=product_id, batch=batch,
+                    mfg_date=mfg_date, exp_date=exp_date, quantity=counted_qty, reserved_quantity=0.0,
+                ))
+                movements.append(dict(
+                    location_id=location_id, product_id=product_id, batch=batch, mfg_date=mfg_date,
+                    exp_date=exp_date, quantity=variance,
+                ))
+            elif variance > 0:
+                # Surplus goes onto the newest stock line.
+                target = stock[-1]
+                updates.append({"id": target.id, "quantity": target.quantity + variance})
+                movements.append(dict(
+                    location_id=location_id, product_id=product_id, batch=batch, mfg_date=target.mfg_date,
+                    exp_date=target.exp_date, quantity=variance,
+                ))
+            else:
+                # Shortage is taken from the stock lines in FEFO order.
+                shortage = -variance
+                for row in stock:
+                    if shortage <= EPSILON:
+                        break
+                    taken = min(row.quantity, shortage)
+                    shortage -= taken
+                    remaining = row.quantity - taken
+                    if remaining <= EPSILON and not row.reserved_quantity:
+                        deletes.append(row.id)
+                    else:
+                        updates.append({"id": row.id, "quantity": remaining})
+                    movements.append(dict(
+                        location_id=location_id, product_id=product_id, batch=batch, mfg_date=row.mfg_date,
+                        exp_date=row.exp_date, quantity=-taken,
+                    ))
+
+        lines.append(correction_schemas.CycleCountLine(
+            location=locations.by_id[location_id].code if location_id in locations.by_id else str(location_id),
+            ean=eans_by_product.get(product_id, str(product_id)), batch=batch,
+            system_quantity=system_qty, counted_quantity=counted_qty, variance=variance,
+            reserved_quantity=reserved_qty, note=note,
+        ))
+
+    below_reserved = [line for line in lines if line.note]
+    if apply and below_reserved and not allow_below_reserved:
+        raise HTTPException(status_code=409, detail=[
+            f"{line.location} / {line.ean} / {line.batch or '-'}: counted {line.counted_quantity}"
+            f" is below the reserved {line.reserved_quantity}; release those picks first"
+            " or send allow_below_reserved=true"
+            for line in below_reserved
+        ])
+
+    if apply:
+        if updates:
+            db.execute(update(Inventory), updates)
+        if deletes:
+            # Rows referenced by the putaway log must stay (at zero) for its foreign key.
+            referenced = exists().where(inventory_models.PutawayLog.inventory_id == Inventory.id)
+            db.execute(
+                update(Inventory).where(Inventory.id.in_(deletes), referenced).values(quantity=0.0)
+                .execution_options(synchronize_session=False)
+            )
+            db.execute(
+                delete(Inventory).where(Inventory.id.in_(deletes), ~referenced)
+                .execution_options(synchronize_session=False)
+            )
+        if inserts:
+            # A putaway may have created the row since the stock was read; its quantity is not on the sheet.
+            stmt = insert(Inventory)
+            db.execute(
+                stmt.on_conflict_do_update(
+                    constraint="_inventory_uc", set_={"quantity": Inventory.quantity + stmt.excluded.quantity},
+                ),
+                inserts,
+            )
+        stock_ledger.record_movements(db, [
+            {**movement, "movement_type": inventory_models.MovementTypeEnum.CYCLE_COUNT,
+             "reference_type": "cycle_count", "user_id": user_id}
+            for movement in movements
+        ])
+        for location_id in sorted({movement["location_id"] for movement in movements}):
+            events.publish(db, events.INVENTORY_CHANGED, location_id=location_id)
+
+    return correction_schemas.CycleCountReport(
+        applied=apply,
+        locations=len(location_ids),
+        adjusted_lines=sum(1 for line in lines if abs(line.variance) > EPSILON),
+        net_variance=sum(line.variance for line in lines),
+        lines=lines,
+    )
@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.core import events
+from app.core.config import settings
+from app.auth.dependencies import get_db, get_current_user
+from app.auth.auth_models import User
+
+router = APIRouter(
+    tags=["Events"]
+)
+
+@router.get("/events/stream")
+async def stream_events(
+    types: str | None = Query(None, description="Comma-separated event types; all types when omitted"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Server-sent events for picklist.created, picklist.item_picked, picklist.completed,
+    receipt.created, receipt.completed and inventory.changed. Payloads carry ids only;
+    refetch the affected resource on receipt. After a reconnect, refetch the lists
+    once: events sent while disconnected are not replayed.
+    """
+    wanted = None
+    if types:
+        wanted = {name.strip() for name in types.split(",") if name.strip()}
+        unknown = wanted - set(events.EVENT_TYPES)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown event types: {', '.join(sorted(unknown))}")
+
+    # The stream can stay open for hours; give the pooled connection back now.
+    await run_in_threadpool(db.close)
+
+    subscriber = events.broker.subscribe(wanted)
+    return StreamingResponse(
+        events.stream(subscriber, settings.EVENT_HEARTBEAT_SECONDS),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
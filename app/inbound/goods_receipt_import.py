@@ -0,0 +1,62 @@
+"""
+Create a goods receipt from uploaded sheet rows.
+
+The sheet has "PO No." and "Supplier Name" on the first row and one line per
+"EAN No." / "Qty" / "Batch". Every row is validated before anything is
+written; all row errors are reported together as a 400. Used by the upload
+endpoint and by the background job worker, in the caller's transaction.
+"""
+from fastapi import HTTPException
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.core import events
+from app.core.config import settings
+from app.core.spreadsheets import cell_text
+from app.core.versioning import mark_site_changed
+from app.inventory import inventory_models, warehouses
+from app.inventory.product_cache import product_index
+from app.outbound import crossdock
+
+
+def create_goods_receipt(db: Session, rows: list[dict], progress=None,
+                         warehouse_id: int | None = None) -> inventory_models.GoodsReceipt:
+    """``progress(done, total)`` is called as rows are validated. The receipt goes to ``warehouse_id``
+    (or the default site)."""
+    if not rows:
+        raise HTTPException(status_code=400, detail="Excel file is empty.")
+
+    po_number = cell_text(rows[0].get("PO No."))
+    supplier_name = cell_text(rows[0].get("Supplier Name"))
+    products = product_index.get_many_by_ean(db, [cell_text(row.get("EAN No.")) for row in rows])
+
+    items, errors = [], []
+    for index, row in enumerate(rows):
+        line_no = index + 2
+        ean = cell_text(row.get("EAN No."))
+        product = products.get(ean)
+        if not product:
+            errors.append(f"Product with EAN {ean} not found in row {line_no}")
+            continue
+        try:
+            quantity = float(row.get("Qty"))
+        except (TypeError, ValueError):
+            errors.append(f"Invalid Qty {row.get('Qty')!r} in row {line_no}")
+            continue
+        items.append(dict(product_id=product.id, quantity=quantity, batch=cell_text(row.get("Batch")) or None))
+        if progress:
+            progress(index + 1, len(rows))
+    if errors:
+        raise HTTPException(status_code=400, detail=errors)
+
+    grn = inventory_models.GoodsReceipt(po_number=po_number, supplier_name=supplier_name, open_items=len(items),
+                                        warehouse_id=warehouses.resolve(warehouse_id))
+    db.add(grn)
+    db.flush()
+    db.execute(insert(inventory_models.GoodsReceiptItem), [{**item, "goods_receipt_id": grn.id} for item in items])
+
+    events.publish(db, events.RECEIPT_CREATED, goods_receipt_id=grn.id, po_number=po_number)
+    if settings.CROSSDOCK_AUTO_MATCH:
+        crossdock.match(db, sorted({item["product_id"] for item in items}), grn.warehouse_id)
+    mark_site_changed(db, "goods_receipts", [grn.warehouse_id])
+    return grn
@@ -1,13 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, File, UploadFile
+from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Request, Response
 from sqlalchemy.orm import Session, selectinload
 from typing import List
-import pandas as pd
 import logging
 
-from . import goods_receipt_schemas
+from . import goods_receipt_schemas, goods_receipt_import
 from app.inventory import inventory_models
-from app.auth.dependencies import require_role, get_db, get_current_user
+from app.jobs import job_queue
+from app.jobs.jobs_models import JobKind
+from app.auth.dependencies import require_role, get_db, get_current_user, get_warehouse_id
 from app.auth.auth_models import User
+from app.core.http_cache import CACHE_CONTROL, version_etag, etag_matches, not_modified
+from app.core.spreadsheets import read_rows
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -17,19 +20,26 @@ router = APIRouter(
     tags=["Inbound - Goods Receipt"]
 )
 
+# Receipt responses embed products, so the products counter is part of the ETag.
+RECEIPT_VERSIONS = ("goods_receipts", "products")
+
 @router.get("/receipts/{grn_id}", response_model=goods_receipt_schemas.GoodsReceipt)
 def get_goods_receipt(
     grn_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    warehouse_id: int | None = Depends(get_warehouse_id)
 ):
     """
     Get a single Goods Receipt by its ID, including its items and their products.
     """
-    grn = db.query(inventory_models.GoodsReceipt).options(
+    query = db.query(inventory_models.GoodsReceipt).options(
         selectinload(inventory_models.GoodsReceipt.items)
         .selectinload(inventory_models.GoodsReceiptItem.product)
-    ).filter(inventory_models.GoodsReceipt.id == grn_id).first()
+    ).filter(inventory_models.GoodsReceipt.id == grn_id)
+    if warehouse_id is not None:
+        query = query.filter(inventory_models.GoodsReceipt.warehouse_id == warehouse_id)
+    grn = query.first()
 
     if not grn:
         raise HTTPException(status_code=404, detail="Goods Receipt not found")
@@ -37,62 +47,58 @@ def get_goods_receipt(
 
 @router.get("/receipts/", response_model=List[goods_receipt_schemas.GoodsReceipt])
 def get_pending_receipts(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    warehouse_id: int | None = Depends(get_warehouse_id)
 ):
     """
     Get all Goods Receipts that are pending putaway.
+    Send the returned ETag back as If-None-Match to get a 304 when nothing changed.
     """
-    return db.query(inventory_models.GoodsReceipt).options(
-        selectinload(inventory_models.GoodsReceipt.items)
+    etag = version_etag(db, f"receipts-{warehouse_id or 'all'}", RECEIPT_VERSIONS, warehouse_id)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+
+    query = db.query(inventory_models.GoodsReceipt).options(
+        selectinload(inventory_models.GoodsReceipt.items).joinedload(inventory_models.GoodsReceiptItem.product)
     ).filter(
         inventory_models.GoodsReceipt.status == inventory_models.GoodsReceiptStatus.PENDING_PUTAWAY
-    ).order_by(inventory_models.GoodsReceipt.id.desc()).all()
+    )
+    if warehouse_id is not None:
+        query = query.filter(inventory_models.GoodsReceipt.warehouse_id == warehouse_id)
+    return query.order_by(inventory_models.GoodsReceipt.id.desc()).all()
 
 @router.post("/receipts/upload/", response_model=goods_receipt_schemas.GoodsReceipt)
 def upload_goods_receipt(
     file: UploadFile = File(...),
+    background: bool = False,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_role(["admin", "manager", "supervisor"]))
+    current_user: User = Depends(require_role(["admin", "manager", "supervisor"])),
+    warehouse_id: int | None = Depends(get_warehouse_id)
 ):
-    try:
-        df = pd.read_excel(file.file).fillna('')
-        if df.empty:
-            raise ValueError("Excel file is empty.")
-
-        po_number = str(df.iloc[0]["PO No."])
-        supplier_name = str(df.iloc[0]["Supplier Name"])
-        
-        # Corrected: Removed all references to warehouse_id
-        grn = inventory_models.GoodsReceipt(
-            po_number=po_number, 
-            supplier_name=supplier_name
-        )
-        db.add(grn)
-        db.flush()
+    """
+    Create a GRN from an uploaded sheet. With ``background=true`` the file is
+    queued and a 202 with the job is returned at once; poll /jobs/{id} for the result.
+    """
+    if background:
+        return job_queue.submit(db, JobKind.GOODS_RECEIPT_UPLOAD, file, current_user.id, warehouse_id)
 
-        items_to_add = []
-        for index, row in df.iterrows():
-            ean = str(row["EAN No."])
-            product = db.query(inventory_models.Product).filter(inventory_models.Product.ean == ean).first()
-            if not product:
-                raise ValueError(f"Product with EAN {ean} not found in row {index + 2}")
-            
-            item = inventory_models.GoodsReceiptItem(
-                goods_receipt_id=grn.id,
-                product_id=product.id,
-                quantity=row["Qty"],
-                batch=str(row["Batch"]) if row["Batch"] else None
-            )
-            items_to_add.append(item)
-        
-        db.bulk_save_objects(items_to_add)
+    try:
+        rows = read_rows(file)
+        grn = goods_receipt_import.create_goods_receipt(db, rows, warehouse_id=warehouse_id)
         db.commit()
         db.refresh(grn)
-        logger.info(f"Successfully created GRN {grn.id} for PO {po_number}")
+        logger.info(f"Successfully created GRN {grn.id} for PO {grn.po_number}")
         return grn
 
+    except HTTPException:
+        db.rollback()
+        raise
     except Exception as e:
         logger.error(f"Error processing GRN upload: {e}")
         db.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=400, detail=str(e))
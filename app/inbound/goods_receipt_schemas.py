@@ -18,6 +18,7 @@ class GoodsReceipt(BaseModel):
     id: int
     po_number: str
     supplier_name: str
+    warehouse_id: int
     status: GoodsReceiptStatus
     created_at: datetime
     items: List[GoodsReceiptItem] = []
@@ -1,11 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, selectinload
-from datetime import datetime, timezone
+from sqlalchemy.orm import Session
 
 from . import putaway_schemas
-from app.inventory import inventory_models
-from app.auth.dependencies import require_role, get_db
+from app.inventory import inventory_models, stock_ledger, stock_operations
+from app.inventory.location_cache import location_cache
+from app.auth.dependencies import require_role, get_db, get_warehouse_id
 from app.auth.auth_models import User
+from app.core import events
+from app.core.versioning import mark_site_changed
 
 router = APIRouter(
     tags=["Inbound - Putaway"]
@@ -15,64 +17,56 @@ router = APIRouter(
 def execute_putaway_item(
     item_data: putaway_schemas.PutawayItem,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_role(["admin", "manager", "supervisor", "operator"]))
+    current_user: User = Depends(require_role(["admin", "manager", "supervisor", "operator"])),
+    warehouse_id: int | None = Depends(get_warehouse_id)
 ):
-    grn_item = db.query(inventory_models.GoodsReceiptItem).options(
-        selectinload(inventory_models.GoodsReceiptItem.goods_receipt)
-        .selectinload(inventory_models.GoodsReceipt.items)
-    ).filter(
-        inventory_models.GoodsReceiptItem.id == item_data.receipt_item_id
-    ).first()
-
-    if not grn_item or grn_item.status == inventory_models.GRNItemStatus.COMPLETED:
-        raise HTTPException(status_code=400, detail="Item is invalid or already put away.")
-
-    remaining_qty = grn_item.quantity - grn_item.putaway_quantity
-    if item_data.quantity > remaining_qty:
+    # Claim the quantity on the GRN line first: the conditional UPDATE locks the
+    # line, so concurrent scans of the same line serialize instead of overshooting.
+    grn_item = stock_operations.claim_putaway_quantity(
+        db, item_data.receipt_item_id, item_data.quantity, current_user.id, item_data.putaway_location_id,
+        warehouse_id,
+    )
+    if grn_item is None:
+        existing = db.query(inventory_models.GoodsReceiptItem).filter(
+            inventory_models.GoodsReceiptItem.id == item_data.receipt_item_id
+        ).first()
+        if existing and warehouse_id is not None and existing.goods_receipt.warehouse_id != warehouse_id:
+            raise HTTPException(status_code=404, detail="Goods receipt item not found.")
+        if not existing or existing.status == inventory_models.GRNItemStatus.COMPLETED:
+            raise HTTPException(status_code=400, detail="Item is invalid or already put away.")
+        location = location_cache.snapshot(db).by_id.get(item_data.putaway_location_id)
+        if location is not None and location.warehouse_id != existing.goods_receipt.warehouse_id:
+            raise HTTPException(status_code=400, detail="Putaway location is not in the receipt's warehouse.")
+        remaining_qty = existing.quantity - existing.putaway_quantity - (existing.crossdock_quantity or 0)
         raise HTTPException(status_code=400, detail=f"Putaway quantity ({item_data.quantity}) cannot exceed remaining quantity ({remaining_qty}).")
 
-    # --- UPDATED LOGIC ---
     # Find inventory only if product, location, batch, AND mfg_date match
-    inventory_item = db.query(inventory_models.Inventory).filter(
-        inventory_models.Inventory.product_id == item_data.product_id,
-        inventory_models.Inventory.location_id == item_data.putaway_location_id,
-        inventory_models.Inventory.batch == item_data.batch,
-        inventory_models.Inventory.mfg_date == item_data.mfg_date
-    ).first()
-
-    if inventory_item:
-        inventory_item.quantity += item_data.quantity
-    else:
-        inventory_item = inventory_models.Inventory(
-            product_id=item_data.product_id, location_id=item_data.putaway_location_id,
-            quantity=item_data.quantity, batch=item_data.batch,
-            mfg_date=item_data.mfg_date, exp_date=item_data.exp_date
-        )
-        db.add(inventory_item)
-    
-    db.flush() 
+    inventory_item = stock_operations.add_stock(
+        db, product_id=item_data.product_id, location_id=item_data.putaway_location_id,
+        quantity=item_data.quantity, batch=item_data.batch,
+        mfg_date=item_data.mfg_date, exp_date=item_data.exp_date
+    )
 
     log_entry = inventory_models.PutawayLog(
         goods_receipt_item_id=grn_item.id,
         inventory_id=inventory_item.id,
+        location_id=inventory_item.location_id,
+        batch=inventory_item.batch,
+        mfg_date=inventory_item.mfg_date,
+        exp_date=inventory_item.exp_date,
         quantity=item_data.quantity,
         putaway_by_user_id=current_user.id
     )
     db.add(log_entry)
-
-    grn_item.putaway_quantity += item_data.quantity
-    if grn_item.putaway_quantity >= grn_item.quantity:
-        grn_item.status = inventory_models.GRNItemStatus.COMPLETED
-    
-    db.commit()
-
-    parent_grn = grn_item.goods_receipt
-    all_items_completed = all(
-        item.status == inventory_models.GRNItemStatus.COMPLETED for item in parent_grn.items
+    stock_ledger.record_inventory_movement(
+        db, inventory_item, item_data.quantity, inventory_models.MovementTypeEnum.PUTAWAY,
+        reference_type="goods_receipt_item", reference_id=grn_item.id, user_id=current_user.id
     )
 
-    if all_items_completed:
-        parent_grn.status = inventory_models.GoodsReceiptStatus.COMPLETED
-        db.commit()
+    events.publish(db, events.INVENTORY_CHANGED, location_id=inventory_item.location_id, product_id=inventory_item.product_id)
+    if grn_item.receipt_completed:
+        events.publish(db, events.RECEIPT_COMPLETED, goods_receipt_id=grn_item.goods_receipt_id)
 
-    return {"message": f"Item {grn_item.product.name} put away successfully."}
\ No newline at end of file
+    mark_site_changed(db, "goods_receipts", [grn_item.warehouse_id])
+    db.commit()
+    return {"message": f"Item {grn_item.product_name} put away successfully."}
@@ -0,0 +1,122 @@
+"""
+Time-based archival of completed documents.
+
+Completed pick lists and goods receipts older than ARCHIVE_AFTER_DAYS are moved,
+with their items and putaway log, into ``*_archive`` tables. These have the same
+columns and keep the original ids. The live tables then hold only recent and open
+work, which keeps the picking and putaway queries and the report scans small.
+
+Each batch is one transaction over at most ARCHIVE_BATCH_SIZE documents. Every
+table is moved by a single ``WITH moved AS (DELETE ... RETURNING *) INSERT INTO
+..._archive SELECT * FROM moved`` statement, so a row is never in both tables or
+in neither. Documents are claimed with ``FOR UPDATE SKIP LOCKED``, so a run never
+waits on one that a user is still working on.
+
+Reports read archived data only when asked. ``history(model, include_archived)``
+returns the live table, or a union of the live and archive tables, with the same
+column names. The archive tables are ordinary tables and can later be
+range-partitioned on ``archived_at`` without changing this module.
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, delete, insert, union_all
+from sqlalchemy.orm import Session
+
+from . import inventory_models
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.versioning import mark_site_changed
+
+logger = logging.getLogger(__name__)
+
+PickList = inventory_models.PickList
+PickListItem = inventory_models.PickListItem
+GoodsReceipt = inventory_models.GoodsReceipt
+GoodsReceiptItem = inventory_models.GoodsReceiptItem
+PutawayLog = inventory_models.PutawayLog
+
+ARCHIVES = {
+    PickList: inventory_models.PickListArchive,
+    PickListItem: inventory_models.PickListItemArchive,
+    GoodsReceipt: inventory_models.GoodsReceiptArchive,
+    GoodsReceiptItem: inventory_models.GoodsReceiptItemArchive,
+    PutawayLog: inventory_models.PutawayLogArchive,
+}
+
+
+def history(model, include_archived: bool = False):
+    """The live table, or live plus archived rows as one subquery with the same columns."""
+    live = model.__table__
+    if not include_archived:
+        return live
+    archive = ARCHIVES[model]
+    return union_all(
+        select(*live.columns),
+        select(*(archive.c[column.name] for column in live.columns)),
+    ).subquery(f"{live.name}_history")
+
+
+def _move(db: Session, model, condition) -> int:
+    """Move the rows matching ``condition`` into the model's archive table; returns the row count."""
+    live = model.__table__
+    names = [column.name for column in live.columns]
+    moved = delete(live).where(condition).returning(*live.columns).cte(f"moved_{live.name}")
+    return db.execute(insert(ARCHIVES[model]).from_select(names, select(*moved.c))).rowcount
+
+
+def _claim(db: Session, model, completed, before: datetime, batch_size: int) -> tuple[list[int], set[int]]:
+    """Ids of one batch of archivable documents, and the warehouses they belong to."""
+    rows = db.execute(
+        select(model.id, model.warehouse_id)
+        .where(model.status == completed, model.created_at < before)
+        .order_by(model.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ).all()
+    return [row.id for row in rows], {row.warehouse_id for row in rows}
+
+
+def archive_pick_lists(db: Session, before: datetime, batch_size: int) -> int:
+    """Archive one batch of completed pick lists created before ``before``; returns how many."""
+    ids, sites = _claim(db, PickList, inventory_models.PickListStatus.COMPLETED, before, batch_size)
+    if not ids:
+        return 0
+    _move(db, PickListItem, PickListItem.picklist_id.in_(ids))
+    _move(db, PickList, PickList.id.in_(ids))
+    mark_site_changed(db, "pick_lists", sites)
+    return len(ids)
+
+
+def archive_goods_receipts(db: Session, before: datetime, batch_size: int) -> int:
+    """Archive one batch of completed goods receipts created before ``before``; returns how many."""
+    ids, sites = _claim(db, GoodsReceipt, inventory_models.GoodsReceiptStatus.COMPLETED, before, batch_size)
+    if not ids:
+        return 0
+    item_ids = select(GoodsReceiptItem.id).where(GoodsReceiptItem.goods_receipt_id.in_(ids))
+    _move(db, PutawayLog, PutawayLog.goods_receipt_item_id.in_(item_ids))
+    _move(db, GoodsReceiptItem, GoodsReceiptItem.goods_receipt_id.in_(ids))
+    _move(db, GoodsReceipt, GoodsReceipt.id.in_(ids))
+    mark_site_changed(db, "goods_receipts", sites)
+    return len(ids)
+
+
+def archive_completed(older_than_days: int | None = None, batch_size: int | None = None) -> dict[str, int]:
+    """Archive everything eligible, one committed batch at a time. Returns document counts."""
+    days = settings.ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    before = datetime.now(timezone.utc) - timedelta(days=days)
+    totals = {"pick_lists": 0, "goods_receipts": 0}
+    for name, archive_batch in (("pick_lists", archive_pick_lists), ("goods_receipts", archive_goods_receipts)):
+        while True:
+            db = SessionLocal()
+            try:
+                moved = archive_batch(db, before, batch_size)
+                db.commit()
+            finally:
+                db.close()
+            totals[name] += moved
+            if moved < batch_size:
+                break
+            logger.info(f"Archived {totals[name]} {name} so far")
+    return totals
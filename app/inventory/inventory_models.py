@@ -1,5 +1,5 @@
 import enum
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Enum, UniqueConstraint, DateTime, Date
+from sqlalchemy import Column, Integer, BigInteger, String, Float, ForeignKey, Enum, UniqueConstraint, Index, DateTime, Date, Computed, Table, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -43,7 +43,32 @@ class PickListItemStatus(str, enum.Enum):
     PENDING = "Pending"
     PICKED = "Picked"
 
+class MovementTypeEnum(str, enum.Enum):
+    PUTAWAY = "Putaway"
+    PICK = "Pick"
+    ADJUSTMENT = "Adjustment"
+    REMOVAL = "Removal"
+    CYCLE_COUNT = "Cycle Count"
+    REPLENISHMENT = "Replenishment"
+
+class ReplenishmentStatus(str, enum.Enum):
+    OPEN = "Open"
+    DONE = "Done"
+    CANCELLED = "Cancelled"
+
+class CrossDockStatus(str, enum.Enum):
+    OPEN = "Open"
+    DONE = "Done"
+    CANCELLED = "Cancelled"
+
 # --- Master Data Models ---
+class Warehouse(Base):
+    """A site. Locations, stock and documents belong to exactly one; products are shared."""
+    __tablename__ = "warehouses"
+    id = Column(Integer, primary_key=True, index=True)
+    code = Column(String, unique=True, nullable=False)
+    name = Column(String, nullable=False)
+
 class Product(Base):
     __tablename__ = "products"
     id = Column(Integer, primary_key=True, index=True)
@@ -56,16 +81,24 @@ class Product(Base):
     case_size = Column(Integer, default=1)
     min_qty = Column(Float, default=0.0)
     max_qty = Column(Float, default=0.0)
+    # Sync cursor: id of the last transaction that wrote the row (trigger-maintained; app/sync/delta_sync.py).
+    change_seq = Column(BigInteger, server_default=text("0"), nullable=False, index=True)
     inventory_items = relationship("Inventory", back_populates="product")
 
 class Location(Base):
     __tablename__ = "locations"
     id = Column(Integer, primary_key=True, index=True)
-    code = Column(String, unique=True, index=True, nullable=False)
+    code = Column(String, index=True, nullable=False)  # unique within its warehouse
     location_type = Column(String, default='Storage Bin')
+    warehouse_id = Column(Integer, ForeignKey("warehouses.id"), nullable=False, server_default=text("1"))
     max_weight = Column(Float, nullable=True)
     max_volume = Column(Float, nullable=True)
+    change_seq = Column(BigInteger, server_default=text("0"), nullable=False, index=True)
     inventory_items = relationship("Inventory", back_populates="location")
+    __table_args__ = (
+        UniqueConstraint("warehouse_id", "code", name="uq_locations_warehouse_code"),
+        Index("ix_locations_warehouse_type_code", "warehouse_id", "location_type", "code"),
+    )
 
 # --- Transactional Data Models ---
 class Inventory(Base):
@@ -73,43 +106,72 @@ class Inventory(Base):
     id = Column(Integer, primary_key=True, index=True)
     quantity = Column(Float, nullable=False)
     reserved_quantity = Column(Float, default=0.0)
+    # Maintained by the database on every write, so no code path can let it drift.
+    available_quantity = Column(Float, Computed("quantity - COALESCE(reserved_quantity, 0)", persisted=True))
     batch = Column(String, nullable=True)
     mfg_date = Column(Date, nullable=True)
     exp_date = Column(Date, nullable=True)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
-    location_id = Column(Integer, ForeignKey("locations.id"), nullable=False)
+    location_id = Column(Integer, ForeignKey("locations.id"), nullable=False, index=True)
+    # Copied from the location when the row is created (stock_operations.add_stock).
+    warehouse_id = Column(Integer, ForeignKey("warehouses.id"), nullable=False, server_default=text("1"))
     product = relationship("Product", back_populates="inventory_items")
     location = relationship("Location", back_populates="inventory_items")
-    __table_args__ = (UniqueConstraint('product_id', 'location_id', 'batch', 'mfg_date', name='_inventory_uc'),)
+    __table_args__ = (
+        UniqueConstraint('product_id', 'location_id', 'batch', 'mfg_date', name='_inventory_uc'),
+        # Allocation: only rows with free stock at one site, already in FEFO order.
+        Index(
+            "ix_inventory_warehouse_available_fefo", "warehouse_id", "product_id", "exp_date", "quantity",
+            postgresql_where=text("available_quantity > 0"),
+        ),
+        Index("ix_inventory_warehouse_location", "warehouse_id", "location_id"),
+    )
 
 class GoodsReceipt(Base):
     __tablename__ = "goods_receipts"
     id = Column(Integer, primary_key=True, index=True)
     po_number = Column(String, index=True)
     supplier_name = Column(String)
+    warehouse_id = Column(Integer, ForeignKey("warehouses.id"), nullable=False, server_default=text("1"))
     status = Column(Enum(GoodsReceiptStatus, native_enum=False), default=GoodsReceiptStatus.PENDING_PUTAWAY)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Lines still pending; maintained by the same statement that closes a line (stock_operations.py).
+    open_items = Column(Integer, nullable=False, default=0, server_default=text("0"))
+    change_seq = Column(BigInteger, server_default=text("0"), nullable=False, index=True)
     items = relationship("GoodsReceiptItem", back_populates="goods_receipt")
+    __table_args__ = (
+        # Archival: completed receipts by age.
+        Index("ix_goods_receipts_completed_created_at", "created_at", postgresql_where=text("status = 'COMPLETED'")),
+        Index("ix_goods_receipts_warehouse_status", "warehouse_id", "status", "created_at"),
+    )
 
 class GoodsReceiptItem(Base):
     __tablename__ = "goods_receipt_items"
     id = Column(Integer, primary_key=True, index=True)
-    goods_receipt_id = Column(Integer, ForeignKey("goods_receipts.id"))
+    goods_receipt_id = Column(Integer, ForeignKey("goods_receipts.id"), index=True)
     product_id = Column(Integer, ForeignKey("products.id"))
     quantity = Column(Float, nullable=False)
     putaway_quantity = Column(Float, default=0.0, nullable=False)
+    crossdock_quantity = Column(Float, default=0.0, server_default=text("0"), nullable=False)  # on cross-dock tasks
     batch = Column(String, nullable=True)
     status = Column(Enum(GRNItemStatus, native_enum=False), default=GRNItemStatus.PENDING)
     putaway_by_user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     putaway_at = Column(DateTime(timezone=True), nullable=True)
+    change_seq = Column(BigInteger, server_default=text("0"), nullable=False, index=True)
     goods_receipt = relationship("GoodsReceipt", back_populates="items")
     product = relationship("Product")
 
 class PutawayLog(Base):
     __tablename__ = "putaway_log"
     id = Column(Integer, primary_key=True, index=True)
-    goods_receipt_item_id = Column(Integer, ForeignKey("goods_receipt_items.id"))
+    goods_receipt_item_id = Column(Integer, ForeignKey("goods_receipt_items.id"), index=True)
     inventory_id = Column(Integer, ForeignKey("inventory.id"))
+    # Stock identity at putaway, kept because the inventory row is deleted once it empties
+    # and no longer referenced (for example after this log is archived).
+    location_id = Column(Integer, nullable=True)
+    batch = Column(String, nullable=True)
+    mfg_date = Column(Date, nullable=True)
+    exp_date = Column(Date, nullable=True)
     quantity = Column(Float, nullable=False)
     putaway_by_user_id = Column(Integer, ForeignKey("users.id"))
     putaway_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -121,25 +183,180 @@ class PickList(Base):
     id = Column(Integer, primary_key=True, index=True)
     obd_number = Column(String, unique=True, index=True)
     customer_name = Column(String)
+    warehouse_id = Column(Integer, ForeignKey("warehouses.id"), nullable=False, server_default=text("1"))
     status = Column(Enum(PickListStatus, native_enum=False), default=PickListStatus.PENDING)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    open_items = Column(Integer, nullable=False, default=0, server_default=text("0"))
+    change_seq = Column(BigInteger, server_default=text("0"), nullable=False, index=True)
     items = relationship("PickListItem", back_populates="picklist")
+    __table_args__ = (
+        # Archival: completed pick lists by age.
+        Index("ix_pick_lists_completed_created_at", "created_at", postgresql_where=text("status = 'COMPLETED'")),
+        Index("ix_pick_lists_warehouse_status", "warehouse_id", "status", "created_at"),
+    )
 
 class PickListItem(Base):
     __tablename__ = "pick_list_items"
     id = Column(Integer, primary_key=True, index=True)
-    picklist_id = Column(Integer, ForeignKey("pick_lists.id"))
+    picklist_id = Column(Integer, ForeignKey("pick_lists.id"), index=True)
     product_id = Column(Integer, ForeignKey("products.id"))
     location_id = Column(Integer, ForeignKey("locations.id"), nullable=True)
     required_quantity = Column(Float, nullable=False)
     allocated_quantity = Column(Float, nullable=False)
     picked_quantity = Column(Float, default=0.0)
+    crossdock_quantity = Column(Float, default=0.0, server_default=text("0"), nullable=False)  # shortfall covered from the dock
     batch = Column(String, nullable=True)
     notes = Column(String, nullable=True)
     status = Column(Enum(PickListItemStatus, native_enum=False), default=PickListItemStatus.PENDING)
     picked_by_user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     picked_at = Column(DateTime(timezone=True), nullable=True)
+    change_seq = Column(BigInteger, server_default=text("0"), nullable=False, index=True)
     
     picklist = relationship("PickList", back_populates="items")
     product = relationship("Product")
-    location = relationship("Location")
\ No newline at end of file
+    location = relationship("Location")
+
+# --- Stock Ledger Models ---
+class StockMovement(Base):
+    """Append-only record of every change to on-hand inventory (quantity is signed)."""
+    __tablename__ = "stock_movements"
+    id = Column(BigInteger, primary_key=True)
+    # No foreign keys: history must outlive deleted products and locations.
+    product_id = Column(Integer, nullable=False)
+    location_id = Column(Integer, nullable=False)
+    batch = Column(String, nullable=True)
+    mfg_date = Column(Date, nullable=True)
+    exp_date = Column(Date, nullable=True)
+    quantity = Column(Float, nullable=False)
+    movement_type = Column(String, nullable=False)
+    reference_type = Column(String, nullable=True)
+    reference_id = Column(Integer, nullable=True)
+    user_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    # Inserting transaction; snapshots fold movements by it (NULL for rows older than the column).
+    xact_id = Column(BigInteger, server_default=text("pg_current_xact_id()::text::bigint"), nullable=True)
+    __table_args__ = (
+        Index("ix_stock_movements_created_at", "created_at"),
+        Index("ix_stock_movements_product_location", "product_id", "location_id"),
+        Index("ix_stock_movements_xact_id", "xact_id"),
+    )
+
+class StockSnapshot(Base):
+    """
+    Compacted stock position: all movements from transactions below xact_horizon
+    (or, for snapshots older than that column, up to and including last_movement_id).
+    """
+    __tablename__ = "stock_snapshots"
+    id = Column(Integer, primary_key=True, index=True)
+    as_of = Column(DateTime(timezone=True), nullable=False, index=True)
+    last_movement_id = Column(BigInteger, nullable=False)  # highest movement id folded in
+    xact_horizon = Column(BigInteger, nullable=True)
+    line_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class StockSnapshotLine(Base):
+    __tablename__ = "stock_snapshot_lines"
+    id = Column(BigInteger, primary_key=True)
+    snapshot_id = Column(Integer, ForeignKey("stock_snapshots.id", ondelete="CASCADE"), nullable=False, index=True)
+    product_id = Column(Integer, nullable=False)
+    location_id = Column(Integer, nullable=False)
+    batch = Column(String, nullable=True)
+    mfg_date = Column(Date, nullable=True)
+    exp_date = Column(Date, nullable=True)
+    quantity = Column(Float, nullable=False)
+
+# --- Replenishment ---
+class ReplenishmentTask(Base):
+    """Move stock from a Storage Bin to a Picking Location. The source quantity is reserved while open."""
+    __tablename__ = "replenishment_tasks"
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    from_location_id = Column(Integer, ForeignKey("locations.id"), nullable=False)
+    to_location_id = Column(Integer, ForeignKey("locations.id"), nullable=True)  # chosen on completion when unknown
+    warehouse_id = Column(Integer, ForeignKey("warehouses.id"), nullable=False, server_default=text("1"))
+    # The exact inventory row holding the reservation. No foreign key: the row may be
+    # deleted by a stock correction while the task is open.
+    inventory_id = Column(Integer, nullable=True)
+    batch = Column(String, nullable=True)
+    mfg_date = Column(Date, nullable=True)
+    exp_date = Column(Date, nullable=True)
+    quantity = Column(Float, nullable=False)
+    status = Column(Enum(ReplenishmentStatus, native_enum=False), nullable=False, default=ReplenishmentStatus.OPEN)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+    completed_by_user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    product = relationship("Product")
+    from_location = relationship("Location", foreign_keys=[from_location_id])
+    to_location = relationship("Location", foreign_keys=[to_location_id])
+    __table_args__ = (
+        Index("ix_replenishment_tasks_open", "warehouse_id", "product_id", postgresql_where=text("status = 'OPEN'")),
+    )
+
+# --- Cross-docking ---
+class CrossDockTask(Base):
+    """Carry received stock straight from the dock to packing for a pick list shortfall."""
+    __tablename__ = "crossdock_tasks"
+    id = Column(Integer, primary_key=True, index=True)
+    # No foreign keys to the document lines: archival moves them, tasks stay.
+    goods_receipt_item_id = Column(Integer, nullable=False, index=True)
+    pick_list_item_id = Column(Integer, nullable=False, index=True)
+    warehouse_id = Column(Integer, ForeignKey("warehouses.id"), nullable=False, server_default=text("1"))
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    batch = Column(String, nullable=True)
+    quantity = Column(Float, nullable=False)
+    status = Column(Enum(CrossDockStatus, native_enum=False), nullable=False, default=CrossDockStatus.OPEN)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+    completed_by_user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    product = relationship("Product")
+    __table_args__ = (
+        Index("ix_crossdock_tasks_open", "warehouse_id", "product_id", postgresql_where=text("status = 'OPEN'")),
+    )
+
+# --- Sync deletions (app/sync/delta_sync.py) ---
+class SyncDeletion(Base):
+    """Tombstone written by a trigger when a synced row is deleted (or archived)."""
+    __tablename__ = "sync_deletions"
+    id = Column(BigInteger, primary_key=True)
+    table_name = Column(String, nullable=False)
+    row_id = Column(Integer, nullable=False)
+    change_seq = Column(BigInteger, nullable=False, index=True)
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+# --- Archive tables (app/inventory/archival.py) ---
+def _archive_table(model, *indexes):
+    """
+    Same columns as the live table, keeping the original ids, plus archived_at.
+    No foreign keys: archived history outlives the rows it pointed to.
+    """
+    live = model.__table__
+    return Table(
+        f"{live.name}_archive", Base.metadata,
+        *(Column(column.name, column.type.copy(), primary_key=column.primary_key, nullable=column.nullable)
+          for column in live.columns),
+        Column("archived_at", DateTime(timezone=True), server_default=func.now(), nullable=False),
+        *indexes,
+    )
+
+PickListArchive = _archive_table(
+    PickList,
+    Index("ix_pick_lists_archive_obd_number", "obd_number"),
+    Index("ix_pick_lists_archive_created_at", "created_at"),
+)
+PickListItemArchive = _archive_table(
+    PickListItem,
+    Index("ix_pick_list_items_archive_picklist_id", "picklist_id"),
+    Index("ix_pick_list_items_archive_picked_at", "picked_at"),
+)
+GoodsReceiptArchive = _archive_table(
+    GoodsReceipt,
+    Index("ix_goods_receipts_archive_created_at", "created_at"),
+)
+GoodsReceiptItemArchive = _archive_table(
+    GoodsReceiptItem,
+    Index("ix_goods_receipt_items_archive_goods_receipt_id", "goods_receipt_id"),
+)
+PutawayLogArchive = _archive_table(
+    PutawayLog,
+    Index("ix_putaway_log_archive_goods_receipt_item_id", "goods_receipt_item_id"),
+)
@@ -1,10 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Query
+from sqlalchemy import or_, tuple_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from typing import List
 
-from . import inventory_models, inventory_schemas
-from app.auth.dependencies import get_current_user, get_db
+from . import inventory_models, inventory_schemas, product_import
+from .product_cache import mark_products_changed
+from app.auth.dependencies import get_current_user, get_db, require_role
 from app.auth import auth_models
+from app.core import repository
+from app.core.pagination import encode_cursor, decode_cursor, escape_like
+from app.core.spreadsheets import read_rows
 
 router = APIRouter(
     tags=["Products"]
@@ -16,26 +22,99 @@ def create_product(
     db: Session = Depends(get_db),
     current_user: auth_models.User = Depends(get_current_user)
 ):
-    if db.query(inventory_models.Product).filter(inventory_models.Product.ean == product.ean).first():
+    if repository.product_by_ean(db, product.ean):
         raise HTTPException(status_code=400, detail="EAN already registered")
-    if db.query(inventory_models.Product).filter(inventory_models.Product.material_code == product.material_code).first():
+    if repository.product_by_material_code(db, product.material_code):
         raise HTTPException(status_code=400, detail="Material Code already registered")
     
     new_product = inventory_models.Product(**product.model_dump())
     db.add(new_product)
+    mark_products_changed(db)
     db.commit()
     db.refresh(new_product)
     return new_product
 
+@router.post("/products/upload/", response_model=inventory_schemas.ProductImportReport)
+def upload_products(
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user: auth_models.User = Depends(require_role(["admin", "manager", "supervisor"]))
+):
+    """
+    Bulk create or update products from an Excel/CSV product master with the columns
+    EAN No., Material, Description, Brand, UOM, MRP, Case Size, Min Qty, Max Qty.
+    Existing EANs are updated; invalid rows are rejected and reported without
+    blocking the rest of the sheet.
+    """
+    rows = read_rows(file)
+    if not rows:
+        raise HTTPException(status_code=400, detail="File is empty.")
+
+    try:
+        report = product_import.import_products(db, rows)
+        mark_products_changed(db)
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=f"Conflicting product master data: {e.orig}")
+    return report
+
 @router.get("/products/", response_model=List[inventory_schemas.Product])
 def read_products(
     skip: int = 0, 
     limit: int = 100, 
+    after_id: int | None = None,
+    db: Session = Depends(get_db),
+    current_user: auth_models.User = Depends(get_current_user)
+):
+    """
+    List products by ID. Prefer ``after_id`` (the last ID of the previous page)
+    over ``skip``: it seeks on the primary key instead of scanning skipped rows.
+    """
+    query = db.query(inventory_models.Product).order_by(inventory_models.Product.id)
+    if after_id is not None:
+        query = query.filter(inventory_models.Product.id > after_id)
+    else:
+        query = query.offset(skip)
+    return query.limit(limit).all()
+
+@router.get("/products/search", response_model=inventory_schemas.ProductSearchPage)
+def search_products(
+    q: str | None = Query(None, min_length=1, description="EAN or material code prefix, or part of the name"),
+    brand: List[inventory_models.BrandEnum] = Query([]),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str | None = None,
     db: Session = Depends(get_db),
     current_user: auth_models.User = Depends(get_current_user)
 ):
-    products = db.query(inventory_models.Product).offset(skip).limit(limit).all()
-    return products
+    """
+    Typeahead search ordered by name. EAN and material code match by prefix
+    (text_pattern_ops indexes); the name matches anywhere (trigram index).
+    Pages are keyset-paginated on (name, id) via ``next_cursor``.
+    """
+    Product = inventory_models.Product
+    query = db.query(Product)
+
+    if q:
+        prefix = escape_like(q.strip()) + "%"
+        query = query.filter(or_(
+            Product.ean.like(prefix, escape="\\"),
+            Product.material_code.like(prefix, escape="\\"),
+            Product.name.icontains(q.strip(), autoescape=True),
+        ))
+    if brand:
+        query = query.filter(Product.brand.in_([b.value for b in brand]))
+    if cursor:
+        last_name, last_id = decode_cursor(cursor, 2)
+        query = query.filter(tuple_(Product.name, Product.id) > (last_name, last_id))
+
+    # Fetch one extra row to know whether another page exists.
+    products = query.order_by(Product.name, Product.id).limit(limit + 1).all()
+    next_cursor = None
+    if len(products) > limit:
+        products = products[:limit]
+        next_cursor = encode_cursor(products[-1].name, products[-1].id)
+    return {"items": products, "next_cursor": next_cursor}
 
 @router.put("/products/{product_id}", response_model=inventory_schemas.Product)
 def update_product(
@@ -53,6 +132,7 @@ def update_product(
         setattr(db_product, key, value)
         
     db.add(db_product)
+    mark_products_changed(db)
     db.commit()
     db.refresh(db_product)
     return db_product
@@ -68,5 +148,6 @@ def delete_product(
         raise HTTPException(status_code=404, detail="Product not found")
 
     db.delete(db_product)
+    mark_products_changed(db)
     db.commit()
     return None
\ No newline at end of file
@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from datetime import date
+from typing import List
 from .inventory_models import BrandEnum, UomEnum
 
 class ProductCreate(BaseModel):
@@ -36,10 +37,28 @@ class Product(BaseModel):
     class Config:
         from_attributes = True
 
+class ProductSearchPage(BaseModel):
+    items: List[Product]
+    next_cursor: str | None = None  # pass back as ?cursor= for the next page
+
+class ProductImportRow(BaseModel):
+    row: int  # spreadsheet row number, header is row 1
+    ean: str | None = None
+    result: str = "rejected"  # inserted | updated | rejected
+    product_id: int | None = None
+    errors: List[str] = []
+
+class ProductImportReport(BaseModel):
+    inserted: int
+    updated: int
+    rejected: int
+    rows: List[ProductImportRow]
+
 class Inventory(BaseModel):
     id: int
     quantity: float
     reserved_quantity: float | None = None
+    available_quantity: float | None = None
     batch: str | None = None
     mfg_date: date | None = None
     exp_date: date | None = None
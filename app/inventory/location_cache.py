@@ -0,0 +1,101 @@
+"""
+Versioned in-memory snapshot of the locations table.
+
+Handhelds fetch the location list on every screen load. The snapshot is rebuilt
+only when the ``locations`` generation counter moves, and each filtered listing
+is serialized once per version, so an unchanged list costs one primary-key read
+of ``table_versions`` (and a 304 when the client sends ``If-None-Match``).
+
+Codes are unique per warehouse, so ``by_code`` is keyed by (warehouse_id, code).
+"""
+import json
+import threading
+import time
+from typing import NamedTuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import inventory_models
+from app.core.http_cache import make_etag
+from app.core.versioning import get_version, mark_changed
+
+VERSION_NAME = "locations"
+
+
+class LocationRecord(NamedTuple):
+    id: int
+    code: str
+    location_type: str
+    warehouse_id: int
+
+
+class LocationSnapshot:
+    def __init__(self, version: int, records: list[LocationRecord]):
+        self.version = version
+        self.records = records
+        self.by_code = {(record.warehouse_id, record.code): record for record in records}
+        self.by_id = {record.id: record for record in records}
+        self._listings: dict[tuple[str | None, int | None], tuple[str, bytes]] = {}
+        self._lock = threading.Lock()
+
+    def find(self, code: str, warehouse_id: int) -> LocationRecord | None:
+        return self.by_code.get((warehouse_id, code))
+
+    def listing(self, location_type: str | None, warehouse_id: int | None = None) -> tuple[str, bytes]:
+        """(etag, JSON body) for the listing, optionally filtered by location type and warehouse."""
+        key = (location_type, warehouse_id)
+        cached = self._listings.get(key)
+        if cached is None:
+            rows = [
+                record._asdict() for record in self.records
+                if (location_type is None or record.location_type == location_type)
+                and (warehouse_id is None or record.warehouse_id == warehouse_id)
+            ]
+            etag = make_etag("locations", self.version, location_type or "all", warehouse_id or "all")
+            cached = (etag, json.dumps(rows, separators=(",", ":")).encode())
+            with self._lock:
+                self._listings[key] = cached
+        return cached
+
+
+class LocationCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot: LocationSnapshot | None = None
+        self._checked_at = 0.0
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+            self._checked_at = 0.0
+
+    def snapshot(self, db: Session, max_age: float = 0.0) -> LocationSnapshot:
+        """
+        Current snapshot. With ``max_age`` > 0 the version check is skipped if it
+        ran less than ``max_age`` seconds ago (for lookups that tolerate brief staleness).
+        """
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._checked_at < max_age:
+            return snapshot
+
+        version = get_version(db, VERSION_NAME)
+        if snapshot is None or snapshot.version != version:
+            Location = inventory_models.Location
+            rows = db.execute(
+                select(Location.id, Location.code, Location.location_type, Location.warehouse_id)
+                .order_by(Location.code)
+            )
+            snapshot = LocationSnapshot(version, [LocationRecord(*row) for row in rows])
+        with self._lock:
+            self._snapshot = snapshot
+            self._checked_at = time.monotonic()
+        return snapshot
+
+
+location_cache = LocationCache()
+
+
+def mark_locations_changed(db: Session) -> None:
+    """Call from location write paths just before commit."""
+    mark_changed(db, VERSION_NAME, on_commit=location_cache.invalidate)
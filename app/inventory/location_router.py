@@ -1,37 +1,91 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 from typing import List
 
-from . import inventory_models, location_schemas
-from app.auth.dependencies import require_role, get_db, get_current_user
+from . import inventory_models, location_schemas, warehouses
+from .location_cache import location_cache, mark_locations_changed
+from app.auth.dependencies import require_role, get_db, get_current_user, get_warehouse_id
 from app.auth import auth_models
+from app.core.http_cache import CACHE_CONTROL, etag_matches, not_modified
 
 router = APIRouter(
     tags=["Locations"]
 )
 
+def _site(body_warehouse_id: int | None, warehouse_id: int | None, current_user: auth_models.User) -> int:
+    """The warehouse to create bins in; users pinned to a home warehouse cannot name another."""
+    if body_warehouse_id is None:
+        return warehouses.resolve(warehouse_id)
+    if current_user.warehouse_id is not None and body_warehouse_id != current_user.warehouse_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You do not have access to this warehouse")
+    return body_warehouse_id
+
+def _get_location(db: Session, location_id: int, warehouse_id: int | None):
+    query = db.query(inventory_models.Location).filter(inventory_models.Location.id == location_id)
+    if warehouse_id is not None:
+        query = query.filter(inventory_models.Location.warehouse_id == warehouse_id)
+    return query.first()
+
 @router.post("/locations/", response_model=location_schemas.Location)
 def create_location(
     location: location_schemas.LocationCreate,
     db: Session = Depends(get_db),
-    current_user: auth_models.User = Depends(require_role("admin"))
+    current_user: auth_models.User = Depends(require_role("admin")),
+    warehouse_id: int | None = Depends(get_warehouse_id)
 ):
-    db_location = db.query(inventory_models.Location).filter(inventory_models.Location.code == location.code).first()
+    site = _site(location.warehouse_id, warehouse_id, current_user)
+    db_location = db.query(inventory_models.Location).filter(
+        inventory_models.Location.warehouse_id == site, inventory_models.Location.code == location.code
+    ).first()
     if db_location:
-        raise HTTPException(status_code=400, detail="Location code already exists")
+        raise HTTPException(status_code=400, detail="Location code already exists in this warehouse")
     
-    new_location = inventory_models.Location(**location.model_dump())
+    new_location = inventory_models.Location(**{**location.model_dump(), "warehouse_id": site})
     db.add(new_location)
+    mark_locations_changed(db)
     db.commit()
     db.refresh(new_location)
     return new_location
 
+@router.post("/locations/generate/", response_model=location_schemas.LocationRangeResult)
+def generate_locations(
+    location_range: location_schemas.LocationRangeCreate,
+    db: Session = Depends(get_db),
+    current_user: auth_models.User = Depends(require_role(["admin"])),
+    warehouse_id: int | None = Depends(get_warehouse_id)
+):
+    """
+    Create a whole range of bins in one INSERT. Codes that already exist in the warehouse are skipped.
+    """
+    codes = location_range.codes()
+    site = _site(location_range.warehouse_id, warehouse_id, current_user)
+    stmt = insert(inventory_models.Location).values([
+        {"code": code, "location_type": location_range.location_type.value, "warehouse_id": site} for code in codes
+    ]).on_conflict_do_nothing(constraint="uq_locations_warehouse_code").returning(inventory_models.Location.code)
+    created_codes = list(db.execute(stmt).scalars())
+    if created_codes:
+        mark_locations_changed(db)
+    db.commit()
+    return {"created": len(created_codes), "skipped": len(codes) - len(created_codes), "created_codes": created_codes}
+
 @router.get("/locations/", response_model=List[location_schemas.Location])
 def get_all_locations(
+    request: Request,
+    location_type: location_schemas.LocationTypeEnum | None = None,
     db: Session = Depends(get_db),
-    current_user: auth_models.User = Depends(get_current_user)
+    current_user: auth_models.User = Depends(get_current_user),
+    warehouse_id: int | None = Depends(get_warehouse_id)
 ):
-    return db.query(inventory_models.Location).all()
+    """
+    Served from an in-memory snapshot that is rebuilt only when locations change.
+    Send the returned ETag back as If-None-Match to get a 304 when nothing changed.
+    """
+    snapshot = location_cache.snapshot(db)
+    etag, body = snapshot.listing(location_type.value if location_type else None, warehouse_id)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return Response(content=body, media_type="application/json", headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
 
 
 @router.put("/locations/{location_id}", response_model=location_schemas.Location)
@@ -39,9 +93,10 @@ def update_location(
     location_id: int, 
     location_update: location_schemas.LocationUpdate, 
     db: Session = Depends(get_db), 
-    current_user: auth_models.User = Depends(require_role("admin"))
+    current_user: auth_models.User = Depends(require_role("admin")),
+    warehouse_id: int | None = Depends(get_warehouse_id)
 ):
-    db_location = db.query(inventory_models.Location).filter(inventory_models.Location.id == location_id).first()
+    db_location = _get_location(db, location_id, warehouse_id)
     if not db_location:
         raise HTTPException(status_code=404, detail="Location not found")
     
@@ -49,6 +104,7 @@ def update_location(
     for key, value in update_data.items():
         setattr(db_location, key, value)
         
+    mark_locations_changed(db)
     db.commit()
     db.refresh(db_location)
     return db_location
@@ -57,12 +113,14 @@ def update_location(
 def delete_location(
     location_id: int, 
     db: Session = Depends(get_db), 
-    current_user: auth_models.User = Depends(require_role("admin"))
+    current_user: auth_models.User = Depends(require_role("admin")),
+    warehouse_id: int | None = Depends(get_warehouse_id)
 ):
-    db_location = db.query(inventory_models.Location).filter(inventory_models.Location.id == location_id).first()
+    db_location = _get_location(db, location_id, warehouse_id)
     if not db_location:
         raise HTTPException(status_code=404, detail="Location not found")
 
     db.delete(db_location)
+    mark_locations_changed(db)
     db.commit()
     return None
\ No newline at end of file
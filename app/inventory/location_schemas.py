@@ -1,10 +1,11 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
+from typing import List
 from .inventory_models import LocationTypeEnum
 
 class LocationBase(BaseModel):
     code: str
     location_type: LocationTypeEnum
-    # warehouse_id removed
+    warehouse_id: int | None = None  # defaults to the request's warehouse
 
 class LocationCreate(LocationBase):
     pass
@@ -14,5 +15,39 @@ class LocationUpdate(BaseModel):
 
 class Location(LocationBase):
     id: int
+    warehouse_id: int
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class LocationRangeCreate(BaseModel):
+    """Generates codes like A-01-01 .. A-20-05 (aisle-rack-level)."""
+    aisle: str = Field(min_length=1)
+    rack_from: int = Field(ge=0)
+    rack_to: int = Field(ge=0)
+    level_from: int = Field(ge=0)
+    level_to: int = Field(ge=0)
+    digits: int = Field(2, ge=1, le=4)
+    separator: str = "-"
+    location_type: LocationTypeEnum = LocationTypeEnum.STORAGE_BIN
+    warehouse_id: int | None = None
+
+    @model_validator(mode="after")
+    def check_ranges(self):
+        if self.rack_from > self.rack_to or self.level_from > self.level_to:
+            raise ValueError("Range start must not be greater than range end")
+        count = (self.rack_to - self.rack_from + 1) * (self.level_to - self.level_from + 1)
+        if count > 10000:
+            raise ValueError(f"Range would create {count} locations; the limit is 10000 per request")
+        return self
+
+    def codes(self) -> List[str]:
+        return [
+            f"{self.aisle}{self.separator}{rack:0{self.digits}d}{self.separator}{level:0{self.digits}d}"
+            for rack in range(self.rack_from, self.rack_to + 1)
+            for level in range(self.level_from, self.level_to + 1)
+        ]
+
+class LocationRangeResult(BaseModel):
+    created: int
+    skipped: int  # codes that already existed
+    created_codes: List[str]
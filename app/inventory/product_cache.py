@@ -0,0 +1,163 @@
+"""
+In-process product index keyed by EAN and material code.
+
+The product master changes rarely but is resolved on every upload row and every
+scan. Records are kept as compact tuples in a bounded LRU. Local writes clear
+the index straight away; other workers notice the ``products`` generation
+counter in ``table_versions`` change within PRODUCT_CACHE_CHECK_SECONDS.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import inventory_models
+from app.core import repository
+from app.core.config import settings
+from app.core.versioning import get_version, mark_changed
+
+VERSION_NAME = "products"
+IN_CHUNK = 5000
+
+
+class ProductRecord(NamedTuple):
+    """One row of repository.PRODUCT_RECORD_COLUMNS, in the same order."""
+    id: int
+    ean: str
+    material_code: str
+    name: str
+    brand: str
+    uom: str
+    mrp: float
+    case_size: int
+    min_qty: float
+    max_qty: float
+
+
+_Product = inventory_models.Product
+_RECORD_COLUMNS = repository.PRODUCT_RECORD_COLUMNS
+
+
+class ProductIndex:
+    def __init__(self, max_entries: int, check_interval: float):
+        self.max_entries = max_entries
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._records: OrderedDict[int, ProductRecord] = OrderedDict()
+        self._by_ean: dict[str, int] = {}
+        self._by_material: dict[str, int] = {}
+        self._version = None
+        self._checked_at = 0.0
+
+    def __len__(self):
+        return len(self._records)
+
+    # --- freshness ---
+    def invalidate(self):
+        with self._lock:
+            self._records.clear()
+            self._by_ean.clear()
+            self._by_material.clear()
+            self._checked_at = 0.0
+
+    def ensure_fresh(self, db: Session):
+        if time.monotonic() - self._checked_at < self.check_interval:
+            return
+        version = get_version(db, VERSION_NAME)
+        with self._lock:
+            if version != self._version:
+                self._records.clear()
+                self._by_ean.clear()
+                self._by_material.clear()
+                self._version = version
+            self._checked_at = time.monotonic()
+
+    # --- internal LRU bookkeeping (caller holds the lock) ---
+    def _store(self, record: ProductRecord):
+        previous = self._records.get(record.id)
+        if previous is not None:
+            # An EAN or material code may have changed; drop the stale keys.
+            if self._by_ean.get(previous.ean) == record.id:
+                del self._by_ean[previous.ean]
+            if self._by_material.get(previous.material_code) == record.id:
+                del self._by_material[previous.material_code]
+        self._records[record.id] = record
+        self._records.move_to_end(record.id)
+        self._by_ean[record.ean] = record.id
+        self._by_material[record.material_code] = record.id
+        while len(self._records) > self.max_entries:
+            _, evicted = self._records.popitem(last=False)
+            self._by_ean.pop(evicted.ean, None)
+            self._by_material.pop(evicted.material_code, None)
+
+    def _get(self, key_map: dict, key: str):
+        with self._lock:
+            product_id = key_map.get(key)
+            record = self._records.get(product_id) if product_id is not None else None
+            if record is None:
+                return None
+            self._records.move_to_end(product_id)
+            return record
+
+    def _load(self, db: Session, statement, keys) -> list[ProductRecord]:
+        records = []
+        for start in range(0, len(keys), IN_CHUNK):
+            rows = db.execute(statement, {"b_keys": keys[start:start + IN_CHUNK]})
+            records.extend(ProductRecord(*row) for row in rows)
+        with self._lock:
+            for record in records:
+                self._store(record)
+        return records
+
+    # --- lookups ---
+    def get_by_ean(self, db: Session, ean: str) -> ProductRecord | None:
+        return self.get_many_by_ean(db, [ean]).get(ean)
+
+    def get_by_material_code(self, db: Session, material_code: str) -> ProductRecord | None:
+        self.ensure_fresh(db)
+        record = self._get(self._by_material, material_code)
+        if record is None:
+            loaded = self._load(db, repository.PRODUCT_RECORDS_BY_MATERIAL_CODE, [material_code])
+            record = loaded[0] if loaded else None
+        return record
+
+    def get_many_by_ean(self, db: Session, eans) -> dict[str, ProductRecord]:
+        """Resolve many EANs with at most one query per 5000 cache misses. Unknown EANs are omitted."""
+        self.ensure_fresh(db)
+        found, missing = {}, []
+        for ean in dict.fromkeys(eans):
+            record = self._get(self._by_ean, ean)
+            if record is None:
+                missing.append(ean)
+            else:
+                found[ean] = record
+        if missing:
+            found.update({record.ean: record for record in self._load(db, repository.PRODUCT_RECORDS_BY_EAN, missing)})
+        return found
+
+    def warm(self, db: Session) -> int:
+        """Preload up to max_entries products. Returns the number loaded."""
+        self.ensure_fresh(db)
+        rows = db.execute(select(*_RECORD_COLUMNS).order_by(_Product.id).limit(self.max_entries))
+        with self._lock:
+            for row in rows:
+                self._store(ProductRecord(*row))
+        return len(self)
+
+
+product_index = ProductIndex(
+    max_entries=settings.PRODUCT_CACHE_MAX_ENTRIES,
+    check_interval=settings.PRODUCT_CACHE_CHECK_SECONDS,
+)
+
+
+def mark_products_changed(db: Session) -> None:
+    """
+    Call from product write paths just before commit. This worker's index is
+    cleared once the transaction commits; other workers pick the change up via
+    the version stamp.
+    """
+    mark_changed(db, VERSION_NAME, on_commit=product_index.invalidate)
@@ -0,0 +1,129 @@
+"""
+Bulk product master import.
+
+Rows are validated against ``ProductCreate``, existing products are resolved with
+set-based lookups on EAN and material code, and the accepted rows are written
+with one ``INSERT ... ON CONFLICT (ean) DO UPDATE`` per chunk.
+"""
+from pydantic import ValidationError
+from sqlalchemy import or_, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from . import inventory_models, inventory_schemas
+from app.core.spreadsheets import cell_text
+
+# Spreadsheet header -> ProductCreate field
+PRODUCT_COLUMNS = {
+    "EAN No.": "ean",
+    "Material": "material_code",
+    "Description": "name",
+    "Brand": "brand",
+    "UOM": "uom",
+    "MRP": "mrp",
+    "Case Size": "case_size",
+    "Min Qty": "min_qty",
+    "Max Qty": "max_qty",
+}
+CODE_FIELDS = ("ean", "material_code")
+LOOKUP_CHUNK = 5000
+UPSERT_CHUNK = 2000
+
+
+def _row_to_fields(row: dict) -> dict:
+    fields = {}
+    for header, field in PRODUCT_COLUMNS.items():
+        value = row.get(header, "")
+        if field in CODE_FIELDS:
+            value = cell_text(value)
+        if value == "" or value is None:
+            continue
+        fields[field] = value
+    return fields
+
+
+def _format_errors(exc: ValidationError) -> list[str]:
+    return [f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in exc.errors()]
+
+
+def _existing_products(db: Session, eans: list[str], material_codes: list[str]):
+    Product = inventory_models.Product
+    by_ean, by_material = {}, {}
+    for start in range(0, max(len(eans), len(material_codes)), LOOKUP_CHUNK):
+        ean_chunk = eans[start:start + LOOKUP_CHUNK]
+        material_chunk = material_codes[start:start + LOOKUP_CHUNK]
+        rows = db.execute(
+            select(Product.id, Product.ean, Product.material_code).where(
+                or_(Product.ean.in_(ean_chunk), Product.material_code.in_(material_chunk))
+            )
+        ).all()
+        for product_id, ean, material_code in rows:
+            by_ean[ean] = (product_id, material_code)
+            by_material[material_code] = (product_id, ean)
+    return by_ean, by_material
+
+
+def import_products(db: Session, rows: list[dict]) -> inventory_schemas.ProductImportReport:
+    report_rows = []
+    accepted = {}  # ean -> (report row, validated values)
+    seen_materials = {}
+
+    for index, row in enumerate(rows):
+        line = inventory_schemas.ProductImportRow(row=index + 2, ean=cell_text(row.get("EAN No.")) or None)
+        report_rows.append(line)
+        try:
+            product = inventory_schemas.ProductCreate(**_row_to_fields(row))
+        except ValidationError as e:
+            line.result = "rejected"
+            line.errors = _format_errors(e)
+            continue
+
+        if product.ean in accepted:
+            line.result = "rejected"
+            line.errors = [f"Duplicate EAN {product.ean} (first seen in row {accepted[product.ean][0].row})"]
+            continue
+        if seen_materials.get(product.material_code, product.ean) != product.ean:
+            line.result = "rejected"
+            line.errors = [f"Material Code {product.material_code} repeated for another EAN in this file"]
+            continue
+
+        seen_materials[product.material_code] = product.ean
+        accepted[product.ean] = (line, product.model_dump(mode="json"))
+
+    by_ean, by_material = _existing_products(db, list(accepted), list(seen_materials))
+
+    to_write = []
+    for ean, (line, values) in accepted.items():
+        owner = by_material.get(values["material_code"])
+        if owner and owner[1] != ean:
+            line.result = "rejected"
+            line.errors = [f"Material Code {values['material_code']} already registered to EAN {owner[1]}"]
+            continue
+        line.result = "updated" if ean in by_ean else "inserted"
+        to_write.append(values)
+
+    # Only overwrite the columns the sheet actually carries; absent columns keep
+    # their current values on update instead of being reset to schema defaults.
+    headers = rows[0].keys() if rows else ()
+    update_fields = [PRODUCT_COLUMNS[h] for h in headers if h in PRODUCT_COLUMNS and h != "EAN No."]
+
+    Product = inventory_models.Product
+    product_ids = {}
+    for start in range(0, len(to_write), UPSERT_CHUNK):
+        stmt = insert(Product).values(to_write[start:start + UPSERT_CHUNK])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Product.ean],
+            set_={field: stmt.excluded[field] for field in update_fields},
+        ).returning(Product.id, Product.ean)
+        product_ids.update({ean: product_id for product_id, ean in db.execute(stmt)})
+
+    for line in report_rows:
+        if line.result != "rejected":
+            line.product_id = product_ids.get(line.ean)
+
+    return inventory_schemas.ProductImportReport(
+        inserted=sum(1 for line in report_rows if line.result == "inserted"),
+        updated=sum(1 for line in report_rows if line.result == "updated"),
+        rejected=sum(1 for line in report_rows if line.result == "rejected"),
+        rows=report_rows,
+    )
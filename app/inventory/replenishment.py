@@ -0,0 +1,314 @@
+"""
+Min/max replenishment of picking locations.
+
+A product needs replenishment in a warehouse when its stock across that site's
+Picking Location bins, plus the quantity already on the site's open
+replenishment tasks, is below ``min_qty``. It is then topped up to ``max_qty``
+from the same site's Storage Bin stock in FEFO order.
+
+Planning is one set-based statement, partitioned by (warehouse, product). A
+running sum over each partition's storage stock, in FEFO order, says how much
+each row must give. That statement is
+followed by one bulk INSERT of tasks and one executemany UPDATE that reserves
+the source quantity, so the reserved stock cannot be allocated twice. Each
+task records the inventory row it reserved; completing it takes the stock from
+that row and cancelling it releases the reservation there.
+
+The destination is the picking bin that last held the product, taken from the
+stock ledger. This also finds bins whose stock row was deleted when they
+emptied. If the product has never been in a picking bin, the destination is
+left empty and chosen when the task is completed.
+
+``replenish(db)`` plans every product at every site, ``replenish(db,
+warehouse_id=w)`` one site, and ``replenish(db, [product_id], w)`` is the
+incremental run after a pick. All work in the caller's transaction. They are
+serialized by advisory locks: a run over all sites excludes everything else, a
+site run excludes only runs at that site, and incremental runs only exclude
+each other for the same product.
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import select, insert, update, func, literal, bindparam, or_, true
+from sqlalchemy.orm import Session
+
+from . import inventory_models, stock_ledger, stock_operations
+from .location_cache import location_cache
+from app.core import events
+
+Inventory = inventory_models.Inventory
+Location = inventory_models.Location
+Product = inventory_models.Product
+ReplenishmentTask = inventory_models.ReplenishmentTask
+StockMovement = inventory_models.StockMovement
+Warehouse = inventory_models.Warehouse
+
+PICKING = inventory_models.LocationTypeEnum.PICKING_LOCATION.value
+STORAGE = inventory_models.LocationTypeEnum.STORAGE_BIN.value
+
+# pg_advisory_xact_lock(namespace, key): key 0 is the run over all sites, negative
+# keys are single-site runs (-warehouse_id) and positive keys are product ids.
+LOCK_NAMESPACE = 4301
+FULL_RUN_KEY = 0
+
+
+def _lock(db: Session, product_ids: list[int] | None, warehouse_id: int | None) -> None:
+    if warehouse_id is None and product_ids is None:
+        db.execute(select(func.pg_advisory_xact_lock(LOCK_NAMESPACE, FULL_RUN_KEY)))
+        return
+    if warehouse_id is None:
+        # An incremental run over every site: exclude site runs too.
+        db.execute(select(func.pg_advisory_xact_lock(LOCK_NAMESPACE, FULL_RUN_KEY)))
+        return
+    db.execute(select(func.pg_advisory_xact_lock_shared(LOCK_NAMESPACE, FULL_RUN_KEY)))
+    if product_ids is None:
+        db.execute(select(func.pg_advisory_xact_lock(LOCK_NAMESPACE, -warehouse_id)))
+        return
+    db.execute(select(func.pg_advisory_xact_lock_shared(LOCK_NAMESPACE, -warehouse_id)))
+    for product_id in sorted(set(product_ids)):
+        db.execute(select(func.pg_advisory_xact_lock(LOCK_NAMESPACE, product_id)))
+
+
+def plan_statement(product_ids: list[int] | None = None, warehouse_id: int | None = None):
+    """
+    Rows of (inventory_id, warehouse_id, product_id, from_location_id, to_location_id,
+    batch, mfg_date, exp_date, quantity).
+    """
+    def scoped(stmt, product_column, warehouse_column):
+        if product_ids is not None:
+            stmt = stmt.where(product_column.in_(product_ids))
+        if warehouse_id is not None:
+            stmt = stmt.where(warehouse_column == warehouse_id)
+        return stmt
+
+    pick_stock = scoped(
+        select(Inventory.warehouse_id, Inventory.product_id, func.sum(Inventory.quantity).label("quantity"))
+        .join(Location, Location.id == Inventory.location_id)
+        .where(Location.location_type == PICKING)
+        .group_by(Inventory.warehouse_id, Inventory.product_id),
+        Inventory.product_id, Inventory.warehouse_id,
+    ).cte("pick_stock")
+
+    open_tasks = scoped(
+        select(ReplenishmentTask.warehouse_id, ReplenishmentTask.product_id,
+               func.sum(ReplenishmentTask.quantity).label("quantity"))
+        .where(ReplenishmentTask.status == inventory_models.ReplenishmentStatus.OPEN)
+        .group_by(ReplenishmentTask.warehouse_id, ReplenishmentTask.product_id),
+        ReplenishmentTask.product_id, ReplenishmentTask.warehouse_id,
+    ).cte("open_tasks")
+
+    covered = func.coalesce(pick_stock.c.quantity, 0) + func.coalesce(open_tasks.c.quantity, 0)
+    needs = scoped(
+        select(Warehouse.id.label("warehouse_id"), Product.id.label("product_id"),
+               (Product.max_qty - covered).label("need"))
+        .join_from(Product, Warehouse, true())
+        .outerjoin(pick_stock, (pick_stock.c.product_id == Product.id) & (pick_stock.c.warehouse_id == Warehouse.id))
+        .outerjoin(open_tasks, (open_tasks.c.product_id == Product.id) & (open_tasks.c.warehouse_id == Warehouse.id))
+        .where(Product.min_qty > 0, covered < Product.min_qty, Product.max_qty > covered),
+        Product.id, Warehouse.id,
+    ).cte("needs")
+
+    # Picking bin at the site that last received or gave this product, per the ledger.
+    home = (
+        select(Location.warehouse_id, StockMovement.product_id, StockMovement.location_id)
+        .join(Location, Location.id == StockMovement.location_id)
+        .join(needs, (needs.c.product_id == StockMovement.product_id) & (needs.c.warehouse_id == Location.warehouse_id))
+        .where(Location.location_type == PICKING)
+        .order_by(Location.warehouse_id, StockMovement.product_id, StockMovement.id.desc())
+        .distinct(Location.warehouse_id, StockMovement.product_id)
+        .cte("home")
+    )
+
+    given_before = (
+        func.sum(Inventory.available_quantity).over(
+            partition_by=(Inventory.warehouse_id, Inventory.product_id),
+            order_by=(Inventory.exp_date.asc().nulls_last(), Inventory.id),
+        ) - Inventory.available_quantity
+    )
+    sources = (
+        select(
+            Inventory.id.label("inventory_id"), Inventory.warehouse_id, Inventory.product_id, Inventory.location_id,
+            Inventory.batch, Inventory.mfg_date, Inventory.exp_date,
+            Inventory.available_quantity.label("available"), needs.c.need,
+            given_before.label("given_before"),
+        )
+        .join(needs, (needs.c.product_id == Inventory.product_id) & (needs.c.warehouse_id == Inventory.warehouse_id))
+        .join(Location, Location.id == Inventory.location_id)
+        .where(Location.location_type == STORAGE, Inventory.available_quantity > 0)
+        .cte("sources")
+    )
+
+    return (
+        select(
+            sources.c.inventory_id, sources.c.warehouse_id, sources.c.product_id,
+            sources.c.location_id.label("from_location_id"), home.c.location_id.label("to_location_id"),
+            sources.c.batch, sources.c.mfg_date, sources.c.exp_date,
+            func.least(sources.c.available, sources.c.need - sources.c.given_before).label("quantity"),
+        )
+        .outerjoin(home, (home.c.product_id == sources.c.product_id) & (home.c.warehouse_id == sources.c.warehouse_id))
+        .where(sources.c.given_before < sources.c.need)
+        .order_by(sources.c.warehouse_id, sources.c.product_id, sources.c.given_before)
+    )
+
+
+def replenish(db: Session, product_ids: list[int] | None = None, warehouse_id: int | None = None) -> int:
+    """
+    Create replenishment tasks for every product below min (or just ``product_ids``),
+    at every site or only ``warehouse_id``; returns the count.
+    """
+    if product_ids is not None and not product_ids:
+        return 0
+    _lock(db, product_ids, warehouse_id)
+    plan = db.execute(plan_statement(product_ids, warehouse_id)).all()
+    if not plan:
+        return 0
+
+    db.execute(insert(ReplenishmentTask), [
+        dict(
+            warehouse_id=row.warehouse_id, inventory_id=row.inventory_id,
+            product_id=row.product_id, from_location_id=row.from_location_id, to_location_id=row.to_location_id,
+            batch=row.batch, mfg_date=row.mfg_date, exp_date=row.exp_date, quantity=row.quantity,
+            status=inventory_models.ReplenishmentStatus.OPEN,
+        )
+        for row in plan
+    ])
+    inventory = Inventory.__table__
+    db.execute(
+        update(inventory)
+        .where(inventory.c.id == bindparam("source_id"))
+        .values(reserved_quantity=func.coalesce(inventory.c.reserved_quantity, 0) + bindparam("reserve")),
+        [{"source_id": row.inventory_id, "reserve": row.quantity} for row in plan],
+    )
+    for location_id in sorted({row.from_location_id for row in plan}):
+        events.publish(db, events.INVENTORY_CHANGED, location_id=location_id)
+    return len(plan)
+
+
+def replenish_after_pick(db: Session, product_id: int, location_id: int) -> int:
+    """Incremental run at the bin's site for a product just picked from ``location_id``, if that is a picking bin."""
+    location = location_cache.snapshot(db, max_age=5.0).by_id.get(location_id)
+    if location is None or location.location_type != PICKING:
+        return 0
+    return replenish(db, [product_id], location.warehouse_id)
+
+
+TASK_RETURNING = (
+    ReplenishmentTask.id, ReplenishmentTask.warehouse_id, ReplenishmentTask.inventory_id,
+    ReplenishmentTask.product_id, ReplenishmentTask.from_location_id, ReplenishmentTask.to_location_id,
+    ReplenishmentTask.batch, ReplenishmentTask.mfg_date, ReplenishmentTask.exp_date, ReplenishmentTask.quantity,
+)
+
+
+def _at_site(warehouse_id: int | None):
+    return () if warehouse_id is None else (ReplenishmentTask.warehouse_id == warehouse_id,)
+
+
+def _claim(db: Session, task_id: int, status, user_id: int | None, to_location_id: int | None = None,
+           warehouse_id: int | None = None):
+    values = dict(status=status, completed_at=datetime.now(timezone.utc), completed_by_user_id=user_id)
+    if to_location_id is not None:
+        values["to_location_id"] = to_location_id
+    return db.execute(
+        update(ReplenishmentTask)
+        .where(
+            ReplenishmentTask.id == task_id,
+            ReplenishmentTask.status == inventory_models.ReplenishmentStatus.OPEN,
+            or_(ReplenishmentTask.to_location_id.isnot(None), literal(to_location_id is not None)),
+            *_at_site(warehouse_id),
+        )
+        .values(**values)
+        .returning(*TASK_RETURNING)
+        .execution_options(synchronize_session=False)
+    ).first()
+
+
+def _check_destination(db: Session, task, to_location_id: int) -> None:
+    destination = db.execute(
+        select(Location.location_type, Location.warehouse_id).where(Location.id == to_location_id)
+    ).first()
+    if destination is None:
+        raise ValueError(f"Location {to_location_id} does not exist.")
+    if destination.location_type != PICKING:
+        raise ValueError("Replenishment destination must be a Picking Location.")
+    if destination.warehouse_id != task.warehouse_id:
+        raise ValueError("Replenishment destination is not in the task's warehouse.")
+
+
+def _take_source(db: Session, task):
+    """Remove the task's quantity from the row it reserved, on hand and reserved alike."""
+    if task.inventory_id is None:
+        # Tasks planned before the source row was recorded.
+        return stock_operations.remove_picked_stock(
+            db, product_id=task.product_id, location_id=task.from_location_id,
+            batch=task.batch, quantity=task.quantity,
+        )
+    return stock_operations.remove_reserved_stock(db, task.inventory_id, task.quantity)
+
+
+def complete_task(db: Session, task_id: int, user_id: int | None, to_location_id: int | None = None,
+                  warehouse_id: int | None = None):
+    """
+    Move the task's stock from its storage bin to the picking bin. Returns the
+    task row, or None if it is not open, not at ``warehouse_id`` (when given), or
+    has no destination and none was given.
+    Raises ValueError when ``to_location_id`` is not a picking bin at the task's
+    site, and LookupError when the reserved source stock is gone.
+    """
+    task = _claim(db, task_id, inventory_models.ReplenishmentStatus.DONE, user_id, to_location_id, warehouse_id)
+    if task is None:
+        return None
+    if to_location_id is not None:
+        _check_destination(db, task, to_location_id)
+    source = _take_source(db, task)
+    if source is None:
+        raise LookupError("The reserved source stock no longer exists.")
+    target = stock_operations.add_stock(
+        db, product_id=task.product_id, location_id=task.to_location_id, quantity=task.quantity,
+        batch=task.batch, mfg_date=task.mfg_date, exp_date=task.exp_date,
+    )
+    reference = dict(reference_type="replenishment_task", reference_id=task.id, user_id=user_id)
+    stock_ledger.record_inventory_movement(
+        db, source, -task.quantity, inventory_models.MovementTypeEnum.REPLENISHMENT, **reference
+    )
+    stock_ledger.record_inventory_movement(
+        db, target, task.quantity, inventory_models.MovementTypeEnum.REPLENISHMENT, **reference
+    )
+    for location_id in (task.from_location_id, task.to_location_id):
+        events.publish(db, events.INVENTORY_CHANGED, location_id=location_id, product_id=task.product_id)
+    return task
+
+
+def cancel_task(db: Session, task_id: int, user_id: int | None, warehouse_id: int | None = None):
+    """Cancel an open task (at ``warehouse_id``, when given) and release its reservation. Returns the task row or None."""
+    task = db.execute(
+        update(ReplenishmentTask)
+        .where(ReplenishmentTask.id == task_id,
+               ReplenishmentTask.status == inventory_models.ReplenishmentStatus.OPEN,
+               *_at_site(warehouse_id))
+        .values(status=inventory_models.ReplenishmentStatus.CANCELLED,
+                completed_at=datetime.now(timezone.utc), completed_by_user_id=user_id)
+        .returning(*TASK_RETURNING)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if task is None:
+        return None
+    if task.inventory_id is not None:
+        stock_operations.release_reservation(db, task.inventory_id, task.quantity)
+    else:
+        # Tasks planned before the source row was recorded: release from the
+        # FEFO-first row the reservation most likely sits on.
+        target = (
+            select(Inventory.id)
+            .where(Inventory.product_id == task.product_id, Inventory.location_id == task.from_location_id,
+                   Inventory.batch == task.batch, Inventory.reserved_quantity >= task.quantity)
+            .order_by(Inventory.exp_date, Inventory.id)
+            .limit(1)
+            .scalar_subquery()
+        )
+        db.execute(
+            update(Inventory)
+            .where(Inventory.id == target)
+            .values(reserved_quantity=Inventory.reserved_quantity - task.quantity)
+            .execution_options(synchronize_session=False)
+        )
+    events.publish(db, events.INVENTORY_CHANGED, location_id=task.from_location_id, product_id=task.product_id)
+    return task
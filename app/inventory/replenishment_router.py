@@ -0,0 +1,80 @@
+import time
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from typing import List
+
+from . import inventory_models, replenishment, replenishment_schemas
+from app.auth.dependencies import require_role, get_db, get_warehouse_id
+from app.auth import auth_models
+
+router = APIRouter(
+    tags=["Replenishment"]
+)
+
+@router.post("/replenishment/run", response_model=replenishment_schemas.ReplenishmentRun)
+def run_replenishment(
+    db: Session = Depends(get_db),
+    current_user: auth_models.User = Depends(require_role(["admin", "manager", "supervisor"])),
+    warehouse_id: int | None = Depends(get_warehouse_id)
+):
+    """Full batch: create tasks for every product whose picking stock is below min_qty (at the request's site)."""
+    started = time.perf_counter()
+    created = replenishment.replenish(db, warehouse_id=warehouse_id)
+    db.commit()
+    return {"created_tasks": created, "seconds": round(time.perf_counter() - started, 3)}
+
+@router.get("/replenishment/tasks", response_model=List[replenishment_schemas.ReplenishmentTask])
+def list_replenishment_tasks(
+    status: inventory_models.ReplenishmentStatus = inventory_models.ReplenishmentStatus.OPEN,
+    limit: int = 500,
+    db: Session = Depends(get_db),
+    current_user: auth_models.User = Depends(require_role(["admin", "manager", "supervisor", "operator"])),
+    warehouse_id: int | None = Depends(get_warehouse_id)
+):
+    query = db.query(inventory_models.ReplenishmentTask).filter(
+        inventory_models.ReplenishmentTask.status == status
+    )
+    if warehouse_id is not None:
+        query = query.filter(inventory_models.ReplenishmentTask.warehouse_id == warehouse_id)
+    return query.order_by(inventory_models.ReplenishmentTask.id).limit(min(limit, 5000)).all()
+
+@router.post("/replenishment/tasks/{task_id}/complete")
+def complete_replenishment_task(
+    task_id: int,
+    body: replenishment_schemas.ReplenishmentComplete | None = None,
+    db: Session = Depends(get_db),
+    current_user: auth_models.User = Depends(require_role(["admin", "manager", "supervisor", "operator"])),
+    warehouse_id: int | None = Depends(get_warehouse_id)
+):
+    to_location_id = body.to_location_id if body else None
+    try:
+        task = replenishment.complete_task(db, task_id, current_user.id, to_location_id, warehouse_id)
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    except LookupError as e:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
+    if task is None:
+        db.rollback()
+        existing = db.query(inventory_models.ReplenishmentTask).filter(inventory_models.ReplenishmentTask.id == task_id).first()
+        if not existing or (warehouse_id is not None and existing.warehouse_id != warehouse_id):
+            raise HTTPException(status_code=404, detail="Replenishment task not found.")
+        if existing.status != inventory_models.ReplenishmentStatus.OPEN:
+            raise HTTPException(status_code=400, detail=f"Task is already {existing.status.value}.")
+        raise HTTPException(status_code=400, detail="Task has no destination; send to_location_id.")
+    db.commit()
+    return {"message": "Replenishment completed successfully."}
+
+@router.post("/replenishment/tasks/{task_id}/cancel")
+def cancel_replenishment_task(
+    task_id: int,
+    db: Session = Depends(get_db),
+    current_user: auth_models.User = Depends(require_role(["admin", "manager", "supervisor"])),
+    warehouse_id: int | None = Depends(get_warehouse_id)
+):
+    if replenishment.cancel_task(db, task_id, current_user.id, warehouse_id) is None:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Open replenishment task not found.")
+    db.commit()
+    return {"message": "Replenishment task cancelled."}
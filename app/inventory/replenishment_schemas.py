@@ -0,0 +1,26 @@
+from pydantic import BaseModel
+from datetime import date, datetime
+from .inventory_models import ReplenishmentStatus
+
+class ReplenishmentTask(BaseModel):
+    id: int
+    warehouse_id: int
+    product_id: int
+    from_location_id: int
+    to_location_id: int | None = None
+    batch: str | None = None
+    mfg_date: date | None = None
+    exp_date: date | None = None
+    quantity: float
+    status: ReplenishmentStatus
+    created_at: datetime
+    completed_at: datetime | None = None
+    class Config:
+        from_attributes = True
+
+class ReplenishmentRun(BaseModel):
+    created_tasks: int
+    seconds: float
+
+class ReplenishmentComplete(BaseModel):
+    to_location_id: int | None = None  # required when the task has no destination yet
@@ -0,0 +1,173 @@
+"""
+Append-only stock movement ledger with compacted snapshots.
+
+Every path that changes on-hand inventory records a signed movement in the same
+transaction. ``take_snapshot`` periodically folds the movements since the
+previous snapshot into a new one, so the stock position at any time T costs one
+snapshot read plus a replay of the movements recorded after it.
+
+Movement ids and timestamps are assigned when a row is inserted, but the row
+only becomes visible at commit, so a long transaction can commit movements below
+ids that are already visible. A snapshot therefore folds by transaction, the way
+delta sync does: every movement carries the id of the transaction that inserted
+it, and a snapshot folds exactly the movements of transactions below
+``pg_snapshot_xmin`` (all of which have finished) and records that horizon.
+Replay after a snapshot takes every movement at or above its horizon, so a
+movement is either folded or replayed, never lost.
+"""
+from datetime import datetime
+
+from sqlalchemy import select, func, literal, union_all, insert, false, true, or_, text
+from sqlalchemy.orm import Session
+
+from . import inventory_models
+
+SNAPSHOT_LOCK_ID = 72_311_032
+EPSILON = 1e-9
+
+StockMovement = inventory_models.StockMovement
+StockSnapshot = inventory_models.StockSnapshot
+StockSnapshotLine = inventory_models.StockSnapshotLine
+MovementType = inventory_models.MovementTypeEnum
+
+
+def record_movement(
+    db: Session,
+    *,
+    product_id: int,
+    location_id: int,
+    quantity: float,
+    movement_type: MovementType,
+    batch: str | None = None,
+    mfg_date=None,
+    exp_date=None,
+    reference_type: str | None = None,
+    reference_id: int | None = None,
+    user_id: int | None = None,
+) -> None:
+    if not quantity:
+        return
+    db.add(StockMovement(
+        product_id=product_id, location_id=location_id, quantity=quantity,
+        movement_type=movement_type.value, batch=batch, mfg_date=mfg_date, exp_date=exp_date,
+        reference_type=reference_type, reference_id=reference_id, user_id=user_id,
+    ))
+
+
+def record_movements(db: Session, movements: list[dict]) -> None:
+    """Bulk variant of ``record_movement``: one multi-row INSERT."""
+    rows = [
+        {**movement, "movement_type": MovementType(movement["movement_type"]).value}
+        for movement in movements if movement.get("quantity")
+    ]
+    if rows:
+        db.execute(insert(StockMovement), rows)
+
+
+def record_inventory_movement(db: Session, inventory, quantity: float, movement_type: MovementType, **reference) -> None:
+    """Record a movement for an ``Inventory`` row, copying its stock identity."""
+    record_movement(
+        db, product_id=inventory.product_id, location_id=inventory.location_id, quantity=quantity,
+        movement_type=movement_type, batch=inventory.batch, mfg_date=inventory.mfg_date,
+        exp_date=inventory.exp_date, **reference,
+    )
+
+
+def _not_folded(snapshot: StockSnapshot | None):
+    """Movements that ``snapshot`` did not fold in."""
+    if snapshot is None:
+        return true()
+    if snapshot.xact_horizon is None:
+        # Taken before movements carried their transaction id.
+        return StockMovement.id > snapshot.last_movement_id
+    return StockMovement.xact_id >= snapshot.xact_horizon
+
+
+def _position_rows(snapshot: StockSnapshot | None, movement_filters=(), line_filters=()):
+    """Snapshot lines plus the movements it did not fold in, as one UNION ALL to be aggregated."""
+    line_query = select(
+        StockSnapshotLine.product_id, StockSnapshotLine.location_id, StockSnapshotLine.batch,
+        StockSnapshotLine.mfg_date, StockSnapshotLine.exp_date, StockSnapshotLine.quantity,
+    ).where(StockSnapshotLine.snapshot_id == snapshot.id if snapshot is not None else false(), *line_filters)
+    movement_query = select(
+        StockMovement.product_id, StockMovement.location_id, StockMovement.batch,
+        StockMovement.mfg_date, StockMovement.exp_date, StockMovement.quantity,
+    ).where(_not_folded(snapshot), *movement_filters)
+    return union_all(line_query, movement_query).subquery("position_rows")
+
+
+def _aggregate(rows):
+    return select(
+        rows.c.product_id, rows.c.location_id, rows.c.batch, rows.c.mfg_date,
+        func.max(rows.c.exp_date).label("exp_date"), func.sum(rows.c.quantity).label("quantity"),
+    ).group_by(
+        rows.c.product_id, rows.c.location_id, rows.c.batch, rows.c.mfg_date,
+    ).having(func.abs(func.sum(rows.c.quantity)) > EPSILON)
+
+
+def latest_snapshot(db: Session, at: datetime | None = None) -> StockSnapshot | None:
+    query = db.query(StockSnapshot)
+    if at is not None:
+        query = query.filter(StockSnapshot.as_of <= at)
+    return query.order_by(StockSnapshot.as_of.desc(), StockSnapshot.id.desc()).first()
+
+
+def take_snapshot(db: Session) -> StockSnapshot | None:
+    """
+    Fold movements since the previous snapshot into a new one. Returns None when
+    there is nothing new to compact. The caller commits.
+    """
+    db.execute(select(func.pg_advisory_xact_lock(SNAPSHOT_LOCK_ID)))
+    previous = latest_snapshot(db)
+    # Every transaction below the horizon has finished, so its movements are all visible now.
+    # They all started before the horizon was read, hence before as_of.
+    horizon, as_of = db.execute(
+        select(text("pg_snapshot_xmin(pg_current_snapshot())::text::bigint"), func.clock_timestamp())
+    ).one()
+    # NULL transaction ids are rows from before the column existed, long committed.
+    finished = or_(StockMovement.xact_id < horizon, StockMovement.xact_id.is_(None))
+
+    last_movement_id = db.execute(
+        select(func.max(StockMovement.id)).where(_not_folded(previous), finished)
+    ).scalar()
+    if last_movement_id is None:
+        return None
+
+    snapshot = StockSnapshot(
+        as_of=as_of, xact_horizon=horizon,
+        last_movement_id=max(last_movement_id, previous.last_movement_id if previous else 0),
+    )
+    db.add(snapshot)
+    db.flush()
+
+    rows = _position_rows(previous, movement_filters=[finished])
+    aggregate = _aggregate(rows).subquery()
+    result = db.execute(insert(StockSnapshotLine).from_select(
+        ["snapshot_id", "product_id", "location_id", "batch", "mfg_date", "exp_date", "quantity"],
+        select(
+            literal(snapshot.id), aggregate.c.product_id, aggregate.c.location_id, aggregate.c.batch,
+            aggregate.c.mfg_date, aggregate.c.exp_date, aggregate.c.quantity,
+        ),
+    ))
+    snapshot.line_count = result.rowcount
+    return snapshot
+
+
+def stock_as_of(db: Session, at: datetime, product_id: int | None = None, location_id: int | None = None):
+    """
+    Stock position at ``at``: the latest snapshot taken at or before ``at`` plus
+    the movements recorded after it up to ``at``. Returns a SELECT of
+    (product_id, location_id, batch, mfg_date, exp_date, quantity).
+    """
+    snapshot = latest_snapshot(db, at)
+    movement_filters = [StockMovement.created_at <= at]
+    line_filters = []
+    if product_id is not None:
+        movement_filters.append(StockMovement.product_id == product_id)
+        line_filters.append(StockSnapshotLine.product_id == product_id)
+    if location_id is not None:
+        movement_filters.append(StockMovement.location_id == location_id)
+        line_filters.append(StockSnapshotLine.location_id == location_id)
+
+    rows = _position_rows(snapshot, movement_filters, line_filters)
+    return _aggregate(rows)
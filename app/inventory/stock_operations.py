@@ -0,0 +1,360 @@
+"""
+Atomic stock changes for putaway and picking.
+
+Each change is a single conditional ``UPDATE ... RETURNING``: the guard (enough
+stock, item still pending, quantity not exceeded) is evaluated by the database
+against the latest committed row, so two operators scanning the same bin or the
+same document line can never lose an update, and each scan needs only a few
+round-trips instead of load / modify / flush.
+
+Document completion is O(1) per scan. GoodsReceipt and PickList keep an
+``open_items`` counter. The statement that closes a line also decrements its
+header in a data-modifying CTE, and it completes the header when the counter
+reaches zero. Concurrent closes of a document's last lines serialize on the
+header row. ``reconcile_open_items`` recounts and repairs any counter that has
+drifted.
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import update, delete, select, exists, case, literal, func, or_, and_
+from sqlalchemy.orm import Session
+
+from . import inventory_models
+from app.core import repository
+
+Inventory = inventory_models.Inventory
+GoodsReceipt = inventory_models.GoodsReceipt
+GoodsReceiptItem = inventory_models.GoodsReceiptItem
+PickList = inventory_models.PickList
+PickListItem = inventory_models.PickListItem
+
+INVENTORY_RETURNING = repository.INVENTORY_RETURNING
+
+
+def _enum_literal(column, value):
+    """Bind an enum value with the column's type so it is stored the same way the ORM stores it."""
+    return literal(value, column.type)
+
+
+def _at_site(document_id, document, warehouse_id: int | None):
+    """Guard limiting lines to documents at ``warehouse_id``; none when it is None (all sites)."""
+    if warehouse_id is None:
+        return ()
+    return (document_id.in_(select(document.id).where(document.warehouse_id == warehouse_id)),)
+
+
+def _header_site(document, document_id):
+    """The line's document warehouse, for RETURNING (callers bump that site's counter)."""
+    return (
+        select(document.warehouse_id).where(document.id == document_id)
+        .correlate_except(document).scalar_subquery().label("warehouse_id")
+    )
+
+
+# --- Putaway ---
+def _same_site(location_id: int | None):
+    if location_id is None:
+        return ()
+    site = select(inventory_models.Location.warehouse_id).where(inventory_models.Location.id == location_id)
+    return (GoodsReceiptItem.goods_receipt_id.in_(
+        select(GoodsReceipt.id).where(GoodsReceipt.warehouse_id == site.scalar_subquery())
+    ),)
+
+
+def claim_putaway_quantity(db: Session, receipt_item_id: int, quantity: float, user_id: int,
+                           location_id: int | None = None, warehouse_id: int | None = None):
+    """
+    Add ``quantity`` to a pending GRN line if it does not exceed the open quantity,
+    completing the line when it is fully put away. With ``location_id`` the bin
+    must also be in the receipt's warehouse, and with ``warehouse_id`` the receipt
+    must be at that site. Returns the updated row (id, goods_receipt_id,
+    warehouse_id, product_name, status, receipt_completed) or None if the guard
+    failed.
+    """
+    new_total = GoodsReceiptItem.putaway_quantity + quantity
+    # Quantity promised to cross-dock tasks is not available for putaway.
+    covered = new_total + GoodsReceiptItem.crossdock_quantity
+    claimed = (
+        update(GoodsReceiptItem)
+        .where(
+            GoodsReceiptItem.id == receipt_item_id,
+            GoodsReceiptItem.status == inventory_models.GRNItemStatus.PENDING,
+            covered <= GoodsReceiptItem.quantity,
+            inventory_models.Product.id == GoodsReceiptItem.product_id,
+            *_same_site(location_id),
+            *_at_site(GoodsReceiptItem.goods_receipt_id, GoodsReceipt, warehouse_id),
+        )
+        .values(
+            putaway_quantity=new_total,
+            status=case(
+                (covered >= GoodsReceiptItem.quantity,
+                 _enum_literal(GoodsReceiptItem.status, inventory_models.GRNItemStatus.COMPLETED)),
+                else_=GoodsReceiptItem.status,
+            ),
+            putaway_by_user_id=user_id,
+            putaway_at=datetime.now(timezone.utc),
+        )
+        .returning(
+            GoodsReceiptItem.id, GoodsReceiptItem.goods_receipt_id,
+            _header_site(GoodsReceipt, GoodsReceiptItem.goods_receipt_id),
+            inventory_models.Product.name.label("product_name"), GoodsReceiptItem.status,
+        )
+        .cte("claimed")
+    )
+    rollup = _rollup(
+        GoodsReceipt, claimed.c.goods_receipt_id,
+        claimed.c.status == inventory_models.GRNItemStatus.COMPLETED,
+        inventory_models.GoodsReceiptStatus.COMPLETED,
+    )
+    stmt = (
+        select(
+            claimed.c.id, claimed.c.goods_receipt_id, claimed.c.warehouse_id, claimed.c.product_name,
+            claimed.c.status, func.coalesce(rollup.c.completed, False).label("receipt_completed"),
+        )
+        .select_from(claimed)
+        .outerjoin(rollup, rollup.c.id == claimed.c.goods_receipt_id)
+    )
+    return db.execute(stmt).first()
+
+
+def close_receipt_line_if_covered(db: Session, receipt_item_id: int):
+    """
+    Complete a pending GRN line once putaway plus cross-dock cover its quantity.
+    Returns (id, goods_receipt_id, receipt_completed) or None if it stays open.
+    """
+    claimed = (
+        update(GoodsReceiptItem)
+        .where(
+            GoodsReceiptItem.id == receipt_item_id,
+            GoodsReceiptItem.status == inventory_models.GRNItemStatus.PENDING,
+            GoodsReceiptItem.putaway_quantity + GoodsReceiptItem.crossdock_quantity >= GoodsReceiptItem.quantity,
+        )
+        .values(status=inventory_models.GRNItemStatus.COMPLETED)
+        .returning(GoodsReceiptItem.id, GoodsReceiptItem.goods_receipt_id)
+        .cte("claimed")
+    )
+    rollup = _rollup(GoodsReceipt, claimed.c.goods_receipt_id, literal(True), inventory_models.GoodsReceiptStatus.COMPLETED)
+    stmt = (
+        select(claimed.c.id, claimed.c.goods_receipt_id,
+               func.coalesce(rollup.c.completed, False).label("receipt_completed"))
+        .select_from(claimed)
+        .outerjoin(rollup, rollup.c.id == claimed.c.goods_receipt_id)
+    )
+    return db.execute(stmt).first()
+
+
+def _rollup(header, parent_id, line_closed, completed):
+    """
+    CTE that decrements ``header.open_items`` for a line that just closed and
+    completes the header at zero. Returns (id, completed).
+    """
+    remaining = header.open_items - 1
+    return (
+        update(header)
+        .where(header.id == parent_id, line_closed)
+        .values(
+            open_items=remaining,
+            status=case((remaining <= 0, _enum_literal(header.status, completed)), else_=header.status),
+        )
+        .returning(header.id, (header.open_items <= 0).label("completed"))
+        .cte(f"{header.__tablename__}_rollup")
+    )
+
+
+def add_stock(db: Session, *, product_id: int, location_id: int, quantity: float,
+              batch=None, mfg_date=None, exp_date=None):
+    """
+    Increment the matching inventory row, or create it. Returns the resulting row.
+    """
+    params = dict(b_product_id=product_id, b_location_id=location_id, b_batch=batch,
+                  b_mfg_date=mfg_date, b_quantity=quantity)
+    row = db.execute(repository.putaway_increment(batch is None, mfg_date is None), params).first()
+    if row is not None:
+        return row
+    return db.execute(repository.PUTAWAY_INSERT, {**params, "b_exp_date": exp_date}).first()
+
+
+# --- Picking ---
+def claim_pick_item(db: Session, item_id: int, user_id: int, picked_at: datetime | None = None,
+                    warehouse_id: int | None = None):
+    """
+    Mark a pending, allocated pick line as picked (at ``picked_at``, default now).
+    Returns the row (id, picklist_id, product_id, location_id, batch,
+    allocated_quantity, warehouse_id, picklist_completed) or None if it was already picked, has
+    no allocation or belongs to a pick list outside ``warehouse_id``.
+    """
+    return _close_pick_line(
+        db, user_id, picked_at,
+        PickListItem.id == item_id,
+        PickListItem.location_id.isnot(None),
+        *_at_site(PickListItem.picklist_id, PickList, warehouse_id),
+        picked_quantity=PickListItem.allocated_quantity,
+    )
+
+
+def force_close_pick_item(db: Session, item_id: int, user_id: int, warehouse_id: int | None = None):
+    """
+    Close a pending line that has no allocated stock (out of stock, shortfall).
+    Returns the row as ``claim_pick_item`` does, or None.
+    """
+    return _close_pick_line(
+        db, user_id, None,
+        PickListItem.id == item_id,
+        PickListItem.location_id.is_(None),
+        *_at_site(PickListItem.picklist_id, PickList, warehouse_id),
+    )
+
+
+def add_crossdock_pick(db: Session, item_id: int, quantity: float, user_id: int):
+    """
+    Record ``quantity`` delivered from the dock against an unallocated (shortfall)
+    line; the line is picked once its shortfall is covered. Returns
+    (id, picklist_id, status, picklist_completed) or None if it is no longer pending.
+    """
+    picked = func.coalesce(PickListItem.picked_quantity, 0) + quantity
+    shortfall = PickListItem.required_quantity - PickListItem.allocated_quantity
+    picked_status = _enum_literal(PickListItem.status, inventory_models.PickListItemStatus.PICKED)
+    claimed = (
+        update(PickListItem)
+        .where(
+            PickListItem.id == item_id,
+            PickListItem.status == inventory_models.PickListItemStatus.PENDING,
+            PickListItem.location_id.is_(None),
+        )
+        .values(
+            picked_quantity=picked,
+            status=case((picked >= shortfall, picked_status), else_=PickListItem.status),
+            picked_by_user_id=user_id,
+            picked_at=datetime.now(timezone.utc),
+        )
+        .returning(PickListItem.id, PickListItem.picklist_id, PickListItem.status)
+        .cte("claimed")
+    )
+    rollup = _rollup(
+        PickList, claimed.c.picklist_id,
+        claimed.c.status == inventory_models.PickListItemStatus.PICKED,
+        inventory_models.PickListStatus.COMPLETED,
+    )
+    stmt = (
+        select(*claimed.c, func.coalesce(rollup.c.completed, False).label("picklist_completed"))
+        .select_from(claimed)
+        .outerjoin(rollup, rollup.c.id == claimed.c.picklist_id)
+    )
+    return db.execute(stmt).first()
+
+
+def _close_pick_line(db: Session, user_id: int, picked_at: datetime | None, *conditions, **values):
+    claimed = (
+        update(PickListItem)
+        .where(PickListItem.status == inventory_models.PickListItemStatus.PENDING, *conditions)
+        .values(
+            status=inventory_models.PickListItemStatus.PICKED,
+            picked_by_user_id=user_id,
+            picked_at=picked_at or datetime.now(timezone.utc),
+            **values,
+        )
+        .returning(
+            PickListItem.id, PickListItem.picklist_id, PickListItem.product_id,
+            PickListItem.location_id, PickListItem.batch, PickListItem.allocated_quantity,
+            _header_site(PickList, PickListItem.picklist_id),
+        )
+        .cte("claimed")
+    )
+    rollup = _rollup(PickList, claimed.c.picklist_id, literal(True), inventory_models.PickListStatus.COMPLETED)
+    stmt = (
+        select(*claimed.c, func.coalesce(rollup.c.completed, False).label("picklist_completed"))
+        .select_from(claimed)
+        .outerjoin(rollup, rollup.c.id == claimed.c.picklist_id)
+    )
+    return db.execute(stmt).first()
+
+
+def remove_picked_stock(db: Session, *, product_id: int, location_id: int, batch, quantity: float):
+    """
+    Decrement on-hand and reserved quantity of one matching inventory row holding at
+    least ``quantity``, deleting it when it reaches zero (unless the putaway log
+    still references it). Returns the row as it
+    was after the decrement, or None if no row had enough stock.
+    """
+    row = db.execute(
+        repository.pick_decrement(batch is None),
+        dict(b_product_id=product_id, b_location_id=location_id, b_batch=batch, b_quantity=quantity),
+    ).first()
+    _delete_if_empty(db, row)
+    return row
+
+
+def remove_reserved_stock(db: Session, inventory_id: int, quantity: float):
+    """
+    Take ``quantity`` reserved units out of one specific inventory row, on hand
+    and reserved alike, deleting it when it empties. Returns the row after the
+    decrement, or None if it no longer holds that reservation.
+    """
+    row = db.execute(
+        update(Inventory)
+        .where(Inventory.id == inventory_id, Inventory.quantity >= quantity, Inventory.reserved_quantity >= quantity)
+        .values(quantity=Inventory.quantity - quantity, reserved_quantity=Inventory.reserved_quantity - quantity)
+        .returning(*INVENTORY_RETURNING)
+        .execution_options(synchronize_session=False)
+    ).first()
+    _delete_if_empty(db, row)
+    return row
+
+
+def release_reservation(db: Session, inventory_id: int, quantity: float) -> bool:
+    """Give back ``quantity`` reserved units on one inventory row; False if it no longer holds them."""
+    return bool(db.execute(
+        update(Inventory)
+        .where(Inventory.id == inventory_id, Inventory.reserved_quantity >= quantity)
+        .values(reserved_quantity=Inventory.reserved_quantity - quantity)
+        .execution_options(synchronize_session=False)
+    ).rowcount)
+
+
+def _delete_if_empty(db: Session, row) -> None:
+    if row is not None and row.quantity <= 0:
+        # Rows referenced by the putaway log stay at zero for its foreign key.
+        db.execute(
+            delete(Inventory)
+            .where(
+                Inventory.id == row.id, Inventory.quantity <= 0,
+                ~exists().where(inventory_models.PutawayLog.inventory_id == Inventory.id),
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+
+# --- Reconciliation ---
+def reconcile_open_items(db: Session) -> dict[str, int]:
+    """
+    Recount pending lines per document, fix every ``open_items`` that disagrees,
+    and complete documents that have no pending lines left. Returns the number of
+    headers repaired per table.
+    """
+    repaired = {}
+    for header, item, parent_id, pending, completed in (
+        (GoodsReceipt, GoodsReceiptItem, GoodsReceiptItem.goods_receipt_id,
+         inventory_models.GRNItemStatus.PENDING, inventory_models.GoodsReceiptStatus.COMPLETED),
+        (PickList, PickListItem, PickListItem.picklist_id,
+         inventory_models.PickListItemStatus.PENDING, inventory_models.PickListStatus.COMPLETED),
+    ):
+        counted = (
+            select(func.count(item.id))
+            .where(parent_id == header.id, item.status == pending)
+            .scalar_subquery()
+        )
+        rows = db.execute(
+            update(header)
+            .where(or_(
+                header.open_items.is_distinct_from(counted),
+                and_(counted == 0, header.status != completed),
+            ))
+            .values(
+                open_items=counted,
+                status=case((counted == 0, _enum_literal(header.status, completed)), else_=header.status),
+            )
+            .returning(header.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+        repaired[header.__tablename__] = len(rows)
+    return repaired
@@ -0,0 +1,98 @@
+"""
+Warehouses (sites) as a dimension of locations, stock and documents.
+
+Every location, inventory row, goods receipt, pick list and task belongs to one
+warehouse. A request's warehouse comes from ``get_warehouse_id`` in
+app/auth/dependencies.py. Users with a home warehouse are pinned to it, and
+other users choose one with the ``X-Warehouse-Id`` header or see all sites.
+
+Batch work (replenishment, cross-dock matching) can run one transaction per
+site in parallel with ``run_per_site``. Each site takes its own advisory lock
+and touches only its own rows, so one site's run does not wait on another's.
+
+Hot indexes lead with ``warehouse_id``, so each site works in its own key range.
+``place_warehouse`` goes further: it builds per-site partial copies of those
+indexes in a tablespace of the operator's choosing, which puts one site's hot
+pages on its own storage. Converting the tables to LIST partitions by warehouse
+would need ``warehouse_id`` in every primary and foreign key. This module keeps
+that option open, because nothing here depends on the tables being unpartitioned.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+
+from . import inventory_models
+from app.core.config import settings
+from app.core.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+Warehouse = inventory_models.Warehouse
+
+# (table, index columns, extra predicate) for the per-site partial indexes.
+SITE_INDEXES = (
+    ("inventory", "product_id, exp_date, quantity", "available_quantity > 0"),
+    ("inventory", "location_id", None),
+    ("pick_lists", "status, created_at", None),
+    ("goods_receipts", "status, created_at", None),
+    ("replenishment_tasks", "product_id", "status = 'OPEN'"),
+    ("crossdock_tasks", "product_id", "status = 'OPEN'"),
+)
+
+
+def warehouse_ids(db: Session) -> list[int]:
+    return list(db.scalars(select(Warehouse.id).order_by(Warehouse.id)))
+
+
+def resolve(warehouse_id: int | None) -> int:
+    """The warehouse to write to: the request's, or the default site."""
+    return warehouse_id if warehouse_id is not None else settings.DEFAULT_WAREHOUSE_ID
+
+
+def run_per_site(work, sites: list[int] | None = None, max_workers: int | None = None) -> dict[int, object]:
+    """
+    Call ``work(db, warehouse_id)`` for every site, each in its own session and
+    transaction, up to ``max_workers`` (SITE_WORKERS) at a time. Returns the
+    results by warehouse id; a site that fails is logged and rolled back alone.
+    """
+    if sites is None:
+        db = SessionLocal()
+        try:
+            sites = warehouse_ids(db)
+        finally:
+            db.close()
+
+    def run(warehouse_id: int):
+        db = SessionLocal()
+        try:
+            result = work(db, warehouse_id)
+            db.commit()
+            return result
+        except Exception:
+            db.rollback()
+            logger.exception(f"Warehouse {warehouse_id}: run failed")
+            return None
+        finally:
+            db.close()
+
+    with ThreadPoolExecutor(max_workers=max_workers or settings.SITE_WORKERS) as pool:
+        return dict(zip(sites, pool.map(run, sites)))
+
+
+def place_warehouse(conn, warehouse_id: int, tablespace: str) -> list[str]:
+    """
+    Build this site's partial indexes in ``tablespace`` (CONCURRENTLY, so
+    ``conn`` must be in autocommit mode). Returns the index names.
+    """
+    quoted = conn.dialect.identifier_preparer.quote(tablespace)
+    names = []
+    for table, columns, predicate in SITE_INDEXES:
+        name = f"ix_{table}_site{warehouse_id}_{columns.split(',')[0].strip()}"
+        where = f"warehouse_id = {int(warehouse_id)}" + (f" AND {predicate}" if predicate else "")
+        conn.execute(text(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns}) TABLESPACE {quoted} WHERE {where}"
+        ))
+        names.append(name)
+    return names
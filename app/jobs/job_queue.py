@@ -0,0 +1,290 @@
+"""
+Database-backed job queue for large uploads.
+
+Uploads are stored in the ``jobs`` table and processed by a pool of worker
+threads. Workers claim jobs with ``FOR UPDATE SKIP LOCKED``, so any number of
+threads and processes can share the table without an external broker.
+
+A job's work and its "Succeeded" status are committed in one transaction, so a
+job either finishes completely or not at all. Progress is written on a separate
+short connection so /jobs/{id} can show it while the work is still uncommitted.
+A job whose worker died (no heartbeat for JOB_STALE_SECONDS) is picked up again,
+up to JOB_MAX_ATTEMPTS times, then marked Failed. Only 4xx errors (a bad file)
+fail a job at once. When the parser pool is saturated the job goes back to the
+queue without using up an attempt; other 5xx errors requeue it until its
+attempts run out.
+
+A claim is identified by (worker, attempts). Heartbeats, progress and the final
+status are written only while the job still carries that claim and is Running.
+If a slow worker's job was reclaimed or given up on, its final update matches no
+row, so it rolls back its work instead of committing a second copy.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
+
+from fastapi import HTTPException, UploadFile
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import select, update, or_, and_
+from sqlalchemy.orm import Session
+
+from . import jobs_schemas
+from .jobs_models import Job, JobKind, JobStatus
+from app.core.config import settings
+from app.core.database import SessionLocal, engine
+from app.core.spreadsheets import read_upload, parse_in_pool, ParserBusy
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_INTERVAL_SECONDS = 0.5
+
+
+def _run_goods_receipt_upload(db: Session, rows: list[dict], progress, warehouse_id: int | None) -> dict:
+    from app.inbound.goods_receipt_import import create_goods_receipt
+    return {"goods_receipt_id": create_goods_receipt(db, rows, progress, warehouse_id).id}
+
+
+def _run_picklist_upload(db: Session, rows: list[dict], progress, warehouse_id: int | None) -> dict:
+    from app.outbound.picklist_allocation import create_picklist
+    return {"picklist_id": create_picklist(db, rows, progress, warehouse_id).id}
+
+
+HANDLERS = {
+    JobKind.GOODS_RECEIPT_UPLOAD: _run_goods_receipt_upload,
+    JobKind.PICKLIST_UPLOAD: _run_picklist_upload,
+}
+
+_wakeup = threading.Event()
+
+
+def enqueue(db: Session, kind: JobKind, file: UploadFile, user_id: int | None,
+            warehouse_id: int | None = None) -> Job:
+    """Store the upload as a queued job. Call ``notify()`` after committing."""
+    job = Job(kind=kind, status=JobStatus.QUEUED, filename=file.filename, payload=read_upload(file),
+              created_by_user_id=user_id, warehouse_id=warehouse_id, created_at=_now())
+    db.add(job)
+    db.flush()
+    return job
+
+
+def submit(db: Session, kind: JobKind, file: UploadFile, user_id: int | None,
+           warehouse_id: int | None = None) -> JSONResponse:
+    """Enqueue, commit and answer 202 with the job and its Location."""
+    job = enqueue(db, kind, file, user_id, warehouse_id)
+    content = jsonable_encoder(jobs_schemas.Job.model_validate(job))  # before commit expires the row
+    db.commit()
+    notify()
+    return JSONResponse(status_code=202, content=content, headers={"Location": f"/jobs/{content['id']}"})
+
+
+def notify() -> None:
+    """Wake this process's idle workers instead of waiting for the next poll."""
+    _wakeup.set()
+
+
+# --- Worker side ---
+class Claim(NamedTuple):
+    job_id: int
+    worker: str
+    attempt: int
+
+
+class ClaimLost(Exception):
+    """The job was reclaimed or failed by someone else while this worker ran it."""
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def _stale_before():
+    return _now() - timedelta(seconds=settings.JOB_STALE_SECONDS)
+
+
+def claim_next(worker: str) -> Claim | None:
+    """Claim the oldest runnable job; returns the claim or None."""
+    runnable = (
+        select(Job.id)
+        .where(or_(
+            Job.status == JobStatus.QUEUED,
+            and_(Job.status == JobStatus.RUNNING, Job.heartbeat_at < _stale_before(),
+                 Job.attempts < settings.JOB_MAX_ATTEMPTS),
+        ))
+        .order_by(Job.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    now = _now()
+    with engine.begin() as conn:
+        row = conn.execute(
+            update(Job)
+            .where(Job.id == runnable)
+            .values(status=JobStatus.RUNNING, attempts=Job.attempts + 1, worker=worker,
+                    started_at=now, heartbeat_at=now)
+            .returning(Job.id, Job.attempts)
+        ).first()
+    return Claim(row.id, worker, row.attempts) if row is not None else None
+
+
+def fail_abandoned() -> int:
+    """Give up on jobs whose workers kept dying."""
+    with engine.begin() as conn:
+        return conn.execute(
+            update(Job)
+            .where(Job.status == JobStatus.RUNNING, Job.heartbeat_at < _stale_before(),
+                   Job.attempts >= settings.JOB_MAX_ATTEMPTS)
+            .values(status=JobStatus.FAILED, errors=["The worker stopped while processing this job."],
+                    payload=None, finished_at=_now())
+        ).rowcount
+
+
+def _held(claim: Claim):
+    return (Job.id == claim.job_id, Job.worker == claim.worker, Job.attempts == claim.attempt,
+            Job.status == JobStatus.RUNNING)
+
+
+def _write_progress(claim: Claim, done: int | None = None, total: int | None = None) -> None:
+    """Heartbeat, with progress when given. Raises ClaimLost if the job is no longer ours."""
+    values = dict(heartbeat_at=_now())
+    if done is not None:
+        values.update(progress_done=done, progress_total=total)
+    with engine.begin() as conn:
+        if not conn.execute(update(Job).where(*_held(claim)).values(**values)).rowcount:
+            raise ClaimLost()
+
+
+def _finish(claim: Claim, status: JobStatus, errors=None, result=None, db: Session | None = None) -> bool:
+    """Record the outcome if the claim still holds; returns False when it was lost."""
+    stmt = (
+        update(Job).where(*_held(claim))
+        .values(status=status, errors=errors, result=result, payload=None, finished_at=_now())
+    )
+    if db is not None:
+        return bool(db.execute(stmt).rowcount)
+    with engine.begin() as conn:
+        return bool(conn.execute(stmt).rowcount)
+
+
+def _requeue(claim: Claim, refund_attempt: bool = False) -> bool:
+    """Put the job back in the queue if the claim still holds; returns False when it was lost."""
+    values = dict(status=JobStatus.QUEUED, worker=None, heartbeat_at=None, progress_done=0, progress_total=0)
+    if refund_attempt:
+        values["attempts"] = Job.attempts - 1
+    with engine.begin() as conn:
+        return bool(conn.execute(update(Job).where(*_held(claim)).values(**values)).rowcount)
+
+
+def run_job(claim: Claim) -> None:
+    job_id = claim.job_id
+    db = SessionLocal()
+    try:
+        kind, filename, payload, warehouse_id = db.execute(
+            select(Job.kind, Job.filename, Job.payload, Job.warehouse_id).where(Job.id == job_id)
+        ).one()
+        db.rollback()  # do not hold a transaction open while parsing
+
+        last_write = 0.0
+
+        def progress(done: int, total: int):
+            nonlocal last_write
+            if done == total or time.monotonic() - last_write >= PROGRESS_INTERVAL_SECONDS:
+                last_write = time.monotonic()
+                _write_progress(claim, done, total)
+
+        _write_progress(claim)
+        rows = parse_in_pool(filename or "", payload or b"")
+        _write_progress(claim, 0, len(rows))
+        result = HANDLERS[kind](db, rows, progress, warehouse_id)
+        # The job's own status commits with its work, and only while the claim holds.
+        if not _finish(claim, JobStatus.SUCCEEDED, result=result, db=db):
+            raise ClaimLost()
+        db.commit()
+        logger.info(f"Job {job_id} ({kind.value}) succeeded: {result}")
+    except ClaimLost:
+        db.rollback()
+        logger.warning(f"Job {job_id}: claim (attempt {claim.attempt}) was lost; work rolled back")
+    except ParserBusy:
+        db.rollback()
+        logger.info(f"Job {job_id}: parser pool busy; requeued")
+        _requeue(claim, refund_attempt=True)
+    except HTTPException as e:
+        db.rollback()
+        if e.status_code >= 500 and claim.attempt < settings.JOB_MAX_ATTEMPTS:
+            logger.warning(f"Job {job_id}: {e.detail} (attempt {claim.attempt}); requeued")
+            _requeue(claim)
+            return
+        detail = e.detail if isinstance(e.detail, list) else [str(e.detail)]
+        _finish(claim, JobStatus.FAILED, errors=detail)
+    except Exception as e:
+        db.rollback()
+        logger.exception(f"Job {job_id} failed")
+        _finish(claim, JobStatus.FAILED, errors=[str(e)])
+    finally:
+        db.close()
+
+
+class WorkerPool:
+    def __init__(self, size: int):
+        self.size = size
+        self._stopping = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._name = f"{socket.gethostname()}:{os.getpid()}"
+
+    def start(self) -> None:
+        for index in range(self.size):
+            thread = threading.Thread(target=self._loop, args=(f"{self._name}:{index}",),
+                                      name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stopping.set()
+        _wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads.clear()
+
+    def run_forever(self) -> None:
+        self.start()
+        try:
+            while any(thread.is_alive() for thread in self._threads):
+                time.sleep(1.0)
+        except KeyboardInterrupt:
+            self.stop()
+
+    def _loop(self, worker: str) -> None:
+        while not self._stopping.is_set():
+            try:
+                fail_abandoned()
+                claim = claim_next(worker)
+            except Exception:
+                logger.exception("Could not poll the job queue")
+                claim = None
+            if claim is not None:
+                run_job(claim)
+                continue
+            _wakeup.wait(settings.JOB_POLL_SECONDS)
+            _wakeup.clear()
+
+
+pool: WorkerPool | None = None
+
+
+def start_workers(size: int) -> None:
+    global pool
+    if size > 0 and pool is None:
+        pool = WorkerPool(size)
+        pool.start()
+
+
+def stop_workers() -> None:
+    global pool
+    if pool is not None:
+        pool.stop()
+        pool = None
@@ -0,0 +1,40 @@
+import enum
+from sqlalchemy import Column, Integer, String, DateTime, LargeBinary, JSON, ForeignKey, Enum as SAEnum, Index, text
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+class JobStatus(str, enum.Enum):
+    QUEUED = "Queued"
+    RUNNING = "Running"
+    SUCCEEDED = "Succeeded"
+    FAILED = "Failed"
+
+class JobKind(str, enum.Enum):
+    GOODS_RECEIPT_UPLOAD = "Goods Receipt Upload"
+    PICKLIST_UPLOAD = "Pick List Upload"
+
+class Job(Base):
+    """A queued upload. The table is the queue: workers claim rows with FOR UPDATE SKIP LOCKED."""
+    __tablename__ = "jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(SAEnum(JobKind, native_enum=False), nullable=False)
+    status = Column(SAEnum(JobStatus, native_enum=False), nullable=False, default=JobStatus.QUEUED)
+    filename = Column(String, nullable=True)
+    payload = Column(LargeBinary, nullable=True)  # the uploaded file; cleared once the job finishes
+    progress_done = Column(Integer, nullable=False, default=0)
+    progress_total = Column(Integer, nullable=False, default=0)
+    errors = Column(JSON, nullable=True)
+    result = Column(JSON, nullable=True)  # {"goods_receipt_id": ...} or {"picklist_id": ...}
+    attempts = Column(Integer, nullable=False, default=0)
+    worker = Column(String, nullable=True)
+    created_by_user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    warehouse_id = Column(Integer, ForeignKey("warehouses.id"), nullable=True)  # site the document is created in
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Workers only ever scan unfinished jobs.
+        Index("ix_jobs_open", "status", "id", postgresql_where=text("status IN ('QUEUED', 'RUNNING')")),
+    )
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from . import jobs_schemas
+from .jobs_models import Job
+from app.auth.dependencies import get_db, get_current_user
+from app.auth.auth_models import User
+
+router = APIRouter(
+    tags=["Jobs"]
+)
+
+@router.get("/jobs/{job_id}", response_model=jobs_schemas.Job)
+def get_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Status of a background upload: progress, row-level errors when it failed, and
+    the created GRN or pick list id in ``result`` when it succeeded.
+    """
+    job = db.query(Job).filter(Job.id == job_id).first()
+    if not job or (job.created_by_user_id != current_user.id and current_user.role not in ("admin", "manager")):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
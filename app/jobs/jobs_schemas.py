@@ -0,0 +1,20 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import List
+from .jobs_models import JobKind, JobStatus
+
+class Job(BaseModel):
+    id: int
+    kind: JobKind
+    status: JobStatus
+    filename: str | None = None
+    progress_done: int
+    progress_total: int
+    errors: List[str] | None = None
+    result: dict | None = None
+    attempts: int
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    class Config:
+        from_attributes = True
@@ -1,22 +1,40 @@
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from .core.database import engine, Base
 from .auth.auth_router import router as auth_router
 from .auth.user_router import router as user_router
 from .inventory.inventory_router import router as inventory_router
 from .inventory.location_router import router as location_router
+from .inventory.replenishment_router import router as replenishment_router
 from .inbound.goods_receipt_router import router as goods_receipt_router
 from .inbound.putaway_router import router as putaway_router
 from .outbound.picklist_router import router as picklist_router
+from .outbound.crossdock_router import router as crossdock_router
 from .reports.reports_router import router as reports_router
 from .correction.correction_router import router as correction_router
 from .admin.admin_router import router as admin_router
+from .scan.scan_router import router as scan_router
+from .events.events_router import router as events_router
+from .jobs.jobs_router import router as jobs_router
+from .sync.sync_router import router as sync_router
+from .jobs import job_queue
+from .core import events
+from .core.compression import CompressionMiddleware
+from .core.idempotency import IdempotencyMiddleware
+from .core.config import settings
+from .core.spreadsheets import shutdown_pool
+from .core.database import SessionLocal, check_database, pool_status
+from .inventory.product_cache import product_index
 
-# This creates the database tables if they don't exist
-Base.metadata.create_all(bind=engine)
+# The schema is managed explicitly with `python -m app.manage migrate`;
+# nothing here touches the database at import time.
 
 app = FastAPI(title="MyWMS API")
 
+# Added first so it sits inside CORS and compression: stored responses are
+# uncompressed and get the current request's CORS/encoding headers on replay.
+app.add_middleware(IdempotencyMiddleware)
+
 # CORS middleware to allow the frontend to communicate with the backend
 app.add_middleware(
     CORSMiddleware,
@@ -26,17 +44,56 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MIN_SIZE,
+    gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+    brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+)
+
 # --- Include all the application routers ---
 app.include_router(auth_router)
 app.include_router(user_router, prefix="/auth")
 app.include_router(inventory_router, prefix="/inventory")
 app.include_router(location_router, prefix="/inventory")
+app.include_router(replenishment_router, prefix="/inventory")
 app.include_router(goods_receipt_router, prefix="/inbound")
 app.include_router(putaway_router, prefix="/inbound")
 app.include_router(picklist_router, prefix="/outbound")
+app.include_router(crossdock_router, prefix="/outbound")
 app.include_router(reports_router, prefix="/reports")
 app.include_router(correction_router, prefix="/correction")
 app.include_router(admin_router)
+app.include_router(scan_router)
+app.include_router(events_router)
+app.include_router(jobs_router)
+app.include_router(sync_router)
+
+@app.on_event("startup")
+def warm_caches():
+    if settings.PRODUCT_CACHE_WARM:
+        db = SessionLocal()
+        try:
+            product_index.warm(db)
+        finally:
+            db.close()
+
+@app.on_event("startup")
+def start_event_broker():
+    events.broker.start()
+
+@app.on_event("shutdown")
+def stop_event_broker():
+    events.broker.stop()
+
+@app.on_event("startup")
+def start_job_workers():
+    job_queue.start_workers(settings.JOB_WORKERS)
+
+@app.on_event("shutdown")
+def stop_job_workers():
+    job_queue.stop_workers()
+    shutdown_pool()
 
 # --- Root and Health Check endpoints ---
 @app.get("/")
@@ -45,4 +102,17 @@ def read_root():
 
 @app.get("/health")
 def health_check():
-    return {"status": "ok"}
\ No newline at end of file
+    """Liveness: the process is serving. Does not touch the database."""
+    return {"status": "ok", "pool": pool_status()}
+
+@app.get("/ready")
+def readiness_check():
+    """Readiness: the database is reachable through the pool."""
+    try:
+        check_database()
+    except Exception as e:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "unavailable", "detail": str(e), "pool": pool_status()},
+        )
+    return {"status": "ok", "pool": pool_status()}
\ No newline at end of file
@@ -0,0 +1,209 @@
+"""
+Operational commands for MyWMS.
+
+Usage:
+    python -m app.manage migrate
+    python -m app.manage showmigrations
+    python -m app.manage snapshot-stock
+    python -m app.manage purge-idempotency-keys
+    python -m app.manage run-jobs [--workers N]
+    python -m app.manage replenish [--warehouse N]
+    python -m app.manage crossdock [--warehouse N]
+    python -m app.manage archive [--days N] [--batch-size N]
+    python -m app.manage purge-sync-deletions [--days N]
+    python -m app.manage reconcile-open-items
+    python -m app.manage place-warehouse --warehouse N --tablespace NAME
+"""
+import argparse
+import logging
+import sys
+import time
+
+from app.core import migrations
+from app.core.database import SessionLocal
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("app.manage")
+
+COMMANDS = {}
+
+
+def command(name: str, help_text: str, arguments=()):
+    """Register a sub-command. ``arguments`` is a list of (args, kwargs) for ``add_argument``."""
+    def decorator(func):
+        COMMANDS[name] = (func, help_text, arguments)
+        return func
+    return decorator
+
+
+@command("migrate", "Apply pending schema migrations")
+def cmd_migrate(args):
+    applied = migrations.run_migrations()
+    if applied:
+        logger.info(f"Applied migrations: {', '.join(map(str, applied))}")
+    else:
+        logger.info("Database schema is up to date.")
+
+
+@command("showmigrations", "List migrations and whether they are applied")
+def cmd_showmigrations(args):
+    migrations.import_models()
+    with migrations.engine.connect() as conn:
+        done = migrations.applied_versions(conn)
+        conn.commit()
+    for version, description, _ in sorted(migrations.MIGRATIONS, key=lambda m: m[0]):
+        mark = "X" if version in done else " "
+        print(f"[{mark}] {version:04d} {description}")
+
+
+@command("snapshot-stock", "Compact the stock movement ledger into a new snapshot")
+def cmd_snapshot_stock(args):
+    from app.inventory import stock_ledger
+
+    migrations.import_models()
+    db = SessionLocal()
+    try:
+        snapshot = stock_ledger.take_snapshot(db)
+        db.commit()
+        if snapshot is None:
+            logger.info("No new movements to compact.")
+        else:
+            logger.info(f"Snapshot {snapshot.id} as of {snapshot.as_of}: {snapshot.line_count} lines")
+    finally:
+        db.close()
+
+
+@command("purge-idempotency-keys", "Delete stored idempotent responses past their TTL")
+def cmd_purge_idempotency_keys(args):
+    from app.core import idempotency
+
+    db = SessionLocal()
+    try:
+        purged = idempotency.purge_expired(db)
+        db.commit()
+        logger.info(f"Purged {purged} expired idempotency keys.")
+    finally:
+        db.close()
+
+
+@command("run-jobs", "Process background upload jobs until interrupted", arguments=[
+    (("--workers",), {"type": int, "default": 2, "help": "worker threads"}),
+])
+def cmd_run_jobs(args):
+    from app.jobs import job_queue
+
+    migrations.import_models()
+    logger.info(f"Processing jobs with {args.workers} workers; Ctrl+C to stop.")
+    job_queue.WorkerPool(args.workers).run_forever()
+
+
+WAREHOUSE_ARGUMENT = (("--warehouse",), {"type": int, "default": None,
+                                          "help": "only this warehouse id; all sites in parallel when omitted"})
+
+
+def _run_sites(name: str, work, warehouse_id: int | None) -> None:
+    """Run ``work(db, warehouse_id)`` for one site, or for every site in parallel."""
+    from app.inventory import warehouses
+
+    migrations.import_models()
+    started = time.perf_counter()
+    sites = [warehouse_id] if warehouse_id is not None else None
+    results = warehouses.run_per_site(work, sites)
+    for site, created in results.items():
+        if created is None:
+            logger.error(f"Warehouse {site}: {name} failed")
+        else:
+            logger.info(f"Warehouse {site}: created {created} {name} tasks")
+    logger.info(f"Finished {name} for {len(results)} warehouses in {time.perf_counter() - started:.1f}s")
+
+
+@command("replenish", "Create replenishment tasks for every picking location below min",
+         arguments=[WAREHOUSE_ARGUMENT])
+def cmd_replenish(args):
+    from app.inventory import replenishment
+
+    _run_sites("replenishment", lambda db, site: replenishment.replenish(db, warehouse_id=site), args.warehouse)
+
+
+@command("crossdock", "Match pick shortfalls against pending receipts", arguments=[WAREHOUSE_ARGUMENT])
+def cmd_crossdock(args):
+    from app.outbound import crossdock
+
+    _run_sites("cross-dock", lambda db, site: crossdock.match(db, warehouse_id=site), args.warehouse)
+
+
+@command("archive", "Move completed pick lists and goods receipts into the archive tables", arguments=[
+    (("--days",), {"type": int, "default": None, "help": "archive documents older than this (ARCHIVE_AFTER_DAYS)"}),
+    (("--batch-size",), {"type": int, "default": None, "help": "documents per transaction (ARCHIVE_BATCH_SIZE)"}),
+])
+def cmd_archive(args):
+    from app.inventory import archival
+
+    migrations.import_models()
+    started = time.perf_counter()
+    totals = archival.archive_completed(args.days, args.batch_size)
+    logger.info(
+        f"Archived {totals['pick_lists']} pick lists and {totals['goods_receipts']} goods receipts"
+        f" in {time.perf_counter() - started:.1f}s"
+    )
+
+
+@command("purge-sync-deletions", "Delete old delta sync tombstones", arguments=[
+    (("--days",), {"type": int, "default": None, "help": "keep this many days (SYNC_TOMBSTONE_DAYS)"}),
+])
+def cmd_purge_sync_deletions(args):
+    from app.sync import delta_sync
+
+    migrations.import_models()
+    db = SessionLocal()
+    try:
+        purged = delta_sync.purge_deletions(db, args.days)
+        db.commit()
+        logger.info(f"Purged {purged} sync tombstones.")
+    finally:
+        db.close()
+
+
+@command("reconcile-open-items", "Recount open lines on goods receipts and pick lists and fix drifted counters")
+def cmd_reconcile_open_items(args):
+    from app.inventory import stock_operations
+
+    migrations.import_models()
+    db = SessionLocal()
+    try:
+        repaired = stock_operations.reconcile_open_items(db)
+        db.commit()
+        for table, count in repaired.items():
+            (logger.warning if count else logger.info)(f"{table}: repaired {count} open-item counters")
+    finally:
+        db.close()
+
+
+@command("place-warehouse", "Build a warehouse's partial indexes in a tablespace", arguments=[
+    (("--warehouse",), {"type": int, "required": True, "help": "warehouse id"}),
+    (("--tablespace",), {"required": True, "help": "existing PostgreSQL tablespace"}),
+])
+def cmd_place_warehouse(args):
+    from app.core.database import engine
+    from app.inventory import warehouses
+
+    migrations.import_models()
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        names = warehouses.place_warehouse(conn, args.warehouse, args.tablespace)
+    logger.info(f"Warehouse {args.warehouse}: {len(names)} indexes in tablespace {args.tablespace}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.manage")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, (_, help_text, arguments) in COMMANDS.items():
+        subparser = subparsers.add_parser(name, help=help_text)
+        for arg_names, arg_kwargs in arguments:
+            subparser.add_argument(*arg_names, **arg_kwargs)
+    args = parser.parse_args(argv)
+    COMMANDS[args.command][0](args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,220 @@
+"""
+Cross-dock matching between pick list shortfalls and pending goods receipts.
+
+A pick list line with no allocated stock ("Out of Stock" or "Shortfall of X")
+still needs ``required_quantity - allocated_quantity``. When that product is
+sitting on the dock in a pending GRN line, putting it away only to pick it
+straight back out costs two touches per unit. ``match`` instead pairs each
+shortfall with pending receipt quantity and creates a cross-dock task that
+takes it from the dock straight to packing.
+
+Matching is one set-based statement. Shortfalls (oldest pick list first) and
+receipt quantity (oldest GRN line first) become consecutive intervals on a
+running sum per (warehouse, product); goods never cross-dock between sites. Every overlapping pair of intervals is a task for the
+overlap's length. The result is a FIFO assignment that never over-allocates
+either side. It is followed by one bulk INSERT of tasks and two executemany
+UPDATEs that reserve ``crossdock_quantity`` on both lines. Putaway cannot take
+the reserved receipt quantity, and the next run does not match it again.
+
+Shortfall lines carry no batch, so any received batch of the product matches;
+the task records the batch that was received. "Low Shelf Life" lines are
+skipped because a GRN line has no dates to check them against.
+
+``match`` runs after every GRN and pick list upload for the products involved
+at that site. POST /outbound/crossdock/run does a full pass. Runs are
+serialized with advisory locks, in the same way as replenishment.
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import select, insert, update, func, bindparam, or_
+from sqlalchemy.orm import Session
+
+from app.core import events
+from app.core.versioning import mark_site_changed
+from app.inventory import inventory_models, stock_operations
+
+CrossDockTask = inventory_models.CrossDockTask
+GoodsReceipt = inventory_models.GoodsReceipt
+GoodsReceiptItem = inventory_models.GoodsReceiptItem
+PickList = inventory_models.PickList
+PickListItem = inventory_models.PickListItem
+
+LOW_SHELF_LIFE_NOTE = "Low Shelf Life"
+
+# pg_advisory_xact_lock(namespace, key): key 0 is the run over all sites, negative
+# keys are single-site runs (-warehouse_id) and positive keys are product ids.
+LOCK_NAMESPACE = 4302
+FULL_RUN_KEY = 0
+
+
+def _lock(db: Session, product_ids: list[int] | None, warehouse_id: int | None) -> None:
+    if warehouse_id is None:
+        db.execute(select(func.pg_advisory_xact_lock(LOCK_NAMESPACE, FULL_RUN_KEY)))
+        return
+    db.execute(select(func.pg_advisory_xact_lock_shared(LOCK_NAMESPACE, FULL_RUN_KEY)))
+    if product_ids is None:
+        db.execute(select(func.pg_advisory_xact_lock(LOCK_NAMESPACE, -warehouse_id)))
+        return
+    db.execute(select(func.pg_advisory_xact_lock_shared(LOCK_NAMESPACE, -warehouse_id)))
+    for product_id in sorted(set(product_ids)):
+        db.execute(select(func.pg_advisory_xact_lock(LOCK_NAMESPACE, product_id)))
+
+
+def match_statement(product_ids: list[int] | None = None, warehouse_id: int | None = None):
+    """Rows of (pick_list_item_id, goods_receipt_item_id, warehouse_id, product_id, batch, quantity)."""
+    def scoped(stmt, product_column, warehouse_column):
+        if product_ids is not None:
+            stmt = stmt.where(product_column.in_(product_ids))
+        if warehouse_id is not None:
+            stmt = stmt.where(warehouse_column == warehouse_id)
+        return stmt
+
+    need = PickListItem.required_quantity - PickListItem.allocated_quantity - PickListItem.crossdock_quantity
+    demand_rows = scoped(
+        select(PickListItem.id, PickList.warehouse_id, PickListItem.product_id, need.label("need"))
+        .join(PickList, PickList.id == PickListItem.picklist_id)
+        .where(
+            PickListItem.status == inventory_models.PickListItemStatus.PENDING,
+            PickListItem.location_id.is_(None),
+            or_(PickListItem.notes.is_(None), PickListItem.notes != LOW_SHELF_LIFE_NOTE),
+            need > 0,
+        ),
+        PickListItem.product_id, PickList.warehouse_id,
+    ).subquery()
+    demand_window = dict(partition_by=(demand_rows.c.warehouse_id, demand_rows.c.product_id),
+                         order_by=demand_rows.c.id)
+    demand = select(
+        demand_rows.c.id, demand_rows.c.warehouse_id, demand_rows.c.product_id,
+        (func.sum(demand_rows.c.need).over(**demand_window) - demand_rows.c.need).label("start"),
+        func.sum(demand_rows.c.need).over(**demand_window).label("end"),
+    ).cte("demand")
+
+    available = GoodsReceiptItem.quantity - GoodsReceiptItem.putaway_quantity - GoodsReceiptItem.crossdock_quantity
+    supply_rows = scoped(
+        select(GoodsReceiptItem.id, GoodsReceipt.warehouse_id, GoodsReceiptItem.product_id, GoodsReceiptItem.batch,
+               available.label("available"))
+        .join(GoodsReceipt, GoodsReceipt.id == GoodsReceiptItem.goods_receipt_id)
+        .where(
+            GoodsReceiptItem.status == inventory_models.GRNItemStatus.PENDING,
+            GoodsReceiptItem.product_id.in_(select(demand.c.product_id)),
+            available > 0,
+        ),
+        GoodsReceiptItem.product_id, GoodsReceipt.warehouse_id,
+    ).subquery()
+    supply_window = dict(partition_by=(supply_rows.c.warehouse_id, supply_rows.c.product_id),
+                         order_by=supply_rows.c.id)
+    supply = select(
+        supply_rows.c.id, supply_rows.c.warehouse_id, supply_rows.c.product_id, supply_rows.c.batch,
+        (func.sum(supply_rows.c.available).over(**supply_window) - supply_rows.c.available).label("start"),
+        func.sum(supply_rows.c.available).over(**supply_window).label("end"),
+    ).cte("supply")
+
+    overlap = func.least(demand.c.end, supply.c.end) - func.greatest(demand.c.start, supply.c.start)
+    return (
+        select(
+            demand.c.id.label("pick_list_item_id"), supply.c.id.label("goods_receipt_item_id"),
+            demand.c.warehouse_id, demand.c.product_id, supply.c.batch, overlap.label("quantity"),
+        )
+        .join_from(demand, supply, (supply.c.warehouse_id == demand.c.warehouse_id)
+                   & (supply.c.product_id == demand.c.product_id)
+                   & (supply.c.start < demand.c.end) & (demand.c.start < supply.c.end))
+        .order_by(demand.c.warehouse_id, demand.c.product_id, demand.c.id, supply.c.id)
+    )
+
+
+def match(db: Session, product_ids: list[int] | None = None, warehouse_id: int | None = None) -> int:
+    """
+    Create cross-dock tasks for every product (or just ``product_ids``), at every
+    site or only ``warehouse_id``; returns the count.
+    """
+    if product_ids is not None and not product_ids:
+        return 0
+    _lock(db, product_ids, warehouse_id)
+    pairs = db.execute(match_statement(product_ids, warehouse_id)).all()
+    if not pairs:
+        return 0
+
+    db.execute(insert(CrossDockTask), [
+        dict(goods_receipt_item_id=row.goods_receipt_item_id, pick_list_item_id=row.pick_list_item_id,
+             warehouse_id=row.warehouse_id, product_id=row.product_id, batch=row.batch, quantity=row.quantity,
+             status=inventory_models.CrossDockStatus.OPEN)
+        for row in pairs
+    ])
+    for model, key in ((GoodsReceiptItem, "goods_receipt_item_id"), (PickListItem, "pick_list_item_id")):
+        table = model.__table__
+        db.execute(
+            update(table)
+            .where(table.c.id == bindparam("line_id"))
+            .values(crossdock_quantity=table.c.crossdock_quantity + bindparam("reserve")),
+            [{"line_id": getattr(row, key), "reserve": row.quantity} for row in pairs],
+        )
+    sites = {row.warehouse_id for row in pairs}
+    mark_site_changed(db, "pick_lists", sites)
+    mark_site_changed(db, "goods_receipts", sites)
+    return len(pairs)
+
+
+def _claim(db: Session, task_id: int, status, user_id: int | None, warehouse_id: int | None = None):
+    site = () if warehouse_id is None else (CrossDockTask.warehouse_id == warehouse_id,)
+    return db.execute(
+        update(CrossDockTask)
+        .where(CrossDockTask.id == task_id, CrossDockTask.status == inventory_models.CrossDockStatus.OPEN, *site)
+        .values(status=status, completed_at=datetime.now(timezone.utc), completed_by_user_id=user_id)
+        .returning(CrossDockTask.id, CrossDockTask.goods_receipt_item_id, CrossDockTask.pick_list_item_id,
+                   CrossDockTask.warehouse_id, CrossDockTask.product_id, CrossDockTask.quantity)
+        .execution_options(synchronize_session=False)
+    ).first()
+
+
+def complete_task(db: Session, task_id: int, user_id: int | None, warehouse_id: int | None = None):
+    """
+    The goods reached packing: count them as picked on the pick line and close
+    the receipt line if nothing is left on it. Returns the task row, or None if
+    it is not open (or not at ``warehouse_id``, when given). Raises LookupError
+    when the pick line was closed meanwhile.
+    """
+    task = _claim(db, task_id, inventory_models.CrossDockStatus.DONE, user_id, warehouse_id)
+    if task is None:
+        return None
+    line = stock_operations.add_crossdock_pick(db, task.pick_list_item_id, task.quantity, user_id)
+    if line is None:
+        raise LookupError("The pick list line is no longer open; cancel this task instead.")
+    events.publish(db, events.PICKLIST_ITEM_PICKED, picklist_id=line.picklist_id, item_id=line.id)
+    if line.picklist_completed:
+        events.publish(db, events.PICKLIST_COMPLETED, picklist_id=line.picklist_id)
+    receipt_line = stock_operations.close_receipt_line_if_covered(db, task.goods_receipt_item_id)
+    if receipt_line is not None and receipt_line.receipt_completed:
+        events.publish(db, events.RECEIPT_COMPLETED, goods_receipt_id=receipt_line.goods_receipt_id)
+    mark_site_changed(db, "pick_lists", [task.warehouse_id])
+    mark_site_changed(db, "goods_receipts", [task.warehouse_id])
+    return task
+
+
+def cancel_task(db: Session, task_id: int, user_id: int | None, warehouse_id: int | None = None):
+    """
+    Cancel an open task (at ``warehouse_id``, when given) and release both
+    reservations. Returns the task row or None. Raises LookupError if the
+    receipt line was already closed, because releasing would leave quantity
+    that nobody can put away.
+    """
+    task = _claim(db, task_id, inventory_models.CrossDockStatus.CANCELLED, user_id, warehouse_id)
+    if task is None:
+        return None
+    released = db.execute(
+        update(GoodsReceiptItem)
+        .where(GoodsReceiptItem.id == task.goods_receipt_item_id,
+               GoodsReceiptItem.status == inventory_models.GRNItemStatus.PENDING)
+        .values(crossdock_quantity=GoodsReceiptItem.crossdock_quantity - task.quantity)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not released:
+        raise LookupError("The receipt line is already closed; complete this task instead.")
+    db.execute(
+        update(PickListItem)
+        .where(PickListItem.id == task.pick_list_item_id)
+        .values(crossdock_quantity=PickListItem.crossdock_quantity - task.quantity)
+        .execution_options(synchronize_session=False)
+    )
+    mark_site_changed(db, "pick_lists", [task.warehouse_id])
+    mark_site_changed(db, "goods_receipts", [task.warehouse_id])
+    return task
@@ -0,0 +1,76 @@
+import time
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from typing import List
+
+from . import crossdock, crossdock_schemas
+from app.inventory import inventory_models
+from app.auth.dependencies import require_role, get_db, get_warehouse_id
+from app.auth import auth_models
+
+router = APIRouter(
+    tags=["Outbound - Cross-dock"]
+)
+
+@router.post("/crossdock/run", response_model=crossdock_schemas.CrossDockRun)
+def run_crossdock_matching(
+    db: Session = Depends(get_db),
+    current_user: auth_models.User = Depends(require_role(["admin", "manager", "supervisor"])),
+    warehouse_id: int | None = Depends(get_warehouse_id)
+):
+    """Full pass: match every open pick shortfall against pending receipt quantity (at the request's site)."""
+    started = time.perf_counter()
+    created = crossdock.match(db, warehouse_id=warehouse_id)
+    db.commit()
+    return {"created_tasks": created, "seconds": round(time.perf_counter() - started, 3)}
+
+@router.get("/crossdock/tasks", response_model=List[crossdock_schemas.CrossDockTask])
+def list_crossdock_tasks(
+    status: inventory_models.CrossDockStatus = inventory_models.CrossDockStatus.OPEN,
+    limit: int = 500,
+    db: Session = Depends(get_db),
+    current_user: auth_models.User = Depends(require_role(["admin", "manager", "supervisor", "operator"])),
+    warehouse_id: int | None = Depends(get_warehouse_id)
+):
+    query = db.query(inventory_models.CrossDockTask).filter(
+        inventory_models.CrossDockTask.status == status
+    )
+    if warehouse_id is not None:
+        query = query.filter(inventory_models.CrossDockTask.warehouse_id == warehouse_id)
+    return query.order_by(inventory_models.CrossDockTask.id).limit(min(limit, 5000)).all()
+
+@router.post("/crossdock/tasks/{task_id}/complete")
+def complete_crossdock_task(
+    task_id: int,
+    db: Session = Depends(get_db),
+    current_user: auth_models.User = Depends(require_role(["admin", "manager", "supervisor", "operator"])),
+    warehouse_id: int | None = Depends(get_warehouse_id)
+):
+    try:
+        task = crossdock.complete_task(db, task_id, current_user.id, warehouse_id)
+    except LookupError as e:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
+    if task is None:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Open cross-dock task not found.")
+    db.commit()
+    return {"message": "Cross-dock task completed successfully."}
+
+@router.post("/crossdock/tasks/{task_id}/cancel")
+def cancel_crossdock_task(
+    task_id: int,
+    db: Session = Depends(get_db),
+    current_user: auth_models.User = Depends(require_role(["admin", "manager", "supervisor"])),
+    warehouse_id: int | None = Depends(get_warehouse_id)
+):
+    try:
+        task = crossdock.cancel_task(db, task_id, current_user.id, warehouse_id)
+    except LookupError as e:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
+    if task is None:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Open cross-dock task not found.")
+    db.commit()
+    return {"message": "Cross-dock task cancelled."}
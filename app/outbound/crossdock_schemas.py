@@ -0,0 +1,21 @@
+from pydantic import BaseModel
+from datetime import datetime
+from app.inventory.inventory_models import CrossDockStatus
+
+class CrossDockTask(BaseModel):
+    id: int
+    warehouse_id: int
+    goods_receipt_item_id: int
+    pick_list_item_id: int
+    product_id: int
+    batch: str | None = None
+    quantity: float
+    status: CrossDockStatus
+    created_at: datetime
+    completed_at: datetime | None = None
+    class Config:
+        from_attributes = True
+
+class CrossDockRun(BaseModel):
+    created_tasks: int
+    seconds: float
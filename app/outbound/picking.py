@@ -0,0 +1,60 @@
+"""
+Pick confirmation shared by the scan-by-scan endpoint and offline replay.
+"""
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from app.core import events
+from app.inventory import inventory_models, replenishment, stock_ledger, stock_operations
+
+PickList = inventory_models.PickList
+PickListItem = inventory_models.PickListItem
+
+
+def find_item(db: Session, item_id: int, warehouse_id: int | None = None) -> PickListItem | None:
+    """The pick line, if its pick list is at ``warehouse_id`` (any site when None)."""
+    query = db.query(PickListItem).filter(PickListItem.id == item_id)
+    if warehouse_id is not None:
+        query = query.join(PickList, PickList.id == PickListItem.picklist_id).filter(
+            PickList.warehouse_id == warehouse_id
+        )
+    return query.first()
+
+
+def confirm_pick(db: Session, item_id: int, user_id: int, picked_at: datetime | None = None,
+                 warehouse_id: int | None = None):
+    """
+    Pick one line: claim it, take the stock, record the movement and complete
+    the pick list if this was its last line. With ``warehouse_id`` only lines of
+    that site's pick lists can be picked. Raises HTTPException (404/400) when
+    the line cannot be picked; the caller commits or rolls back.
+    """
+    # Claim the line atomically: a second scan of the same line finds it already picked.
+    pick_item = stock_operations.claim_pick_item(db, item_id, user_id, picked_at, warehouse_id)
+    if pick_item is None:
+        existing = find_item(db, item_id, warehouse_id)
+        if not existing:
+            raise HTTPException(status_code=404, detail="Pick list item not found.")
+        if existing.status == inventory_models.PickListItemStatus.PICKED:
+            raise HTTPException(status_code=400, detail="This item has already been picked.")
+        raise HTTPException(status_code=400, detail="Cannot pick item with no allocated inventory.")
+
+    inventory_record = stock_operations.remove_picked_stock(
+        db, product_id=pick_item.product_id, location_id=pick_item.location_id,
+        batch=pick_item.batch, quantity=pick_item.allocated_quantity
+    )
+    if inventory_record is None:
+        raise HTTPException(status_code=404, detail="Inventory to pick from does not exist.")
+
+    stock_ledger.record_inventory_movement(
+        db, inventory_record, -pick_item.allocated_quantity, inventory_models.MovementTypeEnum.PICK,
+        reference_type="pick_list_item", reference_id=pick_item.id, user_id=user_id
+    )
+    events.publish(db, events.PICKLIST_ITEM_PICKED, picklist_id=pick_item.picklist_id, item_id=pick_item.id)
+    events.publish(db, events.INVENTORY_CHANGED, location_id=pick_item.location_id, product_id=pick_item.product_id)
+    if pick_item.picklist_completed:
+        events.publish(db, events.PICKLIST_COMPLETED, picklist_id=pick_item.picklist_id)
+    replenishment.replenish_after_pick(db, pick_item.product_id, pick_item.location_id)
+    return pick_item
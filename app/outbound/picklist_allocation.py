@@ -0,0 +1,146 @@
+"""
+Create a pick list from uploaded sheet rows and allocate stock FEFO.
+
+The sheet has "OBD No." and "Customer Name" on the first row and one line per
+"EAN No." / "Quantity" / "Shelf Life" (a "min-max" percentage range). Every row
+is validated before allocation; all row errors are reported together as a 400.
+Used by the upload endpoint and by the background job worker, in the caller's
+transaction.
+"""
+from datetime import date
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core import events
+from app.core.config import settings
+from app.core.spreadsheets import cell_text
+from app.core.versioning import mark_site_changed
+from app.inventory import inventory_models, warehouses
+from app.inventory.product_cache import product_index
+from . import crossdock
+
+
+def calculate_shelf_life_percentage(mfg_date, exp_date):
+    if not mfg_date or not exp_date: return 0
+    today = date.today()
+    if today > exp_date: return 0
+    total_days = (exp_date - mfg_date).days
+    remaining_days = (exp_date - today).days
+    if total_days <= 0: return 0
+    return round((remaining_days / total_days) * 100)
+
+
+def _parse_lines(db: Session, rows: list[dict]):
+    products = product_index.get_many_by_ean(db, [cell_text(row.get("EAN No.")) for row in rows])
+    lines, errors = [], []
+    for index, row in enumerate(rows):
+        line_no = index + 2
+        ean = cell_text(row.get("EAN No."))
+        product = products.get(ean)
+        if not product:
+            errors.append(f"Product with EAN {ean} not found in row {line_no}.")
+            continue
+        try:
+            required_qty = float(row.get("Quantity"))
+        except (TypeError, ValueError):
+            errors.append(f"Invalid Quantity {row.get('Quantity')!r} in row {line_no}.")
+            continue
+        try:
+            min_sl, max_sl = map(int, cell_text(row.get("Shelf Life")).split('-'))
+        except ValueError:
+            errors.append(f"Invalid Shelf Life {row.get('Shelf Life')!r} in row {line_no}; expected e.g. 60-100.")
+            continue
+        lines.append((product, required_qty, min_sl, max_sl))
+    if errors:
+        raise HTTPException(status_code=400, detail=errors)
+    return lines
+
+
+def create_picklist(db: Session, rows: list[dict], progress=None,
+                    warehouse_id: int | None = None) -> inventory_models.PickList:
+    """``progress(done, total)`` is called as lines are allocated. Stock is allocated only from
+    ``warehouse_id`` (or the default site)."""
+    if not rows:
+        raise HTTPException(status_code=400, detail="Excel file is empty.")
+
+    obd_number = cell_text(rows[0].get("OBD No."))
+    customer_name = cell_text(rows[0].get("Customer Name"))
+    # Archived pick lists keep their OBD numbers too.
+    archived = inventory_models.PickListArchive
+    exists = db.query(inventory_models.PickList).filter(inventory_models.PickList.obd_number == obd_number).first()
+    if exists or db.execute(select(archived.c.id).where(archived.c.obd_number == obd_number).limit(1)).first():
+        raise HTTPException(status_code=400, detail=f"OBD Number {obd_number} already exists.")
+    lines = _parse_lines(db, rows)
+
+    picklist = inventory_models.PickList(obd_number=obd_number, customer_name=customer_name,
+                                         warehouse_id=warehouses.resolve(warehouse_id))
+    db.add(picklist)
+    db.flush()
+
+    reserved_at = set()
+    open_items = 0
+    short = set()
+    for index, (product, required_qty, min_sl, max_sl) in enumerate(lines):
+        if progress:
+            progress(index + 1, len(lines))
+
+        # Index range scan on ix_inventory_warehouse_available_fefo, already in FEFO order.
+        available_inventory = db.query(inventory_models.Inventory).filter(
+            inventory_models.Inventory.warehouse_id == picklist.warehouse_id,
+            inventory_models.Inventory.product_id == product.id,
+            inventory_models.Inventory.available_quantity > 0
+        ).order_by(inventory_models.Inventory.exp_date, inventory_models.Inventory.quantity).all()
+
+        if not available_inventory:
+            item = inventory_models.PickListItem(picklist_id=picklist.id, product_id=product.id, required_quantity=required_qty, allocated_quantity=0, notes="Out of Stock")
+            db.add(item)
+            open_items += 1
+            short.add(product.id)
+            continue
+
+        valid_stock = [s for s in available_inventory if min_sl <= calculate_shelf_life_percentage(s.mfg_date, s.exp_date) <= max_sl]
+
+        if not valid_stock:
+            item = inventory_models.PickListItem(picklist_id=picklist.id, product_id=product.id, required_quantity=required_qty, allocated_quantity=0, notes="Low Shelf Life")
+            db.add(item)
+            open_items += 1
+            continue
+
+        qty_to_allocate = required_qty
+        for stock in valid_stock:
+            if qty_to_allocate <= 0: break
+
+            current_reserved = stock.reserved_quantity if stock.reserved_quantity is not None else 0
+            # Reservations made earlier in this upload are not flushed yet, so
+            # recompute from the in-memory row rather than available_quantity.
+            available_qty = stock.quantity - current_reserved
+            if available_qty <= 0: continue
+            alloc_qty = min(qty_to_allocate, available_qty)
+
+            new_picklist_item = inventory_models.PickListItem(
+                picklist_id=picklist.id, product_id=product.id, location_id=stock.location_id,
+                required_quantity=required_qty, allocated_quantity=alloc_qty, batch=stock.batch
+            )
+            db.add(new_picklist_item)
+            open_items += 1
+            stock.reserved_quantity = current_reserved + alloc_qty
+            reserved_at.add((stock.location_id, product.id))
+            qty_to_allocate -= alloc_qty
+
+        if qty_to_allocate > 0:
+            item = inventory_models.PickListItem(picklist_id=picklist.id, product_id=product.id, required_quantity=required_qty, allocated_quantity=(required_qty - qty_to_allocate), notes=f"Shortfall of {qty_to_allocate}")
+            db.add(item)
+            open_items += 1
+            short.add(product.id)
+
+    picklist.open_items = open_items
+    if short and settings.CROSSDOCK_AUTO_MATCH:
+        db.flush()
+        crossdock.match(db, sorted(short), picklist.warehouse_id)
+    events.publish(db, events.PICKLIST_CREATED, picklist_id=picklist.id, obd_number=obd_number)
+    for location_id, product_id in sorted(reserved_at):
+        events.publish(db, events.INVENTORY_CHANGED, location_id=location_id, product_id=product_id)
+    mark_site_changed(db, "pick_lists", [picklist.warehouse_id])
+    return picklist
@@ -1,139 +1,156 @@
-from fastapi import APIRouter, Depends, HTTPException, File, UploadFile
-from sqlalchemy.orm import Session, joinedload, selectinload
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Request, Response
+from sqlalchemy import select, true
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload
 from typing import List
-import pandas as pd
-from datetime import datetime, date, timezone
 
-from . import picklist_schemas
-from app.inventory import inventory_models
-from app.auth.dependencies import require_role, get_db, get_current_user
+from . import picklist_schemas, picklist_allocation, picking
+from app.inventory import inventory_models, stock_operations
+from app.jobs import job_queue
+from app.jobs.jobs_models import JobKind
+from app.core.fast_json import FastJSONResponse
+from app.core.http_cache import CACHE_CONTROL, version_etag, etag_matches, not_modified
+from app.core import events
+from app.core.spreadsheets import read_rows
+from app.core.versioning import mark_site_changed
+from app.auth.dependencies import require_role, get_db, get_current_user, get_warehouse_id
 from app.auth.auth_models import User
 
 router = APIRouter(
     tags=["Outbound - Pick List"]
 )
 
-def calculate_shelf_life_percentage(mfg_date, exp_date):
-    if not mfg_date or not exp_date: return 0
-    today = date.today()
-    if today > exp_date: return 0
-    total_days = (exp_date - mfg_date).days
-    remaining_days = (exp_date - today).days
-    if total_days <= 0: return 0
-    return round((remaining_days / total_days) * 100)
+Inventory = inventory_models.Inventory
+Product = inventory_models.Product
+Location = inventory_models.Location
+PickList = inventory_models.PickList
+PickListItem = inventory_models.PickListItem
+
+# Pick list responses embed products and locations, so their counters are part of the ETag.
+PICKLIST_VERSIONS = ("pick_lists", "products", "locations")
 
 @router.get("/picklists/{picklist_id}", response_model=picklist_schemas.PickList)
 def get_picklist_details(
     picklist_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    warehouse_id: int | None = Depends(get_warehouse_id)
 ):
-    picklist = db.query(inventory_models.PickList).options(
-        selectinload(inventory_models.PickList.items)
-        .joinedload(inventory_models.PickListItem.product),
-        selectinload(inventory_models.PickList.items)
-        .joinedload(inventory_models.PickListItem.location)
-    ).filter(inventory_models.PickList.id == picklist_id).first()
-
-    if not picklist:
+    # Fast path: two column-tuple queries instead of ORM hydration plus one
+    # inventory lookup per line; the response has the PickList schema's shape.
+    query = (
+        select(PickList.id, PickList.obd_number, PickList.customer_name, PickList.warehouse_id,
+               PickList.status, PickList.created_at)
+        .where(PickList.id == picklist_id)
+    )
+    if warehouse_id is not None:
+        query = query.where(PickList.warehouse_id == warehouse_id)
+    header = db.execute(query).first()
+    if not header:
         raise HTTPException(status_code=404, detail="Pick List not found")
 
-    for item in picklist.items:
-        if item.location_id and item.batch:
-            inventory_record = db.query(inventory_models.Inventory).filter(
-                inventory_models.Inventory.product_id == item.product_id,
-                inventory_models.Inventory.location_id == item.location_id,
-                inventory_models.Inventory.batch == item.batch
-            ).first()
-            if inventory_record:
-                item.mfg_date = inventory_record.mfg_date
-                item.exp_date = inventory_record.exp_date
-            
-    return picklist
+    stock_dates = (
+        select(Inventory.mfg_date, Inventory.exp_date)
+        .where(
+            Inventory.product_id == PickListItem.product_id,
+            Inventory.location_id == PickListItem.location_id,
+            Inventory.batch == PickListItem.batch,
+        )
+        .limit(1)
+        .lateral()
+    )
+    rows = db.execute(
+        select(
+            PickListItem.id, PickListItem.batch, PickListItem.required_quantity,
+            PickListItem.allocated_quantity, PickListItem.status, PickListItem.notes,
+            Product.id, Product.ean, Product.material_code, Product.name, Product.brand, Product.uom,
+            Product.mrp, Product.case_size, Product.min_qty, Product.max_qty,
+            Location.id, Location.code, Location.location_type, Location.warehouse_id,
+            stock_dates.c.mfg_date, stock_dates.c.exp_date,
+        )
+        .join(Product, Product.id == PickListItem.product_id)
+        .outerjoin(Location, Location.id == PickListItem.location_id)
+        .outerjoin(stock_dates, true())
+        .where(PickListItem.picklist_id == picklist_id)
+        .order_by(PickListItem.id)
+    )
+    items = [
+        {
+            "id": item_id,
+            "product": {
+                "id": product_id, "ean": ean, "material_code": material_code, "name": name,
+                "brand": brand, "uom": uom, "mrp": mrp, "case_size": case_size,
+                "min_qty": min_qty, "max_qty": max_qty,
+            },
+            "location": (
+                {"code": location_code, "location_type": location_type, "id": location_id,
+                 "warehouse_id": location_warehouse_id}
+                if location_id is not None else None
+            ),
+            "batch": batch, "required_quantity": required, "allocated_quantity": allocated,
+            "status": status, "notes": notes, "mfg_date": mfg_date, "exp_date": exp_date,
+        }
+        for (item_id, batch, required, allocated, status, notes,
+             product_id, ean, material_code, name, brand, uom, mrp, case_size, min_qty, max_qty,
+             location_id, location_code, location_type, location_warehouse_id, mfg_date, exp_date) in rows
+    ]
+    return FastJSONResponse({**header._asdict(), "items": items})
 
 @router.get("/picklists/", response_model=List[picklist_schemas.PickList])
 def get_all_picklists(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    warehouse_id: int | None = Depends(get_warehouse_id)
 ):
-    return db.query(inventory_models.PickList).options(
-        selectinload(inventory_models.PickList.items)
+    """Send the returned ETag back as If-None-Match to get a 304 when nothing changed."""
+    etag = version_etag(db, f"picklists-{warehouse_id or 'all'}", PICKLIST_VERSIONS, warehouse_id)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+
+    query = db.query(inventory_models.PickList).options(
+        selectinload(inventory_models.PickList.items).joinedload(inventory_models.PickListItem.product),
+        selectinload(inventory_models.PickList.items).joinedload(inventory_models.PickListItem.location),
     ).filter(
         inventory_models.PickList.status == inventory_models.PickListStatus.PENDING
-    ).order_by(inventory_models.PickList.id.desc()).all()
+    )
+    if warehouse_id is not None:
+        query = query.filter(inventory_models.PickList.warehouse_id == warehouse_id)
+    return query.order_by(inventory_models.PickList.id.desc()).all()
 
 @router.post("/picklists/upload/")
 def upload_picklist(
     file: UploadFile = File(...),
+    background: bool = False,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_role(["admin", "manager", "supervisor"]))
+    current_user: User = Depends(require_role(["admin", "manager", "supervisor"])),
+    warehouse_id: int | None = Depends(get_warehouse_id)
 ):
-    try:
-        df = pd.read_excel(file.file).fillna('')
-        obd_number = str(df.iloc[0]["OBD No."])
-        customer_name = str(df.iloc[0]["Customer Name"])
-
-        if db.query(inventory_models.PickList).filter(inventory_models.PickList.obd_number == obd_number).first():
-            raise HTTPException(status_code=400, detail=f"OBD Number {obd_number} already exists.")
-
-        picklist = inventory_models.PickList(obd_number=obd_number, customer_name=customer_name)
-        db.add(picklist)
-        db.flush()
-
-        for index, row in df.iterrows():
-            ean = str(row["EAN No."])
-            required_qty = float(row["Quantity"])
-            product = db.query(inventory_models.Product).filter(inventory_models.Product.ean == ean).first()
-            if not product:
-                raise HTTPException(status_code=400, detail=f"Product with EAN {ean} not found.")
-
-            available_inventory = db.query(inventory_models.Inventory).filter(
-                inventory_models.Inventory.product_id == product.id,
-                inventory_models.Inventory.quantity > func.coalesce(inventory_models.Inventory.reserved_quantity, 0)
-            ).all()
-
-            if not available_inventory:
-                item = inventory_models.PickListItem(picklist_id=picklist.id, product_id=product.id, required_quantity=required_qty, allocated_quantity=0, notes="Out of Stock")
-                db.add(item)
-                continue
-
-            shelf_life_req = str(row["Shelf Life"])
-            min_sl, max_sl = map(int, shelf_life_req.split('-'))
-
-            valid_stock = [s for s in available_inventory if min_sl <= calculate_shelf_life_percentage(s.mfg_date, s.exp_date) <= max_sl]
-
-            if not valid_stock:
-                item = inventory_models.PickListItem(picklist_id=picklist.id, product_id=product.id, required_quantity=required_qty, allocated_quantity=0, notes="Low Shelf Life")
-                db.add(item)
-                continue
-            
-            valid_stock.sort(key=lambda x: (x.exp_date, x.quantity))
-            
-            qty_to_allocate = required_qty
-            for stock in valid_stock:
-                if qty_to_allocate <= 0: break
-                
-                current_reserved = stock.reserved_quantity if stock.reserved_quantity is not None else 0
-                available_qty = stock.quantity - current_reserved
-                alloc_qty = min(qty_to_allocate, available_qty)
-
-                new_picklist_item = inventory_models.PickListItem(
-                    picklist_id=picklist.id, product_id=product.id, location_id=stock.location_id,
-                    required_quantity=required_qty, allocated_quantity=alloc_qty, batch=stock.batch
-                )
-                db.add(new_picklist_item)
-                stock.reserved_quantity = current_reserved + alloc_qty
-                qty_to_allocate -= alloc_qty
-
-            if qty_to_allocate > 0:
-                item = inventory_models.PickListItem(picklist_id=picklist.id, product_id=product.id, required_quantity=required_qty, allocated_quantity=(required_qty - qty_to_allocate), notes=f"Shortfall of {qty_to_allocate}")
-                db.add(item)
+    """
+    Create a pick list from an uploaded sheet and allocate stock FEFO. With
+    ``background=true`` the file is queued and a 202 with the job is returned at
+    once; poll /jobs/{id} for the result.
+    """
+    if background:
+        return job_queue.submit(db, JobKind.PICKLIST_UPLOAD, file, current_user.id, warehouse_id)
 
+    try:
+        rows = read_rows(file)
+        picklist = picklist_allocation.create_picklist(db, rows, warehouse_id=warehouse_id)
         db.commit()
         db.refresh(picklist)
         return picklist
 
+    except HTTPException:
+        db.rollback()
+        raise
+    except IntegrityError:
+        # A concurrent upload of the same OBD won the unique index.
+        db.rollback()
+        raise HTTPException(status_code=409, detail="OBD Number already exists.")
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
@@ -142,80 +159,35 @@ def upload_picklist(
 def execute_pick_item(
     item_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_role(["admin", "manager", "supervisor", "operator"]))
+    current_user: User = Depends(require_role(["admin", "manager", "supervisor", "operator"])),
+    warehouse_id: int | None = Depends(get_warehouse_id)
 ):
-    pick_item = db.query(inventory_models.PickListItem).options(
-        joinedload(inventory_models.PickListItem.picklist)
-        .selectinload(inventory_models.PickList.items)
-    ).filter(inventory_models.PickListItem.id == item_id).first()
-
-    if not pick_item:
-        raise HTTPException(status_code=404, detail="Pick list item not found.")
-    if pick_item.status == inventory_models.PickListItemStatus.PICKED:
-        raise HTTPException(status_code=400, detail="This item has already been picked.")
-    if not pick_item.location_id:
-        raise HTTPException(status_code=400, detail="Cannot pick item with no allocated inventory.")
-
-    inventory_record = db.query(inventory_models.Inventory).filter(
-        inventory_models.Inventory.product_id == pick_item.product_id,
-        inventory_models.Inventory.location_id == pick_item.location_id,
-        inventory_models.Inventory.batch == pick_item.batch
-    ).first()
-
-    if not inventory_record:
-        raise HTTPException(status_code=404, detail="Inventory to pick from does not exist.")
-
-    inventory_record.quantity -= pick_item.allocated_quantity
-    inventory_record.reserved_quantity -= pick_item.allocated_quantity
-    
-    if inventory_record.quantity <= 0:
-        db.delete(inventory_record)
-
-    pick_item.picked_quantity = pick_item.allocated_quantity
-    pick_item.status = inventory_models.PickListItemStatus.PICKED
-    pick_item.picked_by_user_id = current_user.id
-    pick_item.picked_at = datetime.now(timezone.utc)
-    
+    pick_item = picking.confirm_pick(db, item_id, current_user.id, warehouse_id=warehouse_id)
+    mark_site_changed(db, "pick_lists", [pick_item.warehouse_id])
     db.commit()
 
-    parent_picklist = pick_item.picklist
-    all_items_picked = all(
-        item.status == inventory_models.PickListItemStatus.PICKED for item in parent_picklist.items
-    )
-    if all_items_picked:
-        parent_picklist.status = inventory_models.PickListStatus.COMPLETED
-        db.commit()
-
     return {"message": "Pick confirmed successfully."}
 
 @router.post("/picking/force-close-item/{item_id}")
 def force_close_pick_item(
     item_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_role(["admin", "manager", "supervisor"]))
+    current_user: User = Depends(require_role(["admin", "manager", "supervisor"])),
+    warehouse_id: int | None = Depends(get_warehouse_id)
 ):
-    pick_item = db.query(inventory_models.PickListItem).options(
-        joinedload(inventory_models.PickListItem.picklist)
-        .selectinload(inventory_models.PickList.items)
-    ).filter(inventory_models.PickListItem.id == item_id).first()
-
-    if not pick_item:
-        raise HTTPException(status_code=404, detail="Pick list item not found.")
-    
-    if pick_item.location_id is not None:
-        raise HTTPException(status_code=400, detail="Cannot force close an item that has allocated stock.")
-
-    pick_item.status = inventory_models.PickListItemStatus.PICKED
-    pick_item.picked_by_user_id = current_user.id
-    pick_item.picked_at = datetime.now(timezone.utc)
+    pick_item = stock_operations.force_close_pick_item(db, item_id, current_user.id, warehouse_id)
+    if pick_item is None:
+        existing = picking.find_item(db, item_id, warehouse_id)
+        if not existing:
+            raise HTTPException(status_code=404, detail="Pick list item not found.")
+        if existing.location_id is not None:
+            raise HTTPException(status_code=400, detail="Cannot force close an item that has allocated stock.")
+        return {"message": "Item has been manually closed."}
+
+    events.publish(db, events.PICKLIST_ITEM_PICKED, picklist_id=pick_item.picklist_id, item_id=pick_item.id)
+    if pick_item.picklist_completed:
+        events.publish(db, events.PICKLIST_COMPLETED, picklist_id=pick_item.picklist_id)
+    mark_site_changed(db, "pick_lists", [pick_item.warehouse_id])
     db.commit()
 
-    parent_picklist = pick_item.picklist
-    all_items_resolved = all(
-        item.status == inventory_models.PickListItemStatus.PICKED for item in parent_picklist.items
-    )
-    if all_items_resolved:
-        parent_picklist.status = inventory_models.PickListStatus.COMPLETED
-        db.commit()
-
     return {"message": "Item has been manually closed."}
\ No newline at end of file
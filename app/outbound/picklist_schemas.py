@@ -24,6 +24,7 @@ class PickList(BaseModel):
     id: int
     obd_number: str
     customer_name: str
+    warehouse_id: int
     status: PickListStatus
     created_at: datetime
     items: List[PickListItem] = []
@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session, joinedload
-from typing import List
-from datetime import date
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from datetime import date, datetime, timedelta, timezone
 
-from app.inventory import inventory_models
-from app.auth.dependencies import get_db, require_role
+from app.inventory import inventory_models, stock_ledger, archival, warehouses
+from app.auth.dependencies import get_db, require_role, get_warehouse_id
 from app.auth.auth_models import User
+from app.core.fast_json import FastJSONResponse
+from . import slotting
 
 router = APIRouter(
     tags=["Reports"]
@@ -20,93 +22,210 @@ def calculate_shelf_life_percentage(mfg_date, exp_date):
     if total_days <= 0: return 0
     return round((remaining_days / total_days) * 100)
 
+# Reports select plain column tuples and return FastJSONResponse: no ORM objects
+# are hydrated and FastAPI's encoder is skipped, which dominates time on big reports.
+Inventory = inventory_models.Inventory
+Product = inventory_models.Product
+Location = inventory_models.Location
+GoodsReceipt = inventory_models.GoodsReceipt
+GoodsReceiptItem = inventory_models.GoodsReceiptItem
+PutawayLog = inventory_models.PutawayLog
+PickList = inventory_models.PickList
+PickListItem = inventory_models.PickListItem
+
+def scoped(stmt, column, warehouse_id: int | None):
+    """Limit a report to the request's warehouse; all sites when there is none."""
+    return stmt.where(column == warehouse_id) if warehouse_id is not None else stmt
+
 @router.get("/current-stock/")
-def get_current_stock_report(db: Session = Depends(get_db), current_user: User = Depends(require_role(["admin", "manager", "operator"]))):
-    stock_data = db.query(inventory_models.Inventory).options(
-        joinedload(inventory_models.Inventory.product),
-        joinedload(inventory_models.Inventory.location)
-    ).all()
-    report = []
-    for item in stock_data:
-        report.append({
-            "EAN No.": item.product.ean, "Material": item.product.material_code, "Description": item.product.name,
-            "MFG Date": item.mfg_date, "EXP Date": item.exp_date,
-            "Shelf Life %": calculate_shelf_life_percentage(item.mfg_date, item.exp_date),
-            "Qty": item.quantity, "MRP": item.product.mrp, "Batch": item.batch, "Location": item.location.code,
-            "Reserved Qty": item.reserved_quantity,
-        })
-    return report
+def get_current_stock_report(db: Session = Depends(get_db), current_user: User = Depends(require_role(["admin", "manager", "operator"])), warehouse_id: int | None = Depends(get_warehouse_id)):
+    rows = db.execute(scoped(
+        select(
+            Product.ean, Product.material_code, Product.name, Inventory.mfg_date, Inventory.exp_date,
+            Inventory.quantity, Product.mrp, Inventory.batch, Location.code, Inventory.reserved_quantity,
+        )
+        .join(Product, Product.id == Inventory.product_id)
+        .join(Location, Location.id == Inventory.location_id),
+        Inventory.warehouse_id, warehouse_id,
+    ))
+    report = [
+        {
+            "EAN No.": ean, "Material": material, "Description": name,
+            "MFG Date": mfg_date, "EXP Date": exp_date,
+            "Shelf Life %": calculate_shelf_life_percentage(mfg_date, exp_date),
+            "Qty": quantity, "MRP": mrp, "Batch": batch, "Location": location_code,
+            "Reserved Qty": reserved,
+        }
+        for ean, material, name, mfg_date, exp_date, quantity, mrp, batch, location_code, reserved in rows
+    ]
+    return FastJSONResponse(report)
 
 @router.get("/inward-report/")
-def get_inward_report(db: Session = Depends(get_db), current_user: User = Depends(require_role(["admin", "manager", "operator"]))):
-    inward_items = db.query(inventory_models.GoodsReceiptItem).filter(
-        inventory_models.GoodsReceiptItem.status == inventory_models.GRNItemStatus.PENDING
-    ).options(
-        joinedload(inventory_models.GoodsReceiptItem.goods_receipt),
-        joinedload(inventory_models.GoodsReceiptItem.product)
-    ).all()
-    report = []
-    for item in inward_items:
-        report.append({
-            "Reference No.": item.goods_receipt.po_number, "EAN No.": item.product.ean,
-            "Material": item.product.material_code, "Description": item.product.name,
-            "Qty": item.quantity, "Open Qty": item.quantity - item.putaway_quantity, "Batch": item.batch,
-        })
-    return report
+def get_inward_report(db: Session = Depends(get_db), current_user: User = Depends(require_role(["admin", "manager", "operator"])), warehouse_id: int | None = Depends(get_warehouse_id)):
+    rows = db.execute(scoped(
+        select(
+            GoodsReceipt.po_number, Product.ean, Product.material_code, Product.name,
+            GoodsReceiptItem.quantity, GoodsReceiptItem.putaway_quantity, GoodsReceiptItem.batch,
+        )
+        .join(GoodsReceipt, GoodsReceipt.id == GoodsReceiptItem.goods_receipt_id)
+        .join(Product, Product.id == GoodsReceiptItem.product_id)
+        .where(GoodsReceiptItem.status == inventory_models.GRNItemStatus.PENDING),
+        GoodsReceipt.warehouse_id, warehouse_id,
+    ))
+    report = [
+        {
+            "Reference No.": po_number, "EAN No.": ean, "Material": material, "Description": name,
+            "Qty": quantity, "Open Qty": quantity - putaway_quantity, "Batch": batch,
+        }
+        for po_number, ean, material, name, quantity, putaway_quantity, batch in rows
+    ]
+    return FastJSONResponse(report)
 
 @router.get("/putaway-report/")
-def get_putaway_report(db: Session = Depends(get_db), current_user: User = Depends(require_role(["admin", "manager", "operator"]))):
-    putaway_logs = db.query(inventory_models.PutawayLog).options(
-        joinedload(inventory_models.PutawayLog.goods_receipt_item).joinedload(inventory_models.GoodsReceiptItem.goods_receipt),
-        joinedload(inventory_models.PutawayLog.inventory).joinedload(inventory_models.Inventory.product),
-        joinedload(inventory_models.PutawayLog.inventory).joinedload(inventory_models.Inventory.location),
-    ).all()
-    report = []
-    for log in putaway_logs:
-        inv = log.inventory
-        grn_item = log.goods_receipt_item
-        grn = grn_item.goods_receipt
-        prod = inv.product
-        report.append({
-            "Reference No.": grn.po_number, "EAN No.": prod.ean, "Material": prod.material_code,
-            "Description": prod.name, "MFG Date": inv.mfg_date, "EXP Date": inv.exp_date,
-            "Shelf Life (%)": calculate_shelf_life_percentage(inv.mfg_date, inv.exp_date),
-            "Qty": log.quantity, "MRP": prod.mrp, "Batch": inv.batch, "Location": inv.location.code,
-        })
-    return report
+def get_putaway_report(include_archived: bool = False, db: Session = Depends(get_db), current_user: User = Depends(require_role(["admin", "manager", "operator"])), warehouse_id: int | None = Depends(get_warehouse_id)):
+    log = archival.history(PutawayLog, include_archived)
+    items = archival.history(GoodsReceiptItem, include_archived)
+    receipts = archival.history(GoodsReceipt, include_archived)
+    rows = db.execute(scoped(
+        select(
+            receipts.c.po_number, Product.ean, Product.material_code, Product.name,
+            log.c.mfg_date, log.c.exp_date, log.c.quantity, Product.mrp,
+            log.c.batch, Location.code,
+        )
+        .select_from(log)
+        .join(items, items.c.id == log.c.goods_receipt_item_id)
+        .join(receipts, receipts.c.id == items.c.goods_receipt_id)
+        .join(Product, Product.id == items.c.product_id)
+        # The log keeps the stock identity itself: its inventory row may be long gone.
+        .outerjoin(Location, Location.id == log.c.location_id),
+        receipts.c.warehouse_id, warehouse_id,
+    ))
+    report = [
+        {
+            "Reference No.": po_number, "EAN No.": ean, "Material": material,
+            "Description": name, "MFG Date": mfg_date, "EXP Date": exp_date,
+            "Shelf Life (%)": calculate_shelf_life_percentage(mfg_date, exp_date),
+            "Qty": quantity, "MRP": mrp, "Batch": batch, "Location": location_code,
+        }
+        for po_number, ean, material, name, mfg_date, exp_date, quantity, mrp, batch, location_code in rows
+    ]
+    return FastJSONResponse(report)
 
 @router.get("/picklist-summary/")
-def get_picklist_summary_report(db: Session = Depends(get_db), current_user: User = Depends(require_role(["admin", "manager", "operator"]))):
-    pick_items = db.query(inventory_models.PickListItem).options(
-        joinedload(inventory_models.PickListItem.picklist),
-        joinedload(inventory_models.PickListItem.product),
-        joinedload(inventory_models.PickListItem.location)
-    ).all()
-    report = []
-    for item in pick_items:
-        report.append({
-            "OBD No.": item.picklist.obd_number, "Customer Name": item.picklist.customer_name,
-            "EAN No.": item.product.ean, "Material": item.product.material_code, "Description": item.product.name,
-            "MRP": item.product.mrp, "Asked Qty": item.required_quantity, "Allocated Qty": item.allocated_quantity,
-            "Batch": item.batch, "Location": item.location.code if item.location else item.notes or "N/A",
-        })
-    return report
+def get_picklist_summary_report(include_archived: bool = False, db: Session = Depends(get_db), current_user: User = Depends(require_role(["admin", "manager", "operator"])), warehouse_id: int | None = Depends(get_warehouse_id)):
+    items = archival.history(PickListItem, include_archived)
+    picklists = archival.history(PickList, include_archived)
+    rows = db.execute(scoped(
+        select(
+            picklists.c.obd_number, picklists.c.customer_name, Product.ean, Product.material_code, Product.name,
+            Product.mrp, items.c.required_quantity, items.c.allocated_quantity,
+            items.c.batch, Location.code, items.c.notes,
+        )
+        .select_from(items)
+        .join(picklists, picklists.c.id == items.c.picklist_id)
+        .join(Product, Product.id == items.c.product_id)
+        .outerjoin(Location, Location.id == items.c.location_id),
+        picklists.c.warehouse_id, warehouse_id,
+    ))
+    report = [
+        {
+            "OBD No.": obd_number, "Customer Name": customer_name,
+            "EAN No.": ean, "Material": material, "Description": name,
+            "MRP": mrp, "Asked Qty": required, "Allocated Qty": allocated,
+            "Batch": batch, "Location": location_code or notes or "N/A",
+        }
+        for obd_number, customer_name, ean, material, name, mrp, required, allocated, batch, location_code, notes in rows
+    ]
+    return FastJSONResponse(report)
 
 @router.get("/picking-report/")
-def get_picking_report(db: Session = Depends(get_db), current_user: User = Depends(require_role(["admin", "manager", "operator"]))):
-    picked_items = db.query(inventory_models.PickListItem).filter(
-        inventory_models.PickListItem.status == inventory_models.PickListItemStatus.PICKED
-    ).options(
-        joinedload(inventory_models.PickListItem.picklist),
-        joinedload(inventory_models.PickListItem.product),
-        joinedload(inventory_models.PickListItem.location)
-    ).all()
-    report = []
-    for item in picked_items:
-        report.append({
-            "OBD No.": item.picklist.obd_number, "EAN No.": item.product.ean,
-            "Material": item.product.material_code, "Description": item.product.name,
-            "Qty": item.picked_quantity, "MRP": item.product.mrp, "Batch": item.batch,
-            "Location": item.location.code if item.location else "N/A",
-        })
-    return report
\ No newline at end of file
+def get_picking_report(include_archived: bool = False, db: Session = Depends(get_db), current_user: User = Depends(require_role(["admin", "manager", "operator"])), warehouse_id: int | None = Depends(get_warehouse_id)):
+    items = archival.history(PickListItem, include_archived)
+    picklists = archival.history(PickList, include_archived)
+    rows = db.execute(scoped(
+        select(
+            picklists.c.obd_number, Product.ean, Product.material_code, Product.name,
+            items.c.picked_quantity, Product.mrp, items.c.batch, Location.code,
+        )
+        .select_from(items)
+        .join(picklists, picklists.c.id == items.c.picklist_id)
+        .join(Product, Product.id == items.c.product_id)
+        .outerjoin(Location, Location.id == items.c.location_id)
+        .where(items.c.status == inventory_models.PickListItemStatus.PICKED),
+        picklists.c.warehouse_id, warehouse_id,
+    ))
+    report = [
+        {
+            "OBD No.": obd_number, "EAN No.": ean, "Material": material, "Description": name,
+            "Qty": picked, "MRP": mrp, "Batch": batch, "Location": location_code or "N/A",
+        }
+        for obd_number, ean, material, name, picked, mrp, batch, location_code in rows
+    ]
+    return FastJSONResponse(report)
+
+@router.get("/stock-as-of/")
+def get_stock_as_of_report(
+    at: datetime,
+    product_id: int | None = None,
+    location_id: int | None = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role(["admin", "manager", "operator"])),
+    warehouse_id: int | None = Depends(get_warehouse_id)
+):
+    """
+    On-hand stock at a point in time, rebuilt from the nearest stock snapshot
+    plus the movement ledger recorded after it.
+    """
+    position = stock_ledger.stock_as_of(db, at, product_id=product_id, location_id=location_id).subquery()
+    rows = db.execute(scoped(
+        select(
+            inventory_models.Product.ean, inventory_models.Product.material_code, inventory_models.Product.name,
+            inventory_models.Location.code, position.c.batch, position.c.mfg_date, position.c.exp_date,
+            position.c.quantity,
+        )
+        .select_from(position)
+        .outerjoin(inventory_models.Product, inventory_models.Product.id == position.c.product_id)
+        .outerjoin(inventory_models.Location, inventory_models.Location.id == position.c.location_id)
+        .order_by(inventory_models.Location.code, inventory_models.Product.ean),
+        inventory_models.Location.warehouse_id, warehouse_id,
+    ))
+    return FastJSONResponse([
+        {
+            "EAN No.": ean, "Material": material, "Description": name, "Location": location_code,
+            "Batch": batch, "MFG Date": mfg_date, "EXP Date": exp_date, "Qty": quantity,
+        }
+        for ean, material, name, location_code, batch, mfg_date, exp_date, quantity in rows
+    ])
+
+@router.post("/stock-snapshots/")
+def create_stock_snapshot(db: Session = Depends(get_db), current_user: User = Depends(require_role(["admin"]))):
+    """Compact the movement ledger into a new stock snapshot (normally run on a schedule)."""
+    snapshot = stock_ledger.take_snapshot(db)
+    db.commit()
+    if snapshot is None:
+        return {"message": "No new movements to compact."}
+    return {
+        "id": snapshot.id, "as_of": snapshot.as_of,
+        "last_movement_id": snapshot.last_movement_id, "line_count": snapshot.line_count,
+    }
+
+@router.get("/slotting/")
+def get_slotting_report(
+    days: int = Query(90, ge=1, le=730),
+    product_limit: int = Query(500, ge=1, le=10000),
+    max_moves: int = Query(50, ge=0, le=1000),
+    include_archived: bool = False,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role(["admin", "manager"])),
+    warehouse_id: int | None = Depends(get_warehouse_id)
+):
+    """
+    Velocity-based slotting over the last ``days`` of picks: ABC class per
+    product, suggested moves of fast movers towards packing, and over- or
+    under-used picking bins. Covers one site (the default one without X-Warehouse-Id).
+    """
+    until = datetime.now(timezone.utc)
+    return FastJSONResponse(slotting.analyse(
+        db, until - timedelta(days=days), until, product_limit=product_limit, max_moves=max_moves,
+        include_archived=include_archived, warehouse_id=warehouses.resolve(warehouse_id),
+    ))
@@ -0,0 +1,170 @@
+"""
+Velocity-based slotting analysis from pick history.
+
+Picked pick list lines in the window are streamed from the database in chunks
+of CHUNK_ROWS, and each chunk is aggregated with pandas. Memory therefore
+depends on the number of distinct (product, bin) pairs, not on the size of the
+history, so a year of picks is fine. From those totals:
+
+* ABC classes: products are ranked by pick count (lines picked). A covers the
+  first ``a_share`` of all picks, B the next part up to ``b_share``, C the rest.
+* Move recommendations: there is no bin geometry, so a bin's distance from
+  packing is approximated by its code order, lowest first. This matches aisles
+  numbered from the dock. The front zone is the N best Picking Location bins,
+  where N is the number of A products. An A product picked mostly from outside
+  the front zone is paired with the best front-zone bin held by a C product or
+  by nothing.
+* Bin usage: picking bins with more than mean + 2 standard deviations of picks
+  are over-used (congestion). Bins with under 10% of the mean are under-used.
+
+Bins are only comparable within one site, so the analysis covers one warehouse.
+"""
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.inventory import inventory_models, archival
+from app.inventory.location_cache import location_cache
+
+CHUNK_ROWS = 100_000
+PICKING = inventory_models.LocationTypeEnum.PICKING_LOCATION.value
+Location = inventory_models.Location
+PickListItem = inventory_models.PickListItem
+Product = inventory_models.Product
+
+
+def _aggregate_picks(db: Session, since: datetime, until: datetime, include_archived: bool = False,
+                     warehouse_id: int | None = None):
+    """Totals per (product_id, location_id): picks (lines) and quantity."""
+    import pandas as pd
+
+    items = archival.history(PickListItem, include_archived)
+    stmt = select(items.c.product_id, items.c.location_id, items.c.picked_quantity).where(
+        items.c.status == inventory_models.PickListItemStatus.PICKED,
+        items.c.picked_at >= since,
+        items.c.picked_at < until,
+        items.c.location_id.isnot(None),
+    )
+    if warehouse_id is not None:
+        stmt = stmt.where(items.c.location_id.in_(select(Location.id).where(Location.warehouse_id == warehouse_id)))
+    result = db.connection().execution_options(stream_results=True, yield_per=CHUNK_ROWS).execute(stmt)
+    totals = None
+    for partition in result.partitions():
+        chunk = pd.DataFrame(partition, columns=["product_id", "location_id", "quantity"])
+        chunk["quantity"] = chunk["quantity"].fillna(0.0)
+        grouped = chunk.groupby(["product_id", "location_id"]).agg(
+            picks=("quantity", "size"), quantity=("quantity", "sum")
+        )
+        totals = grouped if totals is None else totals.add(grouped, fill_value=0)
+    if totals is None:
+        return pd.DataFrame(
+            {"picks": [], "quantity": []},
+            index=pd.MultiIndex.from_arrays([[], []], names=["product_id", "location_id"]),
+        )
+    return totals
+
+
+def analyse(db: Session, since: datetime, until: datetime, a_share: float = 0.8, b_share: float = 0.95,
+            product_limit: int = 500, max_moves: int = 50, include_archived: bool = False,
+            warehouse_id: int | None = None) -> dict:
+    """Slotting report for picks in [since, until) at ``warehouse_id``; lists the top ``product_limit`` products."""
+    import numpy as np
+
+    totals = _aggregate_picks(db, since, until, include_archived, warehouse_id)
+    locations = location_cache.snapshot(db)
+    picking_bins = sorted(
+        (
+            record for record in locations.records
+            if record.location_type == PICKING and warehouse_id in (None, record.warehouse_id)
+        ),
+        key=lambda r: r.code,
+    )
+    rank = {record.id: index for index, record in enumerate(picking_bins)}
+
+    by_product = totals.groupby(level="product_id")[["picks", "quantity"]].sum().sort_values(
+        ["picks", "quantity"], ascending=False
+    )
+    total_picks = float(by_product["picks"].sum())
+    share = by_product["picks"] / total_picks if total_picks else by_product["picks"] * 0.0
+    share_before = share.cumsum() - share
+    by_product["share"] = share
+    by_product["cumulative_share"] = share.cumsum()
+    by_product["abc"] = np.where(share_before < a_share, "A", np.where(share_before < b_share, "B", "C"))
+
+    # Primary bin: the bin each product was picked from most often.
+    flat = totals.reset_index().sort_values(["product_id", "picks"], ascending=[True, False])
+    primary = flat.drop_duplicates("product_id").set_index("product_id")["location_id"]
+    by_product["location_id"] = primary.reindex(by_product.index)
+
+    # --- Moves: A products outside the front zone swap with slow or empty front bins ---
+    a_products = by_product[by_product["abc"] == "A"]
+    front_size = min(len(a_products), len(picking_bins))
+    holder = {int(location_id): int(product_id) for product_id, location_id in primary.items()}
+    abc = by_product["abc"].to_dict()
+    front_candidates = [
+        record for record in picking_bins[:front_size]
+        if abc.get(holder.get(record.id), "C") == "C"
+    ]
+    moves = []
+    for product_id, row in a_products.iterrows():
+        if len(moves) >= max_moves or not front_candidates:
+            break
+        current = int(row["location_id"])
+        if rank.get(current, len(picking_bins)) < front_size:
+            continue
+        target = front_candidates.pop(0)
+        moves.append({
+            "product_id": int(product_id), "from_location_id": current, "to_location_id": target.id,
+            "swap_with_product_id": holder.get(target.id),
+        })
+
+    # --- Bin usage across picking bins, including bins with no picks ---
+    bin_picks = totals.groupby(level="location_id")["picks"].sum().reindex([r.id for r in picking_bins], fill_value=0)
+    mean = float(bin_picks.mean()) if len(bin_picks) else 0.0
+    std = float(bin_picks.std(ddof=0)) if len(bin_picks) else 0.0
+    over_used = bin_picks[bin_picks > mean + 2 * std].sort_values(ascending=False)
+    under_used = bin_picks[bin_picks < 0.1 * mean].sort_values()
+
+    top = by_product.head(product_limit)
+    product_ids = {int(i) for i in top.index} | {m["product_id"] for m in moves}
+    product_ids |= {m["swap_with_product_id"] for m in moves if m["swap_with_product_id"] is not None}
+    names = {
+        row.id: (row.ean, row.name)
+        for row in db.execute(select(Product.id, Product.ean, Product.name).where(Product.id.in_(product_ids)))
+    }
+
+    def product(product_id):
+        ean, name = names.get(product_id, (None, None))
+        return {"product_id": product_id, "ean": ean, "name": name}
+
+    def location(location_id):
+        record = locations.by_id.get(location_id)
+        return record.code if record else None
+
+    for move in moves:
+        move.update(product(move["product_id"]))
+        move["from_location"] = location(move["from_location_id"])
+        move["to_location"] = location(move["to_location_id"])
+        swap = move["swap_with_product_id"]
+        move["swap_with_ean"] = product(swap)["ean"] if swap is not None else None
+
+    return {
+        "since": since, "until": until,
+        "total_picks": int(total_picks),
+        "products_picked": int(len(by_product)),
+        "class_counts": {name: int(count) for name, count in by_product["abc"].value_counts().items()},
+        "products": [
+            {
+                **product(int(product_id)), "picks": int(row["picks"]), "quantity": float(row["quantity"]),
+                "share": round(float(row["share"]), 6), "cumulative_share": round(float(row["cumulative_share"]), 6),
+                "abc": row["abc"], "location_id": int(row["location_id"]),
+                "location": location(int(row["location_id"])),
+            }
+            for product_id, row in top.iterrows()
+        ],
+        "moves": moves,
+        "mean_bin_picks": round(mean, 2),
+        "over_used_bins": [{"location_id": int(i), "location": location(int(i)), "picks": int(p)} for i, p in over_used.items()],
+        "under_used_bins": [{"location_id": int(i), "location": location(int(i)), "picks": int(p)} for i, p in under_used.items()],
+    }
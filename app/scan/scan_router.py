@@ -0,0 +1,87 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import scan_schemas
+from app.inventory import inventory_models, warehouses
+from app.inventory.location_cache import location_cache
+from app.inventory.product_cache import product_index
+from app.auth.dependencies import get_db, get_current_user, get_warehouse_id
+from app.auth.auth_models import User
+
+router = APIRouter(
+    tags=["Scan"]
+)
+
+# Scans tolerate a location list that is a few seconds old in exchange for
+# skipping the version check on most requests.
+LOCATION_MAX_AGE_SECONDS = 5.0
+
+Inventory = inventory_models.Inventory
+Product = inventory_models.Product
+
+STOCK_COLUMNS = (
+    Inventory.id, Inventory.location_id, Inventory.product_id, Inventory.batch,
+    Inventory.mfg_date, Inventory.exp_date, Inventory.quantity, Inventory.reserved_quantity,
+    Inventory.available_quantity,
+)
+
+def _stock_line(row, **extra):
+    return scan_schemas.ScanStockLine(
+        inventory_id=row.id, location_id=row.location_id, product_id=row.product_id, batch=row.batch,
+        mfg_date=row.mfg_date, exp_date=row.exp_date, quantity=row.quantity,
+        reserved_quantity=row.reserved_quantity, available_quantity=row.available_quantity, **extra
+    )
+
+@router.get("/scan/{code}", response_model=scan_schemas.ScanResult)
+def resolve_scan(
+    code: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    warehouse_id: int | None = Depends(get_warehouse_id)
+):
+    """
+    Resolve a scanned barcode in one call. The code is tried as a location code
+    of the request's warehouse (the default site when none is chosen), then an
+    EAN, then a material code (from the in-memory caches), and the stock for
+    whatever it names is returned with a single indexed query. Product stock is
+    limited to the request's warehouse, if any.
+    """
+    code = code.strip()
+    locations = location_cache.snapshot(db, max_age=LOCATION_MAX_AGE_SECONDS)
+
+    location = locations.find(code, warehouses.resolve(warehouse_id))
+    if location is not None:
+        rows = db.execute(
+            select(*STOCK_COLUMNS, Product.ean, Product.material_code, Product.name)
+            .join(Product, Product.id == Inventory.product_id)
+            .where(Inventory.location_id == location.id)
+            .order_by(Product.ean, Inventory.exp_date)
+        ).all()
+        return scan_schemas.ScanResult(
+            code=code, kind="location", location=location._asdict(),
+            stock=[
+                _stock_line(row, location_code=location.code, ean=row.ean,
+                            material_code=row.material_code, name=row.name)
+                for row in rows
+            ],
+        )
+
+    product = product_index.get_by_ean(db, code) or product_index.get_by_material_code(db, code)
+    if product is None:
+        raise HTTPException(status_code=404, detail=f"No location or product matches {code}")
+
+    query = select(*STOCK_COLUMNS).where(Inventory.product_id == product.id, Inventory.quantity > 0)
+    if warehouse_id is not None:
+        query = query.where(Inventory.warehouse_id == warehouse_id)
+    rows = db.execute(query.order_by(Inventory.exp_date, Inventory.location_id)).all()
+    return scan_schemas.ScanResult(
+        code=code, kind="product", product=product._asdict(),
+        stock=[
+            _stock_line(
+                row, location_code=locations.by_id[row.location_id].code if row.location_id in locations.by_id else None,
+                ean=product.ean, material_code=product.material_code, name=product.name,
+            )
+            for row in rows
+        ],
+    )
@@ -0,0 +1,27 @@
+from pydantic import BaseModel
+from datetime import date
+from typing import List, Literal
+from app.inventory.inventory_schemas import Product
+from app.inventory.location_schemas import Location
+
+class ScanStockLine(BaseModel):
+    inventory_id: int
+    location_id: int
+    location_code: str | None = None
+    product_id: int
+    ean: str | None = None
+    material_code: str | None = None
+    name: str | None = None
+    batch: str | None = None
+    mfg_date: date | None = None
+    exp_date: date | None = None
+    quantity: float
+    reserved_quantity: float | None = None
+    available_quantity: float | None = None
+
+class ScanResult(BaseModel):
+    code: str
+    kind: Literal["location", "product"]
+    location: Location | None = None
+    product: Product | None = None
+    stock: List[ScanStockLine] = []
@@ -0,0 +1,123 @@
+"""
+Production server entrypoint.
+
+    python -m app.server
+
+Runs gunicorn with uvicorn workers sized to the CPUs available to the container.
+The app is imported once in the master (preload) and forked into workers. Workers
+are recycled after a jittered number of requests, or as soon as their resident
+memory crosses WORKER_MAX_MEMORY_MB, which contains slow leaks from large pandas
+uploads. SIGTERM on the master drains in-flight requests before exiting.
+"""
+import logging
+import os
+import signal
+
+from gunicorn.app.base import BaseApplication
+
+from app.core.config import settings
+
+logger = logging.getLogger("app.server")
+
+
+def available_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def worker_count() -> int:
+    return settings.WEB_CONCURRENCY or available_cpus() * 2 + 1
+
+
+def resident_memory_mb() -> float:
+    """Current RSS of this process. Falls back to peak RSS where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as statm:
+            resident_pages = int(statm.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class MemoryCeilingMiddleware:
+    """
+    After each HTTP request, ask this worker to shut down gracefully if it has
+    grown past the memory ceiling. The gunicorn arbiter replaces it with a fresh fork.
+    """
+
+    def __init__(self, app, max_memory_mb: int):
+        self.app = app
+        self.max_memory_mb = max_memory_mb
+        self.recycling = False
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if scope["type"] == "http" and not self.recycling:
+                rss = resident_memory_mb()
+                if rss > self.max_memory_mb:
+                    self.recycling = True
+                    logger.warning(
+                        f"Worker {os.getpid()} at {rss:.0f} MB exceeds {self.max_memory_mb} MB; recycling."
+                    )
+                    os.kill(os.getpid(), signal.SIGTERM)
+
+
+def post_fork(server, worker):
+    # Connections must never be shared across processes; drop anything the
+    # master may have opened while preloading.
+    from app.core.database import engine
+    engine.dispose(close=False)
+
+
+def worker_exit(server, worker):
+    from app.core.database import engine
+    engine.dispose()
+
+
+class WMSApplication(BaseApplication):
+    def __init__(self, options: dict):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from app.main import app
+        if settings.WORKER_MAX_MEMORY_MB:
+            return MemoryCeilingMiddleware(app, settings.WORKER_MAX_MEMORY_MB)
+        return app
+
+
+def gunicorn_options() -> dict:
+    return {
+        "bind": f"{settings.SERVER_HOST}:{settings.SERVER_PORT}",
+        "workers": worker_count(),
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        "preload_app": True,
+        "max_requests": settings.WORKER_MAX_REQUESTS,
+        "max_requests_jitter": settings.WORKER_MAX_REQUESTS_JITTER,
+        "timeout": settings.WORKER_TIMEOUT,
+        "graceful_timeout": settings.WORKER_GRACEFUL_TIMEOUT,
+        "keepalive": 5,
+        "accesslog": "-",
+        "post_fork": post_fork,
+        "worker_exit": worker_exit,
+    }
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    options = gunicorn_options()
+    logger.info(f"Starting MyWMS with {options['workers']} workers on {options['bind']}")
+    WMSApplication(options).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Delta sync for offline-capable handhelds.
+
+Every synced table has a ``change_seq`` column. A trigger sets it to the id of
+the transaction that last inserted or updated the row. Deleted rows, including
+archived ones, leave a tombstone in ``sync_deletions`` with the same stamp.
+
+The cursor handed to a device is ``pg_snapshot_xmin`` of the reading
+transaction. That is the oldest transaction still running, so every transaction
+below it has finished and its rows were visible to the read. The next sync asks
+for ``change_seq >= cursor``. Rows from transactions that were still running are
+therefore sent again later instead of being missed. Devices upsert by id, so a
+repeated row does no harm.
+
+A device can sync one warehouse: locations and documents are then limited to
+that site, and document lines to those of its documents. Products and
+tombstones are shared by every site.
+
+Tombstones older than SYNC_TOMBSTONE_DAYS are purged. The purge leaves a marker
+row holding the newest stamp it removed. A device whose cursor is at or below
+that horizon may have missed deletions, so it gets ``full_resync`` and every row.
+"""
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, delete, func, text, insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.inventory import inventory_models
+
+SyncDeletion = inventory_models.SyncDeletion
+
+SYNCED = {
+    "products": inventory_models.Product,
+    "locations": inventory_models.Location,
+    "pick_lists": inventory_models.PickList,
+    "pick_list_items": inventory_models.PickListItem,
+    "goods_receipts": inventory_models.GoodsReceipt,
+    "goods_receipt_items": inventory_models.GoodsReceiptItem,
+}
+
+# Line tables are scoped to a warehouse through their document header.
+SCOPED_BY_HEADER = {
+    "pick_list_items": (inventory_models.PickList, "picklist_id"),
+    "goods_receipt_items": (inventory_models.GoodsReceipt, "goods_receipt_id"),
+}
+
+# Tombstone row that records how far deletions have been purged.
+HORIZON_TABLE = "*"
+
+
+def current_cursor(db: Session) -> int:
+    return db.execute(select(text("pg_snapshot_xmin(pg_current_snapshot())::text::bigint"))).scalar()
+
+
+def purge_horizon(db: Session) -> int:
+    horizon = db.execute(
+        select(func.max(SyncDeletion.change_seq)).where(SyncDeletion.table_name == HORIZON_TABLE)
+    ).scalar()
+    return horizon or 0
+
+
+def _scoped(stmt, name: str, table, warehouse_id: int | None):
+    if warehouse_id is None:
+        return stmt
+    if "warehouse_id" in table.c:
+        return stmt.where(table.c.warehouse_id == warehouse_id)
+    if name in SCOPED_BY_HEADER:
+        header, key = SCOPED_BY_HEADER[name]
+        return stmt.where(table.c[key].in_(select(header.id).where(header.warehouse_id == warehouse_id)))
+    return stmt
+
+
+def changes(db: Session, since: int, tables: list[str], warehouse_id: int | None = None) -> dict:
+    """
+    Rows and deleted ids per table changed at or after ``since``, plus the next
+    cursor; site-specific rows only from ``warehouse_id`` when given.
+    """
+    cursor = current_cursor(db)
+    full_resync = since > 0 and since <= purge_horizon(db)
+    if full_resync:
+        since = 0
+
+    payload = {"cursor": cursor, "full_resync": full_resync}
+    for name in tables:
+        table = SYNCED[name].__table__
+        columns = [column for column in table.columns if column.name != "change_seq"]
+        stmt = _scoped(select(*columns).where(table.c.change_seq >= since), name, table, warehouse_id)
+        rows = db.execute(stmt.order_by(table.c.id))
+        payload[name] = [row._asdict() for row in rows]
+
+    deleted = {name: [] for name in tables}
+    if since > 0:
+        rows = db.execute(
+            select(SyncDeletion.table_name, SyncDeletion.row_id)
+            .where(SyncDeletion.change_seq >= since, SyncDeletion.table_name.in_(tables))
+        )
+        for table_name, row_id in rows:
+            deleted[table_name].append(row_id)
+    payload["deleted"] = deleted
+    return payload
+
+
+def purge_deletions(db: Session, older_than_days: int | None = None) -> int:
+    """Drop old tombstones and move the horizon marker up to the newest one dropped."""
+    days = settings.SYNC_TOMBSTONE_DAYS if older_than_days is None else older_than_days
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    old = (SyncDeletion.deleted_at < cutoff, SyncDeletion.table_name != HORIZON_TABLE)
+    newest = db.execute(select(func.max(SyncDeletion.change_seq)).where(*old)).scalar()
+    if newest is None:
+        return 0
+    purged = db.execute(delete(SyncDeletion).where(*old)).rowcount
+    horizon = max(newest, purge_horizon(db))
+    db.execute(delete(SyncDeletion).where(SyncDeletion.table_name == HORIZON_TABLE))
+    db.execute(insert(SyncDeletion).values(table_name=HORIZON_TABLE, row_id=0, change_seq=horizon))
+    return purged
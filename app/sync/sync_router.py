@@ -0,0 +1,64 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from datetime import datetime, timezone
+
+from . import sync_schemas, delta_sync
+from app.outbound import picking
+from app.core.fast_json import FastJSONResponse
+from app.core.versioning import mark_site_changed
+from app.auth.dependencies import get_db, get_current_user, require_role, get_warehouse_id
+from app.auth.auth_models import User
+
+router = APIRouter(
+    tags=["Sync"]
+)
+
+@router.get("/sync")
+def sync_changes(
+    since: int = Query(0, ge=0, description="Cursor from the previous sync; 0 for everything"),
+    tables: str | None = Query(None, description="Comma-separated tables; all synced tables when omitted"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    warehouse_id: int | None = Depends(get_warehouse_id)
+):
+    """
+    Rows of products, locations, pick lists, goods receipts and their items
+    changed since ``since``, ids deleted since then, and the next ``cursor``.
+    With ``full_resync`` true the device must replace its local copy. Locations
+    and documents are limited to the request's warehouse, if any.
+    """
+    names = list(delta_sync.SYNCED) if tables is None else [name.strip() for name in tables.split(",") if name.strip()]
+    unknown = [name for name in names if name not in delta_sync.SYNCED]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown tables: {', '.join(unknown)}")
+    return FastJSONResponse(delta_sync.changes(db, since, names, warehouse_id))
+
+@router.post("/sync/picks", response_model=sync_schemas.PickReplayResponse)
+def replay_offline_picks(
+    replay: sync_schemas.PickReplay,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role(["admin", "manager", "supervisor", "operator"])),
+    warehouse_id: int | None = Depends(get_warehouse_id)
+):
+    """
+    Apply picks scanned while offline, in order, in one transaction. Each pick
+    runs in a savepoint: one that cannot be applied (already picked, stock gone,
+    another warehouse's pick list) is reported as failed without undoing the others.
+    """
+    now = datetime.now(timezone.utc)
+    results = []
+    sites = set()
+    for pick in replay.picks:
+        picked_at = min(pick.picked_at, now) if pick.picked_at and pick.picked_at.tzinfo else now
+        try:
+            with db.begin_nested():
+                pick_item = picking.confirm_pick(db, pick.item_id, current_user.id, picked_at, warehouse_id)
+        except HTTPException as e:
+            results.append({"item_id": pick.item_id, "status": "failed", "detail": e.detail})
+            continue
+        sites.add(pick_item.warehouse_id)
+        results.append({"item_id": pick.item_id, "status": "picked"})
+    picked = sum(1 for result in results if result["status"] == "picked")
+    mark_site_changed(db, "pick_lists", sites)
+    db.commit()
+    return {"picked": picked, "failed": len(results) - picked, "results": results}
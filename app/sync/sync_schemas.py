@@ -0,0 +1,20 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import List, Literal
+
+class OfflinePick(BaseModel):
+    item_id: int
+    picked_at: datetime | None = None  # when the device scanned it; defaults to the replay time
+
+class PickReplay(BaseModel):
+    picks: List[OfflinePick] = Field(min_length=1, max_length=1000)
+
+class PickReplayResult(BaseModel):
+    item_id: int
+    status: Literal["picked", "failed"]
+    detail: str | None = None
+
+class PickReplayResponse(BaseModel):
+    picked: int
+    failed: int
+    results: List[PickReplayResult]
@@ -0,0 +1,142 @@
+"""
+Concurrency check for atomic pick confirmation.
+
+Creates one bin holding ``items * qty`` units reserved for ``items`` pick lines,
+then confirms every line from ``threads`` workers at once, with each line
+submitted ``dupes`` times, as a handheld retrying on flaky Wi-Fi would. At the
+end every unit must be gone, every line picked exactly once, the ledger must
+balance and exactly one transaction must have completed the pick list; any lost
+update or double pick shows up as a mismatch.
+
+Needs a migrated database (DATABASE_URL). Test data is removed afterwards.
+
+Usage:
+    python benchmarks/pick_contention.py [--items 200] [--qty 3] [--threads 16] [--dupes 2]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func  # noqa: E402
+
+from app.core.database import SessionLocal  # noqa: E402
+from app.core.migrations import import_models  # noqa: E402
+from app.inventory import inventory_models as m, stock_ledger, stock_operations  # noqa: E402
+
+
+def setup(items: int, qty: float):
+    tag = uuid.uuid4().hex[:8]
+    db = SessionLocal()
+    product = m.Product(ean=f"BENCH{tag}", material_code=f"BENCH{tag}", name="Contention test",
+                        brand="Mamaearth", mrp=1.0)
+    location = m.Location(code=f"BENCH-{tag}", location_type="Picking Location")
+    db.add_all([product, location])
+    db.flush()
+    db.add(m.Inventory(product_id=product.id, location_id=location.id, quantity=items * qty,
+                       reserved_quantity=items * qty, batch=tag))
+    picklist = m.PickList(obd_number=f"BENCH-{tag}", customer_name="bench", open_items=items)
+    db.add(picklist)
+    db.flush()
+    db.add_all([
+        m.PickListItem(picklist_id=picklist.id, product_id=product.id, location_id=location.id,
+                       required_quantity=qty, allocated_quantity=qty, batch=tag)
+        for _ in range(items)
+    ])
+    db.commit()
+    ids = (product.id, location.id, picklist.id)
+    item_ids = [row[0] for row in db.query(m.PickListItem.id).filter(m.PickListItem.picklist_id == picklist.id)]
+    db.close()
+    return ids, item_ids
+
+
+def pick(item_id: int) -> tuple[bool, bool]:
+    """(picked, completed the pick list) for one scan."""
+    db = SessionLocal()
+    try:
+        claimed = stock_operations.claim_pick_item(db, item_id, user_id=None)
+        if claimed is None:
+            db.rollback()
+            return False, False
+        row = stock_operations.remove_picked_stock(
+            db, product_id=claimed.product_id, location_id=claimed.location_id,
+            batch=claimed.batch, quantity=claimed.allocated_quantity,
+        )
+        if row is None:
+            db.rollback()
+            return False, False
+        stock_ledger.record_inventory_movement(
+            db, row, -claimed.allocated_quantity, m.MovementTypeEnum.PICK,
+            reference_type="pick_list_item", reference_id=claimed.id,
+        )
+        db.commit()
+        return True, bool(claimed.picklist_completed)
+    finally:
+        db.close()
+
+
+def cleanup(product_id, location_id, picklist_id):
+    db = SessionLocal()
+    db.query(m.StockMovement).filter(m.StockMovement.product_id == product_id).delete()
+    db.query(m.PickListItem).filter(m.PickListItem.picklist_id == picklist_id).delete()
+    db.query(m.PickList).filter(m.PickList.id == picklist_id).delete()
+    db.query(m.Inventory).filter(m.Inventory.product_id == product_id).delete()
+    db.query(m.Location).filter(m.Location.id == location_id).delete()
+    db.query(m.Product).filter(m.Product.id == product_id).delete()
+    db.commit()
+    db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--qty", type=float, default=3)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--dupes", type=int, default=2)
+    args = parser.parse_args()
+
+    import_models()
+    (product_id, location_id, picklist_id), item_ids = setup(args.items, args.qty)
+    attempts = item_ids * args.dupes
+    random.shuffle(attempts)
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            results = list(pool.map(pick, attempts))
+        elapsed = time.perf_counter() - started
+
+        db = SessionLocal()
+        remaining = db.query(func.coalesce(func.sum(m.Inventory.quantity), 0)).filter(
+            m.Inventory.product_id == product_id).scalar()
+        picked = db.query(func.count()).filter(
+            m.PickListItem.picklist_id == picklist_id,
+            m.PickListItem.status == m.PickListItemStatus.PICKED).scalar()
+        ledger = db.query(func.coalesce(func.sum(m.StockMovement.quantity), 0)).filter(
+            m.StockMovement.product_id == product_id).scalar()
+        status = db.query(m.PickList.status).filter(m.PickList.id == picklist_id).scalar()
+        db.close()
+    finally:
+        cleanup(product_id, location_id, picklist_id)
+
+    print(f"{len(attempts)} attempts on {args.items} lines with {args.threads} threads in {elapsed:.2f}s "
+          f"({len(attempts) / elapsed:.0f} scans/s)")
+    successes = sum(picked_ok for picked_ok, _ in results)
+    completions = sum(completed for _, completed in results)
+    print(f"successful picks: {successes}  lines picked: {picked}  remaining stock: {remaining}  "
+          f"ledger total: {ledger}  pick list: {status}  completed by: {completions} transaction(s)")
+    ok = (
+        successes == args.items and picked == args.items and remaining == 0
+        and abs(ledger + args.items * args.qty) < 1e-9 and status == m.PickListStatus.COMPLETED
+        and completions == 1
+    )
+    print("OK: no lost updates" if ok else "FAIL: lost or duplicated updates")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+Time a full min/max replenishment run over a large catalogue.
+
+Creates ``--products`` SKUs with min/max levels at the default warehouse, each
+with storage stock and a picking bin it last moved through, and leaves three in
+four of them below min in their picking bin. Then times:
+
+* the first run, which plans and reserves a task for every product below min
+* a second run, which must create nothing because the open tasks cover the need
+
+The target for 50,000 SKUs is under a minute. Everything runs in one
+transaction that is rolled back at the end, so nothing is left behind. Needs a
+migrated database (DATABASE_URL).
+
+Usage:
+    python benchmarks/replenishment_plan.py [--products 50000] [--bins 500]
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.core.database import SessionLocal  # noqa: E402
+from app.core.migrations import import_models  # noqa: E402
+from app.inventory import inventory_models as m, replenishment  # noqa: E402
+
+
+def setup(db, products: int, bins: int, warehouse_id: int) -> int:
+    """Insert the test catalogue; returns how many products start below min."""
+    tag = uuid.uuid4().hex[:8]
+    product_ids = db.execute(insert(m.Product).returning(m.Product.id), [
+        dict(ean=f"RB{tag}{i:07d}", material_code=f"RB{tag}{i:07d}", name="Replenishment test",
+             brand="Mamaearth", mrp=1.0, min_qty=10.0, max_qty=50.0)
+        for i in range(products)
+    ]).scalars().all()
+    storage_ids = db.execute(insert(m.Location).returning(m.Location.id), [
+        dict(code=f"RB-{tag}-S{j}", location_type=replenishment.STORAGE, warehouse_id=warehouse_id)
+        for j in range(bins)
+    ]).scalars().all()
+    picking_ids = db.execute(insert(m.Location).returning(m.Location.id), [
+        dict(code=f"RB-{tag}-P{j}", location_type=replenishment.PICKING, warehouse_id=warehouse_id)
+        for j in range(bins)
+    ]).scalars().all()
+
+    inventory, movements = [], []
+    for i, product_id in enumerate(product_ids):
+        storage, picking = storage_ids[i % bins], picking_ids[i % bins]
+        inventory.append(dict(product_id=product_id, location_id=storage, warehouse_id=warehouse_id,
+                              quantity=100.0, reserved_quantity=0.0, batch=tag))
+        # One in four already holds enough in its picking bin.
+        picking_qty = 20.0 if i % 4 == 0 else 5.0
+        inventory.append(dict(product_id=product_id, location_id=picking, warehouse_id=warehouse_id,
+                              quantity=picking_qty, reserved_quantity=0.0, batch=tag))
+        movements.append(dict(product_id=product_id, location_id=picking, batch=tag, quantity=picking_qty,
+                              movement_type=m.MovementTypeEnum.PUTAWAY))
+    db.execute(insert(m.Inventory), inventory)
+    db.execute(insert(m.StockMovement), movements)
+    db.flush()
+    return sum(1 for i in range(products) if i % 4)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=50000)
+    parser.add_argument("--bins", type=int, default=500)
+    args = parser.parse_args()
+
+    import_models()
+    warehouse_id = settings.DEFAULT_WAREHOUSE_ID
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        below_min = setup(db, args.products, args.bins, warehouse_id)
+        print(f"setup: {args.products} products, {below_min} below min, in {time.perf_counter() - started:.1f}s")
+
+        started = time.perf_counter()
+        created = replenishment.replenish(db, warehouse_id=warehouse_id)
+        first = time.perf_counter() - started
+        started = time.perf_counter()
+        repeated = replenishment.replenish(db, warehouse_id=warehouse_id)
+        second = time.perf_counter() - started
+    finally:
+        db.rollback()
+        db.close()
+
+    print(f"first run:  {created} tasks in {first:.2f}s")
+    print(f"second run: {repeated} tasks in {second:.2f}s")
+    # Other products already in the database may also be below min, so only a floor is checked.
+    ok = created >= below_min and repeated == 0 and first < 60
+    print("OK" if ok else "FAIL: missing or duplicate tasks, or over a minute")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""
+Compare the default response path with the fast JSON path for large reads.
+
+For the current-stock report and pick list details, builds ``--rows`` synthetic
+rows and times, per request:
+
+* default: ORM objects -> dicts / pydantic ``from_attributes`` ->
+  ``jsonable_encoder`` -> ``json.dumps`` (what FastAPI does for a returned value)
+* fast: column tuples -> dicts -> ``fast_json.dumps`` (orjson when installed)
+
+ORM instances are built in memory, so the default timing includes object
+construction but not the database round-trip, which is the same for both paths.
+
+Usage:
+    python benchmarks/serialization.py [--rows 20000] [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+from app.core import fast_json  # noqa: E402
+from app.inventory import inventory_models as m  # noqa: E402
+from app.outbound import picklist_schemas  # noqa: E402
+from app.reports.reports_router import calculate_shelf_life_percentage  # noqa: E402
+
+MFG = date(2026, 1, 1)
+WAREHOUSE_ID = 1
+
+
+def product_tuple(i):
+    return (i, f"89012345{i:05d}", f"MAT{i:05d}", f"Product {i}", "Mamaearth", "EA", 199.0, 12, 10.0, 100.0)
+
+
+def make_product(i):
+    pid, ean, material, name, brand, uom, mrp, case_size, min_qty, max_qty = product_tuple(i)
+    return m.Product(id=pid, ean=ean, material_code=material, name=name, brand=brand, uom=uom, mrp=mrp,
+                     case_size=case_size, min_qty=min_qty, max_qty=max_qty)
+
+
+def stock_tuples(rows):
+    return [
+        (f"89012345{i:05d}", f"MAT{i:05d}", f"Product {i}", MFG, MFG + timedelta(days=365 + i % 300),
+         float(i % 50), 199.0, f"B{i % 97}", f"A-{i % 40:02d}-{i % 5:02d}", 0.0)
+        for i in range(rows)
+    ]
+
+
+def stock_default(tuples):
+    items = []
+    for ean, material, name, mfg_date, exp_date, quantity, mrp, batch, code, reserved in tuples:
+        item = m.Inventory(mfg_date=mfg_date, exp_date=exp_date, quantity=quantity, batch=batch,
+                           reserved_quantity=reserved)
+        item.product = m.Product(ean=ean, material_code=material, name=name, mrp=mrp)
+        item.location = m.Location(code=code)
+        items.append(item)
+    report = [
+        {
+            "EAN No.": item.product.ean, "Material": item.product.material_code, "Description": item.product.name,
+            "MFG Date": item.mfg_date, "EXP Date": item.exp_date,
+            "Shelf Life %": calculate_shelf_life_percentage(item.mfg_date, item.exp_date),
+            "Qty": item.quantity, "MRP": item.product.mrp, "Batch": item.batch, "Location": item.location.code,
+            "Reserved Qty": item.reserved_quantity,
+        }
+        for item in items
+    ]
+    return json.dumps(jsonable_encoder(report)).encode()
+
+
+def stock_fast(tuples):
+    return fast_json.dumps([
+        {
+            "EAN No.": ean, "Material": material, "Description": name,
+            "MFG Date": mfg_date, "EXP Date": exp_date,
+            "Shelf Life %": calculate_shelf_life_percentage(mfg_date, exp_date),
+            "Qty": quantity, "MRP": mrp, "Batch": batch, "Location": code, "Reserved Qty": reserved,
+        }
+        for ean, material, name, mfg_date, exp_date, quantity, mrp, batch, code, reserved in tuples
+    ])
+
+
+def picklist_tuples(rows):
+    return [
+        (i, f"B{i % 97}", 5.0, 5.0, m.PickListItemStatus.PENDING, None, *product_tuple(i),
+         i, f"A-{i % 40:02d}-{i % 5:02d}", "Picking Location", WAREHOUSE_ID, MFG, MFG + timedelta(days=400))
+        for i in range(rows)
+    ]
+
+
+HEADER = (1, "OBD-1", "Customer", WAREHOUSE_ID, m.PickListStatus.PENDING, datetime(2026, 10, 1, tzinfo=timezone.utc))
+
+
+def picklist_default(tuples):
+    picklist = m.PickList(id=HEADER[0], obd_number=HEADER[1], customer_name=HEADER[2], warehouse_id=HEADER[3],
+                          status=HEADER[4], created_at=HEADER[5])
+    for row in tuples:
+        item = m.PickListItem(id=row[0], batch=row[1], required_quantity=row[2], allocated_quantity=row[3],
+                              status=row[4], notes=row[5])
+        item.product = make_product(row[6])
+        item.location = m.Location(id=row[16], code=row[17], location_type=row[18], warehouse_id=row[19])
+        item.mfg_date, item.exp_date = row[20], row[21]
+        picklist.items.append(item)
+    model = picklist_schemas.PickList.model_validate(picklist)
+    return json.dumps(jsonable_encoder(model)).encode()
+
+
+def picklist_fast(tuples):
+    items = [
+        {
+            "id": item_id,
+            "product": {
+                "id": product_id, "ean": ean, "material_code": material_code, "name": name,
+                "brand": brand, "uom": uom, "mrp": mrp, "case_size": case_size,
+                "min_qty": min_qty, "max_qty": max_qty,
+            },
+            "location": {"code": location_code, "location_type": location_type, "id": location_id,
+                         "warehouse_id": location_warehouse_id},
+            "batch": batch, "required_quantity": required, "allocated_quantity": allocated,
+            "status": status, "notes": notes, "mfg_date": mfg_date, "exp_date": exp_date,
+        }
+        for (item_id, batch, required, allocated, status, notes,
+             product_id, ean, material_code, name, brand, uom, mrp, case_size, min_qty, max_qty,
+             location_id, location_code, location_type, location_warehouse_id, mfg_date, exp_date) in tuples
+    ]
+    header = dict(zip(("id", "obd_number", "customer_name", "warehouse_id", "status", "created_at"), HEADER))
+    return fast_json.dumps({**header, "items": items})
+
+
+def timed(fn, data, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        body = fn(data)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples), len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"encoder: {'orjson' if fast_json.orjson is not None else 'json (orjson not installed)'}")
+    cases = [
+        ("current-stock", stock_tuples(args.rows), stock_default, stock_fast),
+        ("picklist details", picklist_tuples(args.rows), picklist_default, picklist_fast),
+    ]
+    for name, data, default, fast in cases:
+        default_time, default_size = timed(default, data, args.runs)
+        fast_time, fast_size = timed(fast, data, args.runs)
+        print(f"{name:<18} rows={args.rows}  default {default_time * 1000:8.1f} ms ({default_size} B)  "
+              f"fast {fast_time * 1000:8.1f} ms ({fast_size} B)  speed-up x{default_time / fast_time:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Measure cold-start import cost of the application.
+
+Runs ``python -X importtime -c "import app.main"`` in a fresh interpreter and
+reports the total wall time plus the most expensive modules (cumulative time,
+which includes everything a module imports).
+
+Usage:
+    python benchmarks/startup_imports.py [--module app.main] [--top 25] [--runs 3]
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LINE_RE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def run_once(module: str):
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    elapsed = time.perf_counter() - started
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr)
+        raise SystemExit(f"Importing {module} failed")
+
+    cumulative = {}
+    for line in proc.stderr.splitlines():
+        match = LINE_RE.match(line)
+        if match:
+            cumulative[match.group(4)] = int(match.group(2))
+    return elapsed, cumulative
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    wall_times, runs = [], []
+    for _ in range(args.runs):
+        elapsed, cumulative = run_once(args.module)
+        wall_times.append(elapsed)
+        runs.append(cumulative)
+
+    modules = set().union(*runs)
+    median_us = {
+        name: statistics.median(run.get(name, 0) for run in runs) for name in modules
+    }
+
+    print(f"import {args.module}: median wall time {statistics.median(wall_times) * 1000:.1f} ms over {args.runs} runs")
+    print(f"{'cumulative ms':>14}  module")
+    for name, micros in sorted(median_us.items(), key=lambda kv: kv[1], reverse=True)[:args.top]:
+        print(f"{micros / 1000:>14.1f}  {name}")
+
+    heavy = [name for name in ("pandas", "openpyxl") if name in modules]
+    if heavy:
+        print(f"\nWARNING: {', '.join(heavy)} imported at startup; keep them behind the upload paths.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Per-call overhead of building hot statements versus reusing the cached ones
+in app/core/repository.py.
+
+Before it can reuse compiled SQL, SQLAlchemy computes the statement's cache key.
+For every hot lookup this times, per call:
+
+* rebuilt: construct the statement the way the code used to (``db.query(...)
+  .filter(...)`` or a fresh ``update(...).where(...)`` with the values inlined),
+  then compute its cache key
+* cached: compute the cache key of the shared repository statement, which is
+  memoized on the object, plus build its parameter dict
+
+No database is needed. Execution and the round-trip cost the same on both
+paths, so the difference is the saving per call.
+
+Usage:
+    python benchmarks/statement_cache.py [--calls 20000] [--runs 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select, update, func  # noqa: E402
+from sqlalchemy.orm import Query  # noqa: E402
+
+from app.core import repository  # noqa: E402
+from app.inventory import inventory_models as m  # noqa: E402
+from app.auth import auth_models  # noqa: E402
+
+MFG = date(2026, 1, 1)
+
+
+def user_rebuilt(i):
+    query = Query(auth_models.User).filter(auth_models.User.username == f"user{i % 50}").limit(1)
+    return query.statement._generate_cache_key()
+
+
+def user_cached(i):
+    params = {"b_username": f"user{i % 50}"}
+    return repository.USER_BY_USERNAME._generate_cache_key(), params
+
+
+def product_rebuilt(i):
+    query = Query(m.Product).filter(m.Product.ean == f"89012345{i % 1000:05d}").limit(1)
+    return query.statement._generate_cache_key()
+
+
+def product_cached(i):
+    params = {"b_ean": f"89012345{i % 1000:05d}"}
+    return repository.PRODUCT_BY_EAN._generate_cache_key(), params
+
+
+def putaway_rebuilt(i):
+    stmt = (
+        update(m.Inventory)
+        .where(
+            m.Inventory.product_id == i % 1000, m.Inventory.location_id == i % 400,
+            m.Inventory.batch == f"B{i % 97}", m.Inventory.mfg_date == MFG,
+        )
+        .values(quantity=m.Inventory.quantity + 5.0)
+        .returning(*repository.INVENTORY_RETURNING)
+        .execution_options(synchronize_session=False)
+    )
+    return stmt._generate_cache_key()
+
+
+def putaway_cached(i):
+    params = dict(b_product_id=i % 1000, b_location_id=i % 400, b_batch=f"B{i % 97}",
+                  b_mfg_date=MFG, b_quantity=5.0)
+    return repository.putaway_increment(False, False)._generate_cache_key(), params
+
+
+def pick_rebuilt(i):
+    target = (
+        select(m.Inventory.id)
+        .where(
+            m.Inventory.product_id == i % 1000, m.Inventory.location_id == i % 400,
+            m.Inventory.batch == f"B{i % 97}", m.Inventory.quantity >= 5.0,
+        )
+        .order_by(m.Inventory.exp_date, m.Inventory.id)
+        .limit(1)
+        .with_for_update()
+        .scalar_subquery()
+    )
+    stmt = (
+        update(m.Inventory)
+        .where(m.Inventory.id == target, m.Inventory.quantity >= 5.0)
+        .values(
+            quantity=m.Inventory.quantity - 5.0,
+            reserved_quantity=func.coalesce(m.Inventory.reserved_quantity, 0) - 5.0,
+        )
+        .returning(*repository.INVENTORY_RETURNING)
+        .execution_options(synchronize_session=False)
+    )
+    return stmt._generate_cache_key()
+
+
+def pick_cached(i):
+    params = dict(b_product_id=i % 1000, b_location_id=i % 400, b_batch=f"B{i % 97}", b_quantity=5.0)
+    return repository.pick_decrement(False)._generate_cache_key(), params
+
+
+def timed(fn, calls, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        for i in range(calls):
+            fn(i)
+        samples.append((time.perf_counter() - started) / calls)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    cases = [
+        ("get_current_user", user_rebuilt, user_cached),
+        ("product by EAN", product_rebuilt, product_cached),
+        ("putaway lookup", putaway_rebuilt, putaway_cached),
+        ("pick lookup", pick_rebuilt, pick_cached),
+    ]
+    for name, rebuilt, cached in cases:
+        rebuilt(0), cached(0)  # warm-up: first build of lazily created variants
+        rebuilt_time = timed(rebuilt, args.calls, args.runs)
+        cached_time = timed(cached, args.calls, args.runs)
+        print(f"{name:<17} rebuilt {rebuilt_time * 1e6:8.1f} us/call  cached {cached_time * 1e6:6.1f} us/call  "
+              f"saved {(rebuilt_time - cached_time) * 1e6:8.1f} us/call  x{rebuilt_time / cached_time:.0f}")
+
+
+if __name__ == "__main__":
+    main()
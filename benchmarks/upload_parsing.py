@@ -0,0 +1,117 @@
+"""
+Parse time per upload format for the GRN layout.
+
+Writes ``--rows`` synthetic GRN lines (PO No., Supplier Name, EAN No., Qty,
+Batch, MFG Date, EXP Date) as .xlsx, .csv and .parquet, then times:
+
+* pandas.read_excel (the previous upload path)
+* streaming read-only openpyxl (.xlsx)
+* stdlib csv (.csv)
+* pyarrow (.parquet, skipped when pyarrow is not installed)
+
+Times are per parse in this process; in the app the same work runs in the
+parser process pool, off the request threads. Importing the app settings needs
+the usual environment (.env).
+
+Usage:
+    python benchmarks/upload_parsing.py [--rows 50000] [--runs 3]
+"""
+import argparse
+import csv
+import io
+import os
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.spreadsheets import parse_bytes  # noqa: E402
+
+HEADER = ["PO No.", "Supplier Name", "EAN No.", "Qty", "Batch", "MFG Date", "EXP Date"]
+
+
+def make_rows(count: int):
+    mfg = date(2026, 1, 1)
+    return [
+        ["PO-1001", "Supplier", 8901234500000 + i, float(i % 40 + 1), f"B{i % 97}", mfg, mfg + timedelta(days=365)]
+        for i in range(count)
+    ]
+
+
+def to_xlsx(rows) -> bytes:
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(HEADER)
+    for row in rows:
+        sheet.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def to_csv(rows) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(HEADER)
+    writer.writerows([[value.isoformat() if isinstance(value, date) else value for value in row] for row in rows])
+    return buffer.getvalue().encode()
+
+
+def to_parquet(rows) -> bytes | None:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        return None
+    table = pa.table({name: [row[index] for row in rows] for index, name in enumerate(HEADER)})
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer)
+    return buffer.getvalue()
+
+
+def pandas_excel(data: bytes):
+    import pandas as pd
+    return pd.read_excel(io.BytesIO(data)).fillna('').to_dict("records")
+
+
+def timed(fn, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples), len(result)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    xlsx, csv_data, parquet = to_xlsx(rows), to_csv(rows), to_parquet(rows)
+
+    cases = [
+        ("pandas.read_excel (.xlsx)", len(xlsx), lambda: pandas_excel(xlsx)),
+        ("openpyxl read-only (.xlsx)", len(xlsx), lambda: parse_bytes("grn.xlsx", xlsx)),
+        ("csv (.csv)", len(csv_data), lambda: parse_bytes("grn.csv", csv_data)),
+    ]
+    if parquet is not None:
+        cases.append(("pyarrow (.parquet)", len(parquet), lambda: parse_bytes("grn.parquet", parquet)))
+    else:
+        print("pyarrow not installed; skipping .parquet")
+
+    print(f"{args.rows} rows, median of {args.runs} runs")
+    for name, size, fn in cases:
+        elapsed, parsed = timed(fn, args.runs)
+        print(f"{name:<28} {size / 1024:9.0f} KB  {elapsed * 1000:9.1f} ms  "
+              f"({parsed / elapsed:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()